@@ -0,0 +1,50 @@
+"""Benchmark building the Get queries for the interface data of a fabric.
+
+Compares `cloudvision.Connector.grpc_client.grpcClient.create_query`, which encodes every path element of every
+query, against `create_query` reusing the paths encoded by `PathEncoder`. Run inside the development container with
+`invoke benchmark --name create_queries`.
+"""
+import timeit
+
+import nautobot
+
+nautobot.setup()
+
+from cloudvision.Connector.grpc_client import grpcClient  # noqa: E402 pylint: disable=wrong-import-position
+from nautobot_ssot_aristacv.utils import cloudvision  # noqa: E402 pylint: disable=wrong-import-position
+
+DEVICE_COUNT = 2000
+INTERFACE_COUNT = 48
+DEVICE_PATHS = [
+    [cloudvision.INTERFACE_STATUS_PATH],
+    [cloudvision.TRANSCEIVER_STATUS_PATH],
+    cloudvision.INTERFACE_CONFIG_PATHS,
+    [cloudvision.INTERFACE_MODE_PATH],
+    [cloudvision.IP_INTF_CONFIG_PATH],
+]
+
+
+def build_queries(create_query):
+    """Build the per-device queries of `get_devices_data` and the per-interface queries of `get_interface_mode`."""
+    queries = []
+    for device in range(DEVICE_COUNT):
+        dId = f"JPE{device:08d}"
+        for paths in DEVICE_PATHS:
+            queries.append(create_query([(pathElts, []) for pathElts in paths], dId))
+        for interface in range(1, INTERFACE_COUNT + 1):
+            pathElts = ["Sysdb", "bridging", "switchIntfConfig", "switchIntfConfig", f"Ethernet{interface}"]
+            queries.append(create_query([(pathElts, [])], dId))
+    return queries
+
+
+def main():
+    """Time both ways of building the queries and check they agree."""
+    assert build_queries(grpcClient.create_query) == build_queries(cloudvision.create_query)  # nosec
+    print(f"{DEVICE_COUNT} devices, {INTERFACE_COUNT} interfaces each")
+    for name, create_query in (("codec", grpcClient.create_query), ("cached", cloudvision.create_query)):
+        seconds = min(timeit.repeat(lambda c=create_query: build_queries(c), number=1, repeat=3))
+        print(f"{name:>10}: {seconds:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
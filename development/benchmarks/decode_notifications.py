@@ -0,0 +1,76 @@
+"""Benchmark decoding CloudVision notification batches.
+
+Re-encodes the notification batches captured in the test fixtures and compares decoding them with the generic
+`cloudvision.Connector.codec.Decoder` against `ScalarDecoder`. Run inside the development container with
+`invoke benchmark --name decode_notifications`.
+"""
+import json
+import timeit
+from pathlib import Path
+
+import nautobot
+
+nautobot.setup()
+
+import cloudvision.Connector.gen.notification_pb2 as ntf  # noqa: E402 pylint: disable=wrong-import-position
+from cloudvision.Connector import codec  # noqa: E402 pylint: disable=wrong-import-position
+from nautobot_ssot_aristacv.utils import cloudvision  # noqa: E402 pylint: disable=wrong-import-position
+
+FIXTURES = Path(__file__).resolve().parents[2] / "nautobot_ssot_aristacv" / "tests" / "fixtures"
+REPEAT = 200
+
+
+def load_batches():
+    """Encode the notification batches captured in the `*_client_query.json` fixtures."""
+    encoder = codec.Encoder()
+    batches = []
+    for fixture in sorted(FIXTURES.glob("*_client_query.json")):
+        for batch in json.loads(fixture.read_text()):
+            notifications = [
+                ntf.Notification(
+                    updates=[
+                        ntf.Notification.Update(key=encoder.encode(key), value=encoder.encode(value))
+                        for key, value in notif["updates"].items()
+                    ],
+                    path_elements=[encoder.encode(elt) for elt in notif.get("path_elements") or []],
+                )
+                for notif in batch["notifications"]
+            ]
+            batches.append(
+                ntf.NotificationBatch(
+                    d="device",
+                    dataset=ntf.Dataset(type=batch["dataset"]["type"], name=batch["dataset"]["name"]),
+                    notifications=notifications,
+                )
+            )
+    return batches * REPEAT
+
+
+class DecodingClient(cloudvision.CloudvisionApi):
+    """CloudvisionApi decoding with the given decoder, without opening a channel to CloudVision."""
+
+    decoder = None
+
+    def __init__(self, decoder):  # pylint: disable=super-init-not-called
+        """Set the decoder to use."""
+        self.decoder = decoder
+
+
+def main():
+    """Time both decoders and check they agree."""
+    batches = load_batches()
+    clients = {"codec": DecodingClient(codec.Decoder()), "scalar": DecodingClient(cloudvision.ScalarDecoder())}
+    expected = [clients["codec"].decode_batch(batch) for batch in batches]
+    assert expected == [clients["scalar"].decode_batch(batch) for batch in batches]  # nosec
+
+    values = sum(
+        len(notif.updates) * 2 + len(notif.path_elements) for batch in batches for notif in batch.notifications
+    )
+    print(f"{len(batches)} batches, {values} encoded keys, values and path elements")
+    for name, client in clients.items():
+        seconds = min(timeit.repeat(lambda c=client: [c.decode_batch(b) for b in batches], number=1, repeat=3))
+        print(f"{name:>10}: {seconds:.3f}s ({seconds / values * 1e6:.2f}us per value)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Benchmark hostname parsing for site and role codes.
+
+Compares the previous approach of searching every raw pattern string against the compiled and cached
+`parse_hostname` over 100k synthetic hostnames. Run inside the development container with `invoke benchmark`.
+"""
+import re
+import timeit
+
+import nautobot
+
+nautobot.setup()
+
+from django.conf import settings  # noqa: E402 pylint: disable=wrong-import-position
+from nautobot_ssot_aristacv.utils import nautobot as nautobot_utils  # noqa: E402 pylint: disable=wrong-import-position
+
+HOSTNAME_COUNT = 100_000
+HOSTNAME_PATTERNS = [
+    r"(?P<site>\w{2,3}\d+)-(?P<role>\w+)-\d+",
+    r"(?P<site>\w{2,3}\d+)-.+-\d+",
+    r".+-(?P<role>\w+)-\d+",
+]
+SITES = ["ams", "lon", "nyc", "sjc", "sin", "syd", "fra", "dfw"]
+ROLES = ["leaf", "spine", "edge", "border", "mgmt"]
+
+
+def naive_parse_hostname(hostname: str):
+    """Parse a hostname the way it was done before patterns were compiled and cached."""
+    hostname_patterns = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("hostname_patterns")
+
+    site, role = None, None
+    for pattern in hostname_patterns:
+        match = re.search(pattern=pattern, string=hostname)
+        if match:
+            if "site" in match.groupdict() and match.group("site"):
+                site = match.group("site")
+            if "role" in match.groupdict() and match.group("role"):
+                role = match.group("role")
+    return (site, role)
+
+
+def generate_hostnames(count: int = HOSTNAME_COUNT):
+    """Generate unique synthetic hostnames such as `ams01-leaf-01`."""
+    return [f"{SITES[i % len(SITES)]}{i // 1000:02d}-{ROLES[i % len(ROLES)]}-{i % 1000:03d}" for i in range(count)]
+
+
+def main():
+    """Time both approaches and check they agree."""
+    settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]["hostname_patterns"] = HOSTNAME_PATTERNS
+    hostnames = generate_hostnames()
+
+    expected = [naive_parse_hostname(hostname) for hostname in hostnames]
+    nautobot_utils.match_hostname.cache_clear()
+    assert expected == [nautobot_utils.parse_hostname(hostname) for hostname in hostnames]  # nosec
+
+    def run_cold():
+        nautobot_utils.match_hostname.cache_clear()
+        for hostname in hostnames:
+            nautobot_utils.parse_hostname(hostname)
+
+    def run_warm():
+        for hostname in hostnames[: nautobot_utils.HOSTNAME_CACHE_SIZE]:
+            nautobot_utils.parse_hostname(hostname)
+
+    results = {
+        "naive": min(timeit.repeat(lambda: [naive_parse_hostname(h) for h in hostnames], number=1, repeat=3)),
+        "compiled": min(timeit.repeat(run_cold, number=1, repeat=3)),
+    }
+    run_warm()
+    warm = min(timeit.repeat(run_warm, number=1, repeat=3))
+    print(f"{len(hostnames)} hostnames, {len(HOSTNAME_PATTERNS)} patterns")
+    for name, seconds in results.items():
+        print(f"{name:>10}: {seconds:.3f}s ({seconds / len(hostnames) * 1e6:.2f}us per hostname)")
+    print(f"{'cached':>10}: {warm / nautobot_utils.HOSTNAME_CACHE_SIZE * 1e6:.2f}us per hostname")
+
+
+if __name__ == "__main__":
+    main()
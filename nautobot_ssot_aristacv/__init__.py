@@ -34,6 +34,9 @@ class NautobotSSOTAristaCVConfig(PluginConfig):
         "hostname_patterns": [],
         "site_mappings": {},
         "role_mappings": {},
+        "port_type_mappings": {},
+        "interface_type_mappings": {},
+        "instances": [],
     }
     caching_config = {}
 
@@ -73,6 +73,13 @@ PORT_TYPE_MAP = {
     "400GBASE-ZR": "400gbase-x-qsfpdd",
 }
 
+INTERFACE_TYPE_MAP = {
+    "Management": "1000base-t",
+    "Vlan": "virtual",
+    "Loopback": "virtual",
+    "Port-Channel": "lag",
+}
+
 CLOUDVISION_PLATFORM = "arista_eos_cloudvision"
 
 ARISTA_PLATFORM = "arista_eos"
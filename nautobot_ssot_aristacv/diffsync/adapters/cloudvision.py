@@ -1,11 +1,13 @@
 """DiffSync adapter for Arista CloudVision."""
+from itertools import islice
 from django.conf import settings
 import distutils
-import re
+from typing import Dict, Iterable, List, Optional
 
 import arista.tag.v2 as TAG
+import grpc
 from diffsync import DiffSync
-from diffsync.exceptions import ObjectAlreadyExists, ObjectNotFound
+from diffsync.exceptions import ObjectAlreadyExists
 from nautobot_ssot_aristacv.diffsync.models.cloudvision import (
     CloudvisionCustomField,
     CloudvisionDevice,
@@ -14,6 +16,10 @@ from nautobot_ssot_aristacv.diffsync.models.cloudvision import (
 )
 from nautobot_ssot_aristacv.utils import cloudvision
 
+# Errors that cause a single device to be quarantined rather than failing the whole sync, ie CloudVision being
+# unreachable for the device or returning data that can't be parsed. Anything else is a bug and is left to propagate.
+DEVICE_LOAD_ERRORS = (grpc.RpcError, cloudvision.DeviceDataError)
+
 
 class CloudvisionAdapter(DiffSync):
     """DiffSync adapter implementation for CloudVision user-defined device tags."""
@@ -25,154 +31,318 @@ class CloudvisionAdapter(DiffSync):
 
     top_level = ["device", "ipaddr", "cf"]
 
-    def __init__(self, *args, job=None, conn: cloudvision.CloudvisionApi, **kwargs):
-        """Initialize the CloudVision DiffSync adapter."""
+    def __init__(
+        self,
+        *args,
+        job=None,
+        conn: cloudvision.CloudvisionApi,
+        instance: Optional[str] = None,
+        ip_interfaces: Optional[Dict[str, List[cloudvision.IPInterfaceRecord]]] = None,
+        devices: Optional[Iterable[str]] = None,
+        quarantine: Optional[cloudvision.DeviceQuarantine] = None,
+        **kwargs,
+    ):
+        """Initialize the CloudVision DiffSync adapter.
+
+        Args:
+            job (Job): The Job using this adapter.
+            conn (CloudvisionApi): Connection to CloudVision.
+            instance (str, optional): Name of the CloudVision instance being loaded when syncing several instances.
+            ip_interfaces (dict, optional): IP interfaces of every device keyed by device ID, as returned by
+                `discover_ip_interfaces`, used instead of querying each device.
+            devices (Iterable[str], optional): Only load these devices, by hostname, ie to rerun the failed devices.
+            quarantine (DeviceQuarantine, optional): Where to record devices that fail to load, shared by the adapters
+                of a job. Defaults to a new quarantine using the `device_failure_budget` setting.
+        """
         super().__init__(*args, **kwargs)
         self.job = job
         self.conn = conn
+        self.instance = instance
+        self.ip_interfaces = ip_interfaces
+        self.devices = set(devices) if devices is not None else None
+        self.quarantine = quarantine if quarantine is not None else cloudvision.DeviceQuarantine.from_settings()
+        self.tag_changes = cloudvision.TagChangeSet()
+        self.port_types = cloudvision.PortTypeResolver.from_settings()
+
+    def load_controller(self):
+        """Load the CloudVision controller Device and its EOS version CustomField."""
+        cvp_version = cloudvision.get_cvp_version(client=self.conn)
+        cvp_ver_cf = self.cf(name="arista_eos", value=cvp_version, device_name="CloudVision")
+        try:
+            self.add(cvp_ver_cf)
+        except ObjectAlreadyExists as err:
+            self.job.log_warning(
+                message=f"Unable to add CustomField for EOS Version for CloudVision device as already exists. {err}"
+            )
+        new_cvp = self.device(
+            name="CloudVision",
+            serial="",
+            status="active",
+            device_model="CloudVision",
+            version=cvp_version,
+            uuid=None,
+        )
+        try:
+            self.add(new_cvp)
+        except ObjectAlreadyExists as err:
+            self.job.log_warning(message=f"Error attempting to add CloudVision device. {err}")
 
     def load_devices(self):
         """Load devices from CloudVision."""
         PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
         if PLUGIN_SETTINGS.get("create_controller"):
-            cvp_version = cloudvision.get_cvp_version()
-            cvp_ver_cf = self.cf(name="arista_eos", value=cvp_version, device_name="CloudVision")
-            try:
-                self.add(cvp_ver_cf)
-            except ObjectAlreadyExists as err:
-                self.job.log_warning(
-                    message=f"Unable to add CustomField for EOS Version for CloudVision device as already exists. {err}"
-                )
-            new_cvp = self.device(
-                name="CloudVision",
-                serial="",
-                status="active",
-                device_model="CloudVision",
-                version=cvp_version,
-                uuid=None,
-            )
+            self.load_controller()
+        if self.ip_interfaces is None:
+            self.ip_interfaces = self.discover_ip_interfaces()
+        # Devices are loaded as the inventory is streamed so per-device work overlaps with the stream, with the
+        # interface data of each batch of devices fetched together.
+        devices = cloudvision.iter_devices(client=self.conn.comm_channel)
+        if self.devices is not None:
+            devices = (dev for dev in devices if dev.hostname in self.devices)
+        batch_size = max(PLUGIN_SETTINGS.get("device_batch_size", cloudvision.DEVICE_BATCH_SIZE), 1)
+        batch = list(islice(devices, batch_size))
+        while batch:
+            self.load_device_batch(batch)
+            batch = list(islice(devices, batch_size))
+
+    def load_device_batch(self, batch: List[cloudvision.DeviceRecord]) -> List[CloudvisionDevice]:
+        """Load a batch of devices, fetching the interface data of the batch with one GetRequest per kind of data.
+
+        Args:
+            batch (List[DeviceRecord]): Devices to load, as returned by `cloudvision.iter_devices`.
+
+        Returns:
+            List[CloudvisionDevice]: The devices that were loaded.
+        """
+        devices_data = {}
+        if len(batch) > 1:
             try:
-                self.add(new_cvp)
-            except ObjectAlreadyExists as err:
-                self.job.log_warning(message=f"Error attempting to add CloudVision device. {err}")
-        for dev in cloudvision.get_devices(client=self.conn.comm_channel):
-            if dev["hostname"] != "":
-                new_device = self.device(
-                    name=dev["hostname"],
-                    serial=dev["device_id"],
-                    status=dev["status"],
-                    device_model=dev["model"],
-                    version=dev["sw_ver"],
-                    uuid=None,
+                devices_data = cloudvision.get_devices_data(
+                    client=self.conn, dIds=[dev.device_id for dev in batch], ip_interfaces=self.ip_interfaces is None
                 )
-                try:
-                    self.add(new_device)
-                except ObjectAlreadyExists as err:
-                    self.job.log_warning(
-                        message=f"Duplicate device {dev['hostname']} {dev['device_id']} found and ignored. {err}"
-                    )
-                    continue
-                self.load_interfaces(device=new_device)
-                self.load_ip_addresses(dev=new_device)
-                self.load_device_tags(device=new_device)
-            else:
-                self.job.log_warning(message=f"Device {dev} is missing hostname so won't be imported.")
-                continue
+            except DEVICE_LOAD_ERRORS as err:
+                # Each device's data is fetched on its own by load_device() instead so only the devices that fail
+                # again are quarantined.
+                self.job.log_warning(message=f"Unable to get data for a batch of {len(batch)} devices. {err}")
+        loaded = [self.load_device(dev=dev, data=devices_data.get(dev.device_id)) for dev in batch]
+        return [device for device in loaded if device is not None]
 
-    def load_interfaces(self, device):
-        """Load device interface from CloudVision."""
-        chassis_type = cloudvision.get_device_type(client=self.conn, dId=device.serial)
-        if self.job.kwargs.get("debug"):
-            self.job.log_debug(message=f"Chassis type for {device.name} is {chassis_type}.")
-        port_info = []
-        if chassis_type == "modular":
-            port_info = cloudvision.get_interfaces_chassis(client=self.conn, dId=device.serial)
-        elif chassis_type == "fixedSystem":
-            port_info = cloudvision.get_interfaces_fixed(client=self.conn, dId=device.serial)
-        elif chassis_type == "Unknown":
+    def discover_ip_interfaces(self) -> Optional[Dict[str, List[cloudvision.IPInterfaceRecord]]]:
+        """Find the IP interfaces of every device with fabric-wide searches if `ip_discovery_search` is enabled.
+
+        Returns:
+            dict|None: IP interfaces keyed by device ID, or None if they should be queried per device.
+        """
+        PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
+        if not PLUGIN_SETTINGS.get("ip_discovery_search"):
+            return None
+        try:
+            return cloudvision.search_ip_interfaces(
+                client=self.conn, page_size=PLUGIN_SETTINGS.get("search_page_size", cloudvision.SEARCH_PAGE_SIZE)
+            )
+        except grpc.RpcError as err:
             self.job.log_warning(
-                message=f"Unable to determine chassis type for {device.name} so will be unable to retrieve interfaces."
+                message=f"Unable to search for IP interfaces, they will be queried per device instead. {err}"
+            )
+            return None
+
+    def load_device(self, dev: cloudvision.DeviceRecord, data: Optional[cloudvision.DeviceData] = None):
+        """Load a single CloudVision device along with its interfaces, IP addresses and tags.
+
+        Args:
+            dev (DeviceRecord): Device information as returned by `cloudvision.get_devices`.
+            data (DeviceData, optional): Interface data fetched along with other devices, fetched for this device alone
+                with `get_devices_data` if not provided.
+
+        Returns:
+            CloudvisionDevice|None: The loaded Device or None if it was skipped.
+        """
+        if dev.hostname == "":
+            self.job.log_warning(message=f"Device {dev} is missing hostname so won't be imported.")
+            return None
+        new_device = self.device(
+            name=dev.hostname,
+            serial=dev.device_id,
+            status=dev.status,
+            device_model=dev.model,
+            version=dev.sw_ver,
+            instance=self.instance,
+            device_id=dev.device_id,
+            uuid=None,
+        )
+        try:
+            self.add(new_device)
+        except ObjectAlreadyExists as err:
+            self.job.log_warning(message=f"Duplicate device {dev.hostname} {dev.device_id} found and ignored. {err}")
+            return None
+        try:
+            if data is None:
+                data = cloudvision.get_devices_data(
+                    client=self.conn, dIds=[dev.device_id], ip_interfaces=self.ip_interfaces is None
+                )[dev.device_id]
+            ports = self.load_interfaces(device=new_device, descriptions=data.descriptions, data=data)
+            self.load_ip_addresses(
+                dev=new_device, descriptions=data.descriptions, ports=ports, ip_intfs=data.ip_interfaces
             )
+            self.load_device_tags(device=new_device)
+        except DEVICE_LOAD_ERRORS as err:
+            self.quarantine_device(device=new_device, err=err)
             return None
+        return new_device
+
+    def quarantine_device(self, device: CloudvisionDevice, err: Exception):
+        """Remove a device that failed to load, along with anything already loaded for it, and quarantine it.
+
+        Quarantined devices are left out of the Nautobot side of the diff too so they aren't deleted.
+
+        Args:
+            device (CloudvisionDevice): Device that failed to load.
+            err (Exception): Error the device failed with.
+        """
+        for model, device_field in ((self.ipaddr, "device"), (self.cf, "device_name")):
+            for obj in [obj for obj in self.get_all(model) if getattr(obj, device_field) == device.name]:
+                self.remove(obj)
+        self.remove(device, remove_children=True)
+        self.job.log_warning(message=f"Unable to load {device.name} from CloudVision so it has been skipped. {err}")
+        self.quarantine.add(device.name, err)
+
+    def load_interfaces(
+        self,
+        device,
+        descriptions: Optional[Dict[str, str]] = None,
+        data: Optional[cloudvision.DeviceData] = None,
+    ) -> Dict[str, CloudvisionPort]:
+        """Load device interface from CloudVision.
+
+        Args:
+            device (CloudvisionDevice): Device to load interfaces for.
+            descriptions (dict): Interface descriptions from `get_interface_descriptions`, fetched if not provided.
+            data (DeviceData, optional): Interface data fetched along with other devices, queried if not provided.
+
+        Returns:
+            Dict[str, CloudvisionPort]: Index of the device's loaded ports by name.
+        """
+        ports = {}
+        if data:
+            port_info = data.interfaces
+        else:
+            port_info = cloudvision.get_interfaces(client=self.conn, dId=device.serial)
+        if not port_info:
+            self.job.log_warning(message=f"Unable to find any interfaces for {device.name}.")
+            return ports
         if self.job.kwargs.get("debug"):
             self.job.log_debug(message=f"Device being loaded: {device.name}. Port: {port_info}.")
+        if data:
+            transceivers = data.transceivers
+        else:
+            transceivers = cloudvision.get_interface_transceivers(client=self.conn, dId=device.serial)
+        if descriptions is None:
+            descriptions = cloudvision.get_interface_descriptions(client=self.conn, dId=device.serial)
+        if data:
+            modes = data.modes
+        else:
+            modes = cloudvision.get_interface_modes(client=self.conn, dId=device.serial)
         for port in port_info:
             if self.job.kwargs.get("debug"):
-                self.job.log_debug(message=f"Port {port['interface']} being loaded for {device.name}.")
-            port_mode = cloudvision.get_interface_mode(client=self.conn, dId=device.serial, interface=port)
-            transceiver = cloudvision.get_interface_transceiver(client=self.conn, dId=device.serial, interface=port)
-            if transceiver == "Unknown":
-                # Breakout transceivers, ie 40G -> 4x10G, shows up as 4 interfaces and requires looking at base interface to find transceiver, ie Ethernet1 if Ethernet1/1
-                base_port_name = re.sub(r"/\d", "", port["interface"])
-                transceiver = cloudvision.get_interface_transceiver(
-                    client=self.conn, dId=device.serial, interface=base_port_name
-                )
-            port_description = cloudvision.get_interface_description(
-                client=self.conn, dId=device.serial, interface=port["interface"]
-            )
+                self.job.log_debug(message=f"Port {port.interface} being loaded for {device.name}.")
+            port_mode = modes.get(port.interface, "Unknown")
+            transceiver = cloudvision.resolve_transceiver(transceivers=transceivers, interface=port.interface)
             port_status = cloudvision.get_interface_status(port_info=port)
-            port_type = cloudvision.get_port_type(port_info=port, transceiver=transceiver)
-            if port["interface"] != "":
+            port_type = self.port_types.resolve(interface=port.interface, transceiver=transceiver)
+            if port.interface != "":
                 new_port = self.port(
-                    name=port["interface"],
+                    name=port.interface,
                     device=device.name,
-                    description=port_description,
-                    mac_addr=port["mac_addr"] if port.get("mac_addr") else "",
+                    description=descriptions.get(port.interface, ""),
+                    mac_addr=port.mac_addr,
                     mode="tagged" if port_mode == "trunk" else "access",
-                    mtu=port["mtu"] if port.get("mtu") else 1500,
-                    enabled=port["enabled"],
+                    mtu=port.mtu if port.mtu else 1500,
+                    enabled=port.enabled,
                     status=port_status,
-                    port_type=port_type,
+                    port_type=port_type.port_type,
+                    speed=port_type.speed,
                     uuid=None,
                 )
                 try:
                     self.add(new_port)
                     device.add_child(new_port)
+                    ports[new_port.name] = new_port
                 except ObjectAlreadyExists as err:
                     self.job.log_warning(
-                        message=f"Duplicate port {port['interface']} found for {device.name} and ignored. {err}"
+                        message=f"Duplicate port {port.interface} found for {device.name} and ignored. {err}"
                     )
+        return ports
 
-    def load_ip_addresses(self, dev: device):
-        """Load IP addresses from CloudVision."""
-        dev_ip_intfs = cloudvision.get_ip_interfaces(client=self.conn, dId=dev.serial)
-        for intf in dev_ip_intfs:
-            if self.job.kwargs.get("debug"):
-                self.job.log(message=f"Loading interface {intf['interface']} on {dev.name} for {intf['address']}.")
+    def load_l3_ports(self, dev, names: Iterable[str], descriptions: Dict[str, str], ports: Dict[str, CloudvisionPort]):
+        """Create ports for IP interfaces, ie Vlan or Loopback interfaces, that weren't loaded with the device interfaces.
+
+        Args:
+            dev (CloudvisionDevice): Device the ports belong to.
+            names (Iterable[str]): Names of the interfaces to create ports for.
+            descriptions (dict): Interface descriptions from `get_interface_descriptions`.
+            ports (Dict[str, CloudvisionPort]): Index of the device's ports by name, updated with the new ports.
+        """
+        for name in names:
+            new_port = self.port(
+                name=name,
+                device=dev.name,
+                description=descriptions.get(name, ""),
+                mac_addr="",
+                enabled=True,
+                mode="access",
+                mtu=65535,
+                port_type=self.port_types.resolve(interface=name, transceiver="").port_type,
+                status="active",
+                uuid=None,
+            )
             try:
-                _ = self.get(self.port, {"name": intf["interface"], "device": dev.name})
-            except ObjectNotFound:
-                new_port = self.port(
-                    name=intf["interface"],
-                    device=dev.name,
-                    description=cloudvision.get_interface_description(
-                        client=self.conn, dId=dev.serial, interface=intf["interface"]
-                    ),
-                    mac_addr="",
-                    enabled=True,
-                    mode="access",
-                    mtu=65535,
-                    port_type=cloudvision.get_port_type(port_info={"interface": intf["interface"]}, transceiver=""),
-                    status="active",
-                    uuid=None,
-                )
                 self.add(new_port)
-                try:
-                    device = self.get(self.device, dev.name)
-                    device.add_child(new_port)
-                except ObjectNotFound as err:
-                    self.job.log_warning(
-                        message=f"Unable to find device {dev.name} to assign port {intf['interface']}. {err}"
-                    )
+                dev.add_child(new_port)
+                ports[name] = new_port
+            except ObjectAlreadyExists as err:
+                self.job.log_warning(message=f"Duplicate port {name} found for {dev.name} and ignored. {err}")
+
+    def load_ip_addresses(
+        self,
+        dev: device,
+        descriptions: Optional[Dict[str, str]] = None,
+        ports: Optional[Dict[str, CloudvisionPort]] = None,
+        ip_intfs: Optional[List[cloudvision.IPInterfaceRecord]] = None,
+    ):
+        """Load IP addresses from CloudVision.
 
+        Args:
+            dev (CloudvisionDevice): Device to load IP addresses for.
+            descriptions (dict): Interface descriptions from `get_interface_descriptions`, fetched if not provided.
+            ports (Dict[str, CloudvisionPort]): Index of the device's ports by name as returned by `load_interfaces`.
+            ip_intfs (List[IPInterfaceRecord], optional): IP interfaces fetched along with other devices.
+        """
+        if ip_intfs is not None:
+            dev_ip_intfs = ip_intfs
+        elif self.ip_interfaces is not None:
+            dev_ip_intfs = self.ip_interfaces.get(dev.serial, [])
+        else:
+            dev_ip_intfs = cloudvision.get_ip_interfaces(client=self.conn, dId=dev.serial)
+        if not dev_ip_intfs:
+            return
+        if ports is None:
+            ports = {port.name: port for port in self.get_all(self.port) if port.device == dev.name}
+        missing_ports = list(dict.fromkeys(intf.interface for intf in dev_ip_intfs if intf.interface not in ports))
+        if missing_ports:
+            if descriptions is None:
+                descriptions = cloudvision.get_interface_descriptions(client=self.conn, dId=dev.serial)
+            self.load_l3_ports(dev=dev, names=missing_ports, descriptions=descriptions, ports=ports)
+        for intf in dev_ip_intfs:
+            if self.job.kwargs.get("debug"):
+                self.job.log(message=f"Loading interface {intf.interface} on {dev.name} for {intf.address}.")
             if self.job.kwargs.get("debug"):
                 self.job.log(
-                    message=f"Attempting to load IP Address {intf['address']} for {intf['interface']} on {dev.name}."
+                    message=f"Attempting to load IP Address {intf.address} for {intf.interface} on {dev.name}."
                 )
-            if intf["address"] and intf["address"] != "none":
+            if intf.address and intf.address != "none":
                 new_ip = self.ipaddr(
-                    address=intf["address"],
-                    interface=intf["interface"],
+                    address=intf.address,
+                    interface=intf.interface,
                     device=dev.name,
                     uuid=None,
                 )
@@ -180,40 +350,69 @@ class CloudvisionAdapter(DiffSync):
                     self.add(new_ip)
                 except ObjectAlreadyExists as err:
                     self.job.log_warning(
-                        message=f"Unable to load {intf['address']} for {dev.name} on {intf['interface']}. {err}"
+                        message=f"Unable to load {intf.address} for {dev.name} on {intf.interface}. {err}"
                     )
                     continue
 
     def load_device_tags(self, device):
         """Load device tags from CloudVision."""
-        system_tags = cloudvision.get_tags_by_type(
-            client=self.conn.comm_channel, creator_type=TAG.models.CREATOR_TYPE_SYSTEM
+        system_tags = set(
+            cloudvision.iter_tags_by_type(client=self.conn.comm_channel, creator_type=TAG.models.CREATOR_TYPE_SYSTEM)
         )
         dev_tags = [
             tag
-            for tag in cloudvision.get_device_tags(client=self.conn.comm_channel, device_id=device.serial)
+            for tag in cloudvision.iter_device_tags(client=self.conn.comm_channel, device_id=device.serial)
             if tag in system_tags
         ]
 
         # Check if topology_type tag exists
-        list_of_tag_names = [value["label"] for value in dev_tags]
+        list_of_tag_names = [tag.label for tag in dev_tags]
         if "topology_type" not in list_of_tag_names:
-            dev_tags.append({"label": "topology_type", "value": "-"})
+            dev_tags.append(cloudvision.TagRecord(label="topology_type", value="-"))
 
         for tag in dev_tags:
-            if tag["label"] in ["hostname", "serialnumber", "Container"]:
+            if tag.label in ["hostname", "serialnumber", "Container"]:
                 continue
-            if tag["label"] == "mpls" or tag["label"] == "ztp":
-                tag["value"] = bool(distutils.util.strtobool(tag["value"]))
+            value = tag.value
+            if tag.label == "mpls" or tag.label == "ztp":
+                value = bool(distutils.util.strtobool(tag.value))
 
-            new_cf = self.cf(name=f"arista_{tag['label']}", value=tag["value"], device_name=device.name)
+            new_cf = self.cf(name=f"arista_{tag.label}", value=value, device_name=device.name)
             try:
                 self.add(new_cf)
             except ObjectAlreadyExists:
-                self.job.log_warning(message=f"Duplicate tag encountered for {tag['label']} on device {device.name}")
+                self.job.log_warning(message=f"Duplicate tag encountered for {tag.label} on device {device.name}")
 
-    def load(self):
-        """Load devices and associated data from CloudVision."""
+    def sync_complete(self, source: DiffSync, *args, **kwargs):
+        """Apply the tag changes queued during the sync to CloudVision concurrently.
+
+        Args:
+            source (DiffSync): Source DiffSync DataSource adapter.
+        """
+        if not self.tag_changes:
+            return
+        PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
+        self.job.log_info(message="Applying tag changes to CloudVision.")
+        tags_in_use = [
+            cloudvision.TagRecord(label=self.cf.tag_label(cf.name), value=self.cf.tag_value(cf.value))
+            for cf in self.get_all(self.cf)
+        ]
+        # Tags are applied over the connection the devices were loaded from, using the IDs recorded as they loaded.
+        device_ids = {device.name: device.device_id for device in self.get_all(self.device) if device.device_id}
+        errors = cloudvision.apply_tag_changes(
+            client=self.conn.comm_channel,
+            changes=self.tag_changes,
+            device_ids=device_ids,
+            existing_tags=cloudvision.iter_tags_by_type(client=self.conn.comm_channel),
+            tags_in_use=tags_in_use,
+            max_workers=PLUGIN_SETTINGS.get("tag_sync_workers", cloudvision.TAG_SYNC_WORKERS),
+        )
+        for error in errors:
+            self.job.log_warning(message=error)
+        self.tag_changes = cloudvision.TagChangeSet()
+
+    def check_hostname_mappings(self):
+        """Warn when hostname_patterns are configured without the mappings needed to use them."""
         PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
         if PLUGIN_SETTINGS.get("hostname_patterns") and not (
             PLUGIN_SETTINGS.get("site_mappings") and PLUGIN_SETTINGS.get("role_mappings")
@@ -221,4 +420,35 @@ class CloudvisionAdapter(DiffSync):
             self.job.log_warning(
                 message="Configuration found for hostname_patterns but no site_mappings or role_mappings. Please ensure your mappings are defined."
             )
+
+    def merge(self, other: "CloudvisionAdapter"):
+        """Merge the objects loaded by another adapter, ie from another CloudVision instance, into this adapter.
+
+        A Device that was already loaded from an earlier instance is skipped, along with its ports, IP addresses and
+        custom fields.
+
+        Args:
+            other (CloudvisionAdapter): Adapter to merge the loaded objects from.
+        """
+        skipped = set()
+        for device in other.get_all(other.device):
+            device.diffsync = self
+            try:
+                self.add(device)
+            except ObjectAlreadyExists as err:
+                skipped.add(device.name)
+                # Each instance loads the controller when create_controller is enabled, only the first one is kept.
+                if device.name != "CloudVision":
+                    self.job.log_warning(
+                        message=f"Device {device.name} from {other.instance} was already loaded from another CloudVision instance and ignored. {err}"
+                    )
+        for model, device_field in ((other.port, "device"), (other.ipaddr, "device"), (other.cf, "device_name")):
+            for obj in other.get_all(model):
+                if getattr(obj, device_field) not in skipped:
+                    obj.diffsync = self
+                    self.add(obj)
+
+    def load(self):
+        """Load devices and associated data from CloudVision."""
+        self.check_hostname_mappings()
         self.load_devices()
@@ -1,10 +1,14 @@
 """DiffSync adapter for Nautobot."""
+from itertools import islice
+from typing import Dict, Iterable, Optional
+
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
 from nautobot.dcim.models import Device as OrmDevice
 from nautobot.dcim.models import Interface as OrmInterface
 from nautobot.extras.models import Relationship as OrmRelationship
 from nautobot.extras.models import RelationshipAssociation as OrmRelationshipAssociation
+from nautobot.extras.models import Status as OrmStatus
 from nautobot.ipam.models import IPAddress as OrmIPAddress
 from diffsync import DiffSync
 from diffsync.exceptions import ObjectNotFound, ObjectAlreadyExists
@@ -28,14 +32,82 @@ class NautobotAdapter(DiffSync):
 
     top_level = ["device", "ipaddr", "cf"]
 
-    def __init__(self, *args, job=None, **kwargs):
-        """Initialize the Nautobot DiffSync adapter."""
+    scope_chunk_size = 1000
+
+    def __init__(
+        self,
+        *args,
+        job=None,
+        devices: Optional[Iterable[str]] = None,
+        exclude_devices: Optional[Iterable[str]] = None,
+        delete_budget: Optional[nautobot.DeleteBudget] = None,
+        **kwargs,
+    ):
+        """Initialize the Nautobot DiffSync adapter.
+
+        Args:
+            job (Job): The Job using this adapter.
+            devices (Iterable[str], optional): Only load these Devices, by name, and their related objects, ie the
+                Devices found in CloudVision.
+            exclude_devices (Iterable[str], optional): Skip these Devices, by name, and their related objects.
+            delete_budget (DeleteBudget, optional): Deletions still allowed, shared by the adapters of a Job. Defaults
+                to a new budget using the `max_deletes_per_sync` setting.
+        """
         super().__init__(*args, **kwargs)
         self.job = job
+        self.devices = set(devices) if devices is not None else None
+        self.exclude_devices = set(exclude_devices) if exclude_devices else set()
+        self.delete_budget = delete_budget
+        self.statuses: Dict[str, OrmStatus] = {}
+        # Read once rather than for each Device created.
+        self.hostname_mappings = nautobot.HostnameMappings.from_settings()
+        self.writer = nautobot.BatchedWriter(
+            job=job,
+            batch_size=settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get(
+                "sync_batch_size", nautobot.SYNC_BATCH_SIZE
+            ),
+        )
+
+    def scope_queryset(self, queryset, device_field: str = ""):
+        """Iterate over a queryset restricted to the Devices this adapter is scoped to.
+
+        The Device names are applied as `__in` filters in chunks of `scope_chunk_size` so each query stays bounded
+        however many Devices are in scope.
+
+        Args:
+            queryset (QuerySet): Queryset to be filtered.
+            device_field (str): Lookup path from the queryset model to Device, ie `device__` for Interfaces.
+
+        Yields:
+            Model: Objects from the filtered queryset.
+        """
+        if self.exclude_devices:
+            queryset = queryset.exclude(**{f"{device_field}name__in": self.exclude_devices})
+        if self.devices is None:
+            yield from queryset
+            return
+        names = iter(sorted(self.devices))
+        chunk = list(islice(names, self.scope_chunk_size))
+        while chunk:
+            yield from queryset.filter(**{f"{device_field}name__in": chunk})
+            chunk = list(islice(names, self.scope_chunk_size))
+
+    def get_status(self, slug: str) -> OrmStatus:
+        """Get a Status by slug, caching it for the rest of the sync.
+
+        Args:
+            slug (str): Slug of the Status.
+
+        Returns:
+            Status: The Status object.
+        """
+        if slug not in self.statuses:
+            self.statuses[slug] = OrmStatus.objects.get(slug=slug)
+        return self.statuses[slug]
 
     def load_devices(self):
         """Add Nautobot Device objects as DiffSync Device models."""
-        for dev in OrmDevice.objects.filter(device_type__manufacturer__slug="arista"):
+        for dev in self.scope_queryset(OrmDevice.objects.filter(device_type__manufacturer__slug="arista")):
             try:
                 new_device = self.device(
                     name=dev.name,
@@ -65,7 +137,9 @@ class NautobotAdapter(DiffSync):
 
     def load_interfaces(self):
         """Add Nautobot Interface objects as DiffSync Port models."""
-        for intf in OrmInterface.objects.filter(device__device_type__manufacturer__slug="arista"):
+        for intf in self.scope_queryset(
+            OrmInterface.objects.filter(device__device_type__manufacturer__slug="arista"), device_field="device__"
+        ):
             new_port = self.port(
                 name=intf.name,
                 device=intf.device.name,
@@ -89,7 +163,10 @@ class NautobotAdapter(DiffSync):
 
     def load_ip_addresses(self):
         """Add Nautobot IPAddress objects as DiffSync IPAddress models."""
-        for ipaddr in OrmIPAddress.objects.filter(interface__device__device_type__manufacturer__slug="arista"):
+        for ipaddr in self.scope_queryset(
+            OrmIPAddress.objects.filter(interface__device__device_type__manufacturer__slug="arista"),
+            device_field="interface__device__",
+        ):
             new_ip = self.ipaddr(
                 address=str(ipaddr.address),
                 interface=ipaddr.assigned_object.name,
@@ -101,6 +178,32 @@ class NautobotAdapter(DiffSync):
             except ObjectAlreadyExists as err:
                 self.job.log_warning(message=f"Unable to load {ipaddr.address} as appears to be a duplicate. {err}")
 
+    def apply_deletes(self):
+        """Delete the Devices and Interfaces queued for deletion during the sync.
+
+        Devices are deleted first, and Interfaces of deleted Devices are left to the cascade so they don't count
+        towards the `max_deletes_per_sync` limit. If the deletions are skipped for exceeding what's left of the
+        limit, all of them, cascaded Interfaces included, are counted as skipped in the delete budget.
+        """
+        if self.delete_budget is None:
+            self.delete_budget = nautobot.DeleteBudget.from_settings()
+        deleted_devices = self.writer.deletes.get(OrmDevice, {})
+        deleted_interfaces = self.writer.deletes.get(OrmInterface, {})
+        queued = len(deleted_devices) + len(deleted_interfaces)
+        if deleted_devices and deleted_interfaces:
+            uuids = iter(list(deleted_interfaces))
+            chunk = list(islice(uuids, self.scope_chunk_size))
+            while chunk:
+                for uuid, device_id in OrmInterface.objects.filter(pk__in=chunk).values_list("pk", "device_id"):
+                    if device_id in deleted_devices:
+                        del deleted_interfaces[uuid]
+                chunk = list(islice(uuids, self.scope_chunk_size))
+        total = len(deleted_devices) + len(deleted_interfaces)
+        if self.writer.apply_deletes(order=[OrmDevice, OrmInterface], limit=self.delete_budget.remaining):
+            self.delete_budget.deleted += total
+        else:
+            self.delete_budget.skipped += queued
+
     def sync_complete(self, source: DiffSync, *args, **kwargs):
         """Perform actions after sync is completed.
 
@@ -109,6 +212,10 @@ class NautobotAdapter(DiffSync):
         """
         PLUGIN_CFG = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
 
+        # Apply the writes still queued from the last, partial, batch then the deletions held back until now.
+        self.writer.flush()
+        self.apply_deletes()
+
         # if Controller is created we need to ensure all imported Devices have RelationshipAssociation to it.
         if PLUGIN_CFG.get("create_controller"):
             self.job.log_info(message="Creating Relationships between CloudVision and connected Devices.")
@@ -1,11 +1,18 @@
 """Cloudvision DiffSync models for AristaCV SSoT."""
-from django.conf import settings
+from typing import Optional
+
 from nautobot_ssot_aristacv.diffsync.models.base import Device, CustomField, IPAddress, Port
-from nautobot_ssot_aristacv.utils.cloudvision import CloudvisionApi
 
 
 class CloudvisionDevice(Device):
-    """Cloudvision Device model."""
+    """Cloudvision Device model.
+
+    When syncing several CloudVision instances, `instance` records the name of the instance the Device was loaded from.
+    `device_id` is the CloudVision ID of a loaded Device, used to apply tag changes to it.
+    """
+
+    instance: Optional[str]
+    device_id: Optional[str]
 
     @classmethod
     def create(cls, diffsync, ids, attrs):
@@ -22,7 +29,12 @@ class CloudvisionDevice(Device):
 
 
 class CloudvisionPort(Port):
-    """Cloudvision Port model."""
+    """Cloudvision Port model.
+
+    The port speed, in Mbps, is resolved along with the port type but isn't compared with Nautobot.
+    """
+
+    speed: Optional[int]
 
     @classmethod
     def create(cls, diffsync, ids, attrs):
@@ -59,67 +71,45 @@ class CloudvisionIPAddress(IPAddress):
 
 
 class CloudvisionCustomField(CustomField):
-    """Cloudvision CustomField model."""
+    """Cloudvision CustomField model.
+
+    Tag changes aren't sent to CloudVision immediately but queued on the adapter and applied concurrently once the
+    sync is complete, see `CloudvisionAdapter.sync_complete`.
+    """
 
     @staticmethod
-    def connect_cvp():
-        """Connect to Cloudvision gRPC endpoint."""
-        PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
-        return CloudvisionApi(
-            cvp_host=PLUGIN_SETTINGS["cvp_host"],
-            cvp_port=PLUGIN_SETTINGS.get("cvp_port", "8443"),
-            verify=PLUGIN_SETTINGS["verify"],
-            username=PLUGIN_SETTINGS["cvp_user"],
-            password=PLUGIN_SETTINGS["cvp_password"],
-            cvp_token=PLUGIN_SETTINGS["cvp_token"],
-        )
+    def tag_label(name: str) -> str:
+        """Get the CloudVision tag label for a CustomField name, ie `bgp` for `arista_bgp`."""
+        return name.replace("arista_", "", 1) if name.startswith("arista_") else name
+
+    @staticmethod
+    def tag_value(value) -> str:
+        """Get the CloudVision tag value for a CustomField value."""
+        if isinstance(value, bool):
+            return str(value).lower()
+        return str(value) if value is not None else ""
 
     @classmethod
     def create(cls, diffsync, ids, attrs):
-        """Create a user tag in cvp."""
-        cvp = cls.connect_cvp()
-        cvp.create_tag(ids["name"], attrs["value"])
-        # Create mapping from device_name to CloudVision device_id
-        device_ids = {dev["hostname"]: dev["device_id"] for dev in cvp.get_devices()}
-        for device in attrs["devices"]:
-            # Exclude devices that are inactive in CloudVision
-            if device in device_ids:
-                cvp.assign_tag_to_device(device_ids[device], ids["name"], attrs["value"])
-            else:
-                tag = f"{ids['name']}:{attrs['value']}" if attrs["value"] else ids["name"]
-                diffsync.job.log_warning(
-                    message=f"{device} is inactive or missing in CloudVision - skipping for tag: {tag}"
-                )
+        """Queue creation and assignment of a user tag in cvp."""
+        diffsync.tag_changes.add_assignment(
+            cls.tag_label(ids["name"]), cls.tag_value(attrs["value"]), ids["device_name"]
+        )
         return super().create(ids=ids, diffsync=diffsync, attrs=attrs)
 
     def update(self, attrs):
-        """Update user tag in cvp."""
-        cvp = self.connect_cvp()
-        remove = set(self.device_name) - set(attrs["devices"])
-        add = set(attrs["devices"]) - set(self.device_name)
-        # Create mapping from device_name to CloudVision device_id
-        device_ids = {dev["hostname"]: dev["device_id"] for dev in cvp.get_devices()}
-        for device in remove:
-            cvp.remove_tag_from_device(device_ids[device], self.name, self.value)
-        for device in add:
-            # Exclude devices that are inactive in CloudVision
-            if device in device_ids:
-                cvp.assign_tag_to_device(device_ids[device], self.name, self.value)
-            else:
-                tag = f"{self.name}:{self.value}" if self.value else self.name
-                self.diffsync.job.log_warning(
-                    message=f"{device} is inactive or missing in CloudVision - skipping for tag: {tag}"
-                )
+        """Queue replacement of the user tag value in cvp."""
+        label = self.tag_label(self.name)
+        self.diffsync.tag_changes.add_unassignment(label, self.tag_value(self.value), self.device_name)
+        self.diffsync.tag_changes.add_assignment(label, self.tag_value(attrs["value"]), self.device_name)
         # Call the super().update() method to update the in-memory DiffSyncModel instance
         return super().update(attrs)
 
     def delete(self):
-        """Delete user tag applied to devices in cvp."""
-        cvp = self.connect_cvp()
-        device_ids = {dev["hostname"]: dev["device_id"] for dev in cvp.get_devices()}
-        for device in self.device_name:
-            cvp.remove_tag_from_device(device_ids[device], self.name, self.value)
-        cvp.delete_tag(self.name, self.value)
+        """Queue removal of user tag applied to device in cvp."""
+        self.diffsync.tag_changes.add_unassignment(
+            self.tag_label(self.name), self.tag_value(self.value), self.device_name
+        )
         # Call the super().delete() method to remove the DiffSyncModel instance from its parent DiffSync adapter
         super().delete()
         return self
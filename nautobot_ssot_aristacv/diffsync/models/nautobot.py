@@ -1,6 +1,6 @@
 """Nautobot DiffSync models for AristaCV SSoT."""
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.conf import settings
 from nautobot.core.settings_funcs import is_truthy
 from nautobot.dcim.models import Device as OrmDevice
@@ -32,6 +32,9 @@ DEFAULT_DEVICE_STATUS_COLOR = "ff0000"
 DEFAULT_DELETE_DEVICES_ON_SYNC = False
 APPLY_IMPORT_TAG = False
 MISSING_CUSTOM_FIELDS = []
+# Interface attributes that are written with a grouped queryset update() rather than a validated save.
+# Mode isn't one of them as a save clears the VLANs of a port that is no longer tagged.
+PORT_UPDATE_FIELDS = frozenset(["description", "enabled", "mtu", "status"])
 
 
 class NautobotDevice(Device):
@@ -40,13 +43,22 @@ class NautobotDevice(Device):
     @classmethod
     def create(cls, diffsync, ids, attrs):
         """Create device object in Nautobot."""
+        diffsync.writer.add(
+            f"create Device {ids['name']}", lambda: cls._create_device(diffsync, ids, attrs), key=ids["name"]
+        )
+        return super().create(ids=ids, diffsync=diffsync, attrs=attrs)
+
+    @classmethod
+    def _create_device(cls, diffsync, ids, attrs):
+        """Create the Device and its software version in Nautobot."""
         PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
-        site_code, role_code = nautobot.parse_hostname(ids["name"].lower())
-        site_map = PLUGIN_SETTINGS.get("site_mappings")
-        role_map = PLUGIN_SETTINGS.get("role_mappings")
+        mappings = diffsync.hostname_mappings
+        site_code, role_code = nautobot.parse_hostname(ids["name"].lower(), mappings=mappings)
+        site_name = nautobot.get_site_from_map(site_code, mappings=mappings) if site_code else None
+        role_name = nautobot.get_role_from_map(role_code, mappings=mappings) if role_code else None
 
-        if site_code and site_code in site_map:
-            site = nautobot.verify_site(site_map[site_code])
+        if site_name:
+            site = nautobot.verify_site(site_name)
         elif "CloudVision" in ids["name"]:
             if PLUGIN_SETTINGS.get("controller_site"):
                 site = nautobot.verify_site(PLUGIN_SETTINGS["controller_site"])
@@ -55,9 +67,9 @@ class NautobotDevice(Device):
         else:
             site = nautobot.verify_site(PLUGIN_SETTINGS.get("from_cloudvision_default_site", DEFAULT_SITE))
 
-        if role_code and role_code in role_map:
+        if role_name:
             role = nautobot.verify_device_role_object(
-                role_map[role_code],
+                role_name,
                 PLUGIN_SETTINGS.get("from_cloudvision_default_device_role_color", DEFAULT_DEVICE_ROLE_COLOR),
             )
         elif "CloudVision" in ids["name"]:
@@ -84,22 +96,23 @@ class NautobotDevice(Device):
             name=ids["name"],
             serial=attrs["serial"] if attrs.get("serial") else "",
         )
+        new_device.validated_save()
         if PLUGIN_SETTINGS.get("apply_import_tag", APPLY_IMPORT_TAG):
             import_tag = nautobot.verify_import_tag()
             new_device.tags.add(import_tag)
-        try:
-            new_device.validated_save()
-            if LIFECYCLE_MGMT and attrs.get("version"):
-                software_lcm = cls._add_software_lcm(platform=platform.slug, version=attrs["version"])
-                cls._assign_version_to_device(diffsync=diffsync, device=new_device, software_lcm=software_lcm)
-            return super().create(ids=ids, diffsync=diffsync, attrs=attrs)
-        except ValidationError as err:
-            diffsync.job.log_warning(message=f"Unable to create Device {ids['name']}. {err}")
-            return None
+        if LIFECYCLE_MGMT and attrs.get("version"):
+            software_lcm = cls._add_software_lcm(platform=platform.slug, version=attrs["version"])
+            cls._assign_version_to_device(diffsync=diffsync, device=new_device, software_lcm=software_lcm)
 
     def update(self, attrs):
         """Update device object in Nautobot."""
-        dev = OrmDevice.objects.get(id=self.uuid)
+        self.diffsync.writer.add_save(
+            OrmDevice, self.uuid, f"update Device {self.name}", lambda dev: self._update_device(dev, attrs)
+        )
+        return super().update(attrs)
+
+    def _update_device(self, dev, attrs):
+        """Update the Device in Nautobot."""
         if not dev.platform:
             if dev.name != "CloudVision":
                 dev.platform = OrmPlatform.objects.get(slug="arista_eos")
@@ -112,12 +125,7 @@ class NautobotDevice(Device):
         if "version" in attrs and LIFECYCLE_MGMT:
             software_lcm = self._add_software_lcm(platform=dev.platform.slug, version=attrs["version"])
             self._assign_version_to_device(diffsync=self.diffsync, device=dev, software_lcm=software_lcm)
-        try:
-            dev.validated_save()
-            return super().update(attrs)
-        except ValidationError as err:
-            self.diffsync.job.log_warning(message=f"Unable to update Device {self.name}. {err}")
-            return None
+        dev.validated_save()
 
     def delete(self):
         """Delete device object in Nautobot."""
@@ -125,8 +133,7 @@ class NautobotDevice(Device):
             "delete_devices_on_sync", DEFAULT_DELETE_DEVICES_ON_SYNC
         ):
             self.diffsync.job.log_warning(message=f"Device {self.name} will be deleted per plugin settings.")
-            device = OrmDevice.objects.get(id=self.uuid)
-            device.delete()
+            self.diffsync.writer.add_delete(OrmDevice, self.uuid, f"Device {self.name}")
             super().delete()
         return self
 
@@ -174,6 +181,16 @@ class NautobotPort(Port):
     @classmethod
     def create(cls, diffsync, ids, attrs):
         """Create Interface in Nautobot."""
+        diffsync.writer.add(
+            f"create Interface {ids['name']} for {ids['device']}",
+            lambda: cls._create_interface(ids, attrs),
+            parent=ids["device"],
+        )
+        return super().create(ids=ids, diffsync=diffsync, attrs=attrs)
+
+    @staticmethod
+    def _create_interface(ids, attrs):
+        """Create the Interface in Nautobot."""
         device = OrmDevice.objects.get(name=ids["device"])
         new_port = OrmInterface(
             name=ids["name"],
@@ -186,16 +203,41 @@ class NautobotPort(Port):
             status=OrmStatus.objects.get(slug=attrs["status"]),
             type=attrs["port_type"],
         )
-        try:
-            new_port.validated_save()
-            return super().create(ids=ids, diffsync=diffsync, attrs=attrs)
-        except ValidationError as err:
-            diffsync.job.log_warning(message=err)
-            return None
+        new_port.validated_save()
 
     def update(self, attrs):
-        """Update Interface in Nautobot."""
-        _port = OrmInterface.objects.get(id=self.uuid)
+        """Update Interface in Nautobot.
+
+        Changes only to plain attributes and status, ie a port going down, need no validation so they are queued as
+        field updates to be written together with every other port getting the same values. Any other change is made
+        with a validated save.
+        """
+        if PORT_UPDATE_FIELDS.issuperset(attrs):
+            values = dict(attrs)
+            if "description" in values:
+                values["description"] = values["description"] or ""
+            if "enabled" in values:
+                values["enabled"] = is_truthy(values["enabled"])
+            if "status" in values:
+                try:
+                    values["status"] = self.diffsync.get_status(values["status"])
+                except ObjectDoesNotExist as err:
+                    self.diffsync.job.log_warning(
+                        message=f"Unable to update port {self.name} for {self.device} with {attrs}: {err}"
+                    )
+                    return None
+            self.diffsync.writer.add_update(OrmInterface, self.uuid, values)
+        else:
+            self.diffsync.writer.add_save(
+                OrmInterface,
+                self.uuid,
+                f"update port {self.name} for {self.device} with {attrs}",
+                lambda port: self._update_interface(port, attrs),
+            )
+        return super().update(attrs)
+
+    def _update_interface(self, _port, attrs):
+        """Update the Interface in Nautobot."""
         if "description" in attrs:
             description = ""
             if attrs.get("description"):
@@ -210,17 +252,10 @@ class NautobotPort(Port):
         if "mtu" in attrs:
             _port.mtu = attrs["mtu"]
         if "status" in attrs:
-            _port.status = OrmStatus.objects.get(slug=attrs["status"])
+            _port.status = self.diffsync.get_status(attrs["status"])
         if "port_type" in attrs:
             _port.type = attrs["port_type"]
-        try:
-            _port.validated_save()
-            return super().update(attrs)
-        except ValidationError as err:
-            self.diffsync.job.log_warning(
-                message=f"Unable to update port {self.name} for {self.device} with {attrs}: {err}"
-            )
-            return None
+        _port.validated_save()
 
     def delete(self):
         """Delete Interface in Nautobot."""
@@ -228,8 +263,7 @@ class NautobotPort(Port):
             super().delete()
             if self.diffsync.job.kwargs.get("debug"):
                 self.diffsync.job.log_warning(message=f"Interface {self.name} for {self.device} will be deleted.")
-            _port = OrmInterface.objects.get(id=self.uuid)
-            _port.delete()
+            self.diffsync.writer.add_delete(OrmInterface, self.uuid, f"Interface {self.name} for {self.device}")
         return self
 
 
@@ -239,6 +273,16 @@ class NautobotIPAddress(IPAddress):
     @classmethod
     def create(cls, diffsync, ids, attrs):
         """Create IPAddress in Nautobot."""
+        diffsync.writer.add(
+            f"create IPAddress {ids['address']} for {ids['device']}",
+            lambda: cls._create_ip_address(diffsync, ids),
+            parent=ids["device"],
+        )
+        return super().create(ids=ids, diffsync=diffsync, attrs=attrs)
+
+    @staticmethod
+    def _create_ip_address(diffsync, ids):
+        """Create the IPAddress in Nautobot and assign it to its Interface."""
         dev = OrmDevice.objects.get(name=ids["device"])
         new_ip = OrmIPAddress(
             address=ids["address"],
@@ -260,7 +304,6 @@ class NautobotIPAddress(IPAddress):
                 dev.validated_save()
         except OrmInterface.DoesNotExist as err:
             diffsync.job.log_warning(message=f"Unable to find Interface {ids['interface']} for {ids['device']}. {err}")
-        return super().create(ids=ids, diffsync=diffsync, attrs=attrs)
 
 
 class NautobotCustomField(CustomField):
@@ -274,17 +317,22 @@ class NautobotCustomField(CustomField):
         except ValueError:
             # value isn't convertable to bool so continue
             pass
-        device = OrmDevice.objects.get(name=ids["device_name"])
-        try:
-            device.custom_field_data.update({ids["name"]: attrs["value"]})
-            device.validated_save()
-        except ValidationError:
-            if ids["name"] not in MISSING_CUSTOM_FIELDS:
-                diffsync.job.log_warning(
-                    message=f"Custom field {ids['name']} is not defined. You can create the custom field in the Admin UI."
-                )
-            MISSING_CUSTOM_FIELDS.append(ids["name"])
 
+        def set_custom_field():
+            device = OrmDevice.objects.get(name=ids["device_name"])
+            try:
+                device.custom_field_data.update({ids["name"]: attrs["value"]})
+                device.validated_save()
+            except ValidationError:
+                if ids["name"] not in MISSING_CUSTOM_FIELDS:
+                    diffsync.job.log_warning(
+                        message=f"Custom field {ids['name']} is not defined. You can create the custom field in the Admin UI."
+                    )
+                MISSING_CUSTOM_FIELDS.append(ids["name"])
+
+        diffsync.writer.add(
+            f"set Custom Field {ids['name']} on {ids['device_name']}", set_custom_field, parent=ids["device_name"]
+        )
         return super().create(ids=ids, diffsync=diffsync, attrs=attrs)
 
     def update(self, attrs):
@@ -294,19 +342,27 @@ class NautobotCustomField(CustomField):
         except ValueError:
             # value isn't convertable to bool so continue
             pass
-        device = OrmDevice.objects.get(name=self.device_name)
-        device.custom_field_data.update({self.name: attrs["value"]})
-        device.validated_save()
+
+        def set_custom_field():
+            device = OrmDevice.objects.get(name=self.device_name)
+            device.custom_field_data.update({self.name: attrs["value"]})
+            device.validated_save()
+
+        self.diffsync.writer.add(f"update Custom Field {self.name} on {self.device_name}", set_custom_field)
         return super().update(attrs)
 
     def delete(self):
         """Delete Custom Field in Nautobot."""
-        try:
-            device = OrmDevice.objects.get(name=self.device_name)
+
+        def clear_custom_field():
+            try:
+                device = OrmDevice.objects.get(name=self.device_name)
+            except OrmDevice.DoesNotExist:
+                # Do not need to delete customfield if the device does not exist.
+                return
             device.custom_field_data.update({self.name: None})
             device.validated_save()
-            super().delete()
-            return self
-        except OrmDevice.DoesNotExist:
-            # Do not need to delete customfield if the device does not exist.
-            return self
+
+        self.diffsync.writer.add(f"delete Custom Field {self.name} on {self.device_name}", clear_custom_field)
+        super().delete()
+        return self
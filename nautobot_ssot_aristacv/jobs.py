@@ -1,27 +1,75 @@
 # pylint: disable=invalid-name,too-few-public-methods
 """Jobs for CloudVision integration with SSoT plugin."""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import List, Optional, Set
+
+from django import db
 from django.conf import settings
 from django.templatetags.static import static
 from django.urls import reverse
 
+from nautobot.dcim.models import Device as OrmDevice
 from nautobot.dcim.models import DeviceType
 from nautobot.extras.jobs import Job, BooleanVar
+from nautobot.extras.models import JobResult
 from nautobot.utilities.utils import get_route_for_model
 from nautobot_ssot.jobs.base import DataTarget, DataSource, DataMapping
 
 from nautobot_ssot_aristacv.diffsync.adapters.cloudvision import CloudvisionAdapter
 from nautobot_ssot_aristacv.diffsync.adapters.nautobot import NautobotAdapter
 from nautobot_ssot_aristacv.diffsync.models import nautobot
-from nautobot_ssot_aristacv.utils.cloudvision import CloudvisionApi
+from nautobot_ssot_aristacv.utils import cloudvision
+from nautobot_ssot_aristacv.utils.nautobot import DeleteBudget
 
 
 name = "SSoT - Arista CloudVision"  # pylint: disable=invalid-name
 
 
+def log_rpc_timings(job: Job):
+    """Log the timings of the calls made to CloudVision during the sync if debug logging is enabled."""
+    if job.kwargs.get("debug"):
+        for call_type, timings in cloudvision.RPC_TIMINGS.summary().items():
+            job.log_debug(message=f"CloudVision {call_type} calls: {timings}")
+
+
+class DeferredJobLog:
+    """Stands in for a Job in a worker thread, holding its log messages until the Job's own thread replays them.
+
+    Logging writes to the database, so it's kept to the Job's own thread and its database connection.
+
+    Args:
+        job (Job): The Job the messages are logged to.
+    """
+
+    def __init__(self, job: Job):
+        """Initialize the log."""
+        self.job = job
+        self.messages = []
+
+    def __getattr__(self, name: str):
+        """Hold calls to the Job's log methods and pass anything else through to the Job."""
+        if name == "log" or name.startswith("log_"):
+            return partial(self._defer, name)
+        return getattr(self.job, name)
+
+    def _defer(self, method: str, *args, **kwargs):
+        """Hold a call to a log method."""
+        self.messages.append((method, args, kwargs))
+
+    def replay(self):
+        """Log the held messages to the Job, in the order they were logged."""
+        messages, self.messages = self.messages, []
+        for method, args, kwargs in messages:
+            getattr(self.job, method)(*args, **kwargs)
+
+
 class CloudVisionDataSource(DataSource, Job):  # pylint: disable=abstract-method
     """CloudVision SSoT Data Source."""
 
     debug = BooleanVar(description="Enable for more verbose debug logging")
+    rerun_failed = BooleanVar(description="Only sync the devices that failed to load in the last run")
 
     class Meta:
         """Meta data for DataSource."""
@@ -57,7 +105,18 @@ class CloudVisionDataSource(DataSource, Job):  # pylint: disable=abstract-method
                 "from_cloudvision_default_device_role_color", nautobot.DEFAULT_DEVICE_ROLE_COLOR
             ),
             "Apply import tag": str(PLUGIN_SETTINGS.get("apply_import_tag", nautobot.APPLY_IMPORT_TAG)),
-            "Import Active": str(PLUGIN_SETTINGS.get("import_active", "True"))
+            "Import Active": str(PLUGIN_SETTINGS.get("import_active", "True")),
+            "Per-device sync": str(PLUGIN_SETTINGS.get("per_device_sync", False)),
+            "Pool connections": str(PLUGIN_SETTINGS.get("pool_connections", False)),
+            "Scoped Nautobot load": str(PLUGIN_SETTINGS.get("scoped_nautobot_load", False)),
+            "IP discovery via Search API": str(PLUGIN_SETTINGS.get("ip_discovery_search", False)),
+            "Device failure budget": str(
+                PLUGIN_SETTINGS.get("device_failure_budget", cloudvision.DEVICE_FAILURE_BUDGET)
+            ),
+            "CloudVision instances": ", ".join(
+                instance.get("name", "") for instance in PLUGIN_SETTINGS.get("instances") or []
+            )
+            or "-",
             # Password and Token are intentionally omitted!
         }
 
@@ -83,9 +142,39 @@ class CloudVisionDataSource(DataSource, Job):  # pylint: disable=abstract-method
             DataMapping("topology_type", None, "Topology Type", None),
         )
 
+    def sync_data(self):
+        """Sync the data, recording the timings of the calls made to CloudVision."""
+        cloudvision.RPC_TIMINGS.reset()
+        super().sync_data()
+        log_rpc_timings(self)
+
+    def get_last_failed_devices(self) -> Set[str]:
+        """Returns the hostnames of the devices that failed to load in the last run of this Job."""
+        last_result = (
+            JobResult.objects.filter(name=self.class_path, data__has_key="failed_devices")
+            .exclude(pk=self.job_result.pk)
+            .order_by("-created")
+            .first()
+        )
+        return set(last_result.data["failed_devices"]) if last_result else set()
+
+    def setup_quarantine(self):
+        """Create the quarantine shared by every CloudVision adapter and find the devices to rerun, if any.
+
+        The quarantined devices are recorded in the JobResult so a later run with `rerun_failed` can sync only them.
+        """
+        self.quarantine = cloudvision.DeviceQuarantine.from_settings(
+            devices=self.results.setdefault("failed_devices", {}) if self.results is not None else None
+        )
+        self.rerun_devices: Optional[Set[str]] = None
+        if self.kwargs.get("rerun_failed"):
+            self.rerun_devices = self.get_last_failed_devices()
+            self.log_info(message=f"Rerunning {len(self.rerun_devices)} devices that failed to load in the last run.")
+
     def load_source_adapter(self):
         """Load data from CloudVision into DiffSync models."""
         PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
+        self.setup_quarantine()
         if self.kwargs.get("debug"):
             if PLUGIN_SETTINGS.get("delete_devices_on_sync"):
                 self.log_warning(
@@ -96,24 +185,235 @@ class CloudVisionDataSource(DataSource, Job):  # pylint: disable=abstract-method
                     message="Devices not present in Cloudvision but present in Nautobot will not be deleted from Nautobot."
                 )
             self.log("Connecting to CloudVision")
-        with CloudvisionApi(
-            cvp_host=PLUGIN_SETTINGS["cvp_host"],
-            cvp_port=PLUGIN_SETTINGS.get("cvp_port", "8443"),
-            verify=PLUGIN_SETTINGS["verify"],
-            username=PLUGIN_SETTINGS["cvp_user"],
-            password=PLUGIN_SETTINGS["cvp_password"],
-            cvp_token=PLUGIN_SETTINGS["cvp_token"],
-        ) as client:
+        instances = cloudvision.get_instances()
+        if PLUGIN_SETTINGS.get("per_device_sync"):
+            # Devices are loaded, diffed and synced a batch at a time by sync_per_device() so only the controller is
+            # loaded here.
+            self.source_adapter = CloudvisionAdapter(job=self, conn=None, quarantine=self.quarantine)
+            self.source_adapter.check_hostname_mappings()
+            if PLUGIN_SETTINGS.get("create_controller"):
+                if instances:
+                    with cloudvision.cloudvision_connection(**cloudvision.connection_settings(instances[0])) as client:
+                        self.source_adapter.conn = client
+                        self.source_adapter.load_controller()
+                else:
+                    self.source_adapter.load_controller()
+            return
+        if instances:
+            self.load_instances(instances)
+            return
+        with cloudvision.cloudvision_connection() as client:
             self.log("Loading data from CloudVision")
-            self.source_adapter = CloudvisionAdapter(job=self, conn=client)
+            self.source_adapter = CloudvisionAdapter(
+                job=self, conn=client, devices=self.rerun_devices, quarantine=self.quarantine
+            )
             self.source_adapter.load()
 
+    def load_instance(self, instance: dict) -> CloudvisionAdapter:
+        """Load the data from a single CloudVision instance into its own adapter.
+
+        This runs in a worker thread so the adapter logs to a `DeferredJobLog`, replayed once every instance is loaded.
+
+        Args:
+            instance (dict): Settings of the CloudVision instance from the `instances` plugin setting.
+        """
+        job_log = DeferredJobLog(self)
+        try:
+            with cloudvision.cloudvision_connection(**cloudvision.connection_settings(instance)) as client:
+                job_log.log(f"Loading data from CloudVision instance {instance['name']}")
+                adapter = CloudvisionAdapter(
+                    job=job_log,
+                    conn=client,
+                    instance=instance["name"],
+                    devices=self.rerun_devices,
+                    quarantine=self.quarantine,
+                )
+                adapter.load()
+            return adapter
+        finally:
+            self.deferred_logs.append(job_log)
+            # Database connections are per thread so any opened by this thread must be closed by it.
+            db.connections.close_all()
+
+    def load_instances(self, instances: List[dict]):
+        """Load every CloudVision instance in parallel and merge them into a single source adapter.
+
+        Instances are merged in the order they're configured so a Device found in more than one instance is taken
+        from the first.
+
+        Args:
+            instances (List[dict]): Settings of each CloudVision instance from the `instances` plugin setting.
+        """
+        self.source_adapter = CloudvisionAdapter(job=self, conn=None, quarantine=self.quarantine)
+        self.deferred_logs: List[DeferredJobLog] = []
+        try:
+            with ThreadPoolExecutor(max_workers=len(instances)) as executor:
+                adapters = list(executor.map(self.load_instance, instances))
+        finally:
+            for job_log in self.deferred_logs:
+                job_log.replay()
+        for adapter in adapters:
+            adapter.job = self
+            self.source_adapter.merge(adapter)
+            self.log_info(
+                message=f"Loaded {len(adapter.get_all(adapter.device))} devices from CloudVision instance {adapter.instance}."
+            )
+
     def load_target_adapter(self):
         """Load data from Nautobot into DiffSync models."""
+        PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
         self.log("Loading data from Nautobot")
-        self.target_adapter = NautobotAdapter(job=self)
+        # Shared by every Nautobot adapter so max_deletes_per_sync applies to the whole Job in per-device mode too.
+        self.delete_budget = DeleteBudget.from_settings()
+        # Writes to Nautobot that failed, or were dropped as what they depended on failed, recorded in the JobResult.
+        self.failed_writes: List[str] = self.results.setdefault("failed_writes", []) if self.results is not None else []
+        if PLUGIN_SETTINGS.get("per_device_sync"):
+            controller = ["CloudVision"] if PLUGIN_SETTINGS.get("create_controller") else []
+            self.target_adapter = NautobotAdapter(job=self, devices=controller, delete_budget=self.delete_budget)
+        elif PLUGIN_SETTINGS.get("scoped_nautobot_load") or self.rerun_devices is not None:
+            # Devices that weren't rerun are out of scope too, so aren't deleted.
+            devices = [device.name for device in self.source_adapter.get_all(self.source_adapter.device)]
+            self.target_adapter = NautobotAdapter(job=self, devices=devices, delete_budget=self.delete_budget)
+        else:
+            # Quarantined devices weren't loaded from CloudVision, leaving them out here keeps them from being deleted.
+            self.target_adapter = NautobotAdapter(
+                job=self, exclude_devices=self.quarantine, delete_budget=self.delete_budget
+            )
         self.target_adapter.load()
 
+    def calculate_diff(self):
+        """Calculate the diff, only diffing the devices here on a dry-run if per_device_sync is enabled.
+
+        Otherwise, in per-device mode, the devices are diffed as they're synced by execute_sync().
+        """
+        super().calculate_diff()
+        if settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("per_device_sync") and self.kwargs.get("dry_run"):
+            self.sync_per_device(commit=False)
+
+    def execute_sync(self):
+        """Sync the diff from CloudVision to Nautobot, then each batch of devices if per_device_sync is enabled."""
+        # In per-device mode this syncs the controller, which has to exist before Relationships can be made to it.
+        super().execute_sync()
+        self.failed_writes.extend(self.target_adapter.writer.failed)
+        if settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("per_device_sync"):
+            self.sync_per_device(commit=True)
+        elif self.delete_budget.skipped or self.failed_writes:
+            self.sync.summary = self.summarize_sync(self.sync.summary or self.diff.summary())
+            self.sync.save()
+        if self.failed_writes:
+            self.log_failure(
+                message=f"{len(self.failed_writes)} writes to Nautobot failed, see the warnings logged for each."
+            )
+
+    def iter_unseen_devices(self, client: cloudvision.CloudvisionApi, seen_devices: Set[str]):
+        """Stream the devices of a CloudVision instance that are to be synced and weren't already seen.
+
+        Args:
+            client (CloudvisionApi): Connection to the CloudVision instance.
+            seen_devices (Set[str]): Hostnames of the devices already synced, ie from an earlier instance.
+
+        Yields:
+            DeviceRecord: Devices to be synced.
+        """
+        for dev in cloudvision.iter_devices(client=client.comm_channel):
+            if self.rerun_devices is not None and dev.hostname not in self.rerun_devices:
+                continue
+            if dev.hostname in seen_devices:
+                self.log_warning(message=f"Duplicate device {dev.hostname} {dev.device_id} found and ignored.")
+                continue
+            yield dev
+
+    def sync_per_device(self, commit: bool):
+        """Load, diff and, if committing, sync the CloudVision devices a batch of `device_batch_size` at a time.
+
+        Only a batch of devices, their ports, IP addresses and custom fields are held in memory from each side, and
+        only the summary of the diff is kept. Devices in Nautobot that weren't found in CloudVision are reconciled in
+        batches once all devices are done.
+
+        Args:
+            commit (bool): Whether to sync the diff of each batch, or only count it for a dry-run.
+        """
+        batch_size = max(
+            settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("device_batch_size", cloudvision.DEVICE_BATCH_SIZE),
+            1,
+        )
+        summary = dict(self.diff.summary())
+        seen_devices = set(self.target_adapter.devices)
+        # Several CloudVision instances are processed one after another so only one batch is held at a time.
+        for instance in cloudvision.get_instances() or [None]:
+            with cloudvision.cloudvision_connection(**cloudvision.connection_settings(instance)) as client:
+                ip_interfaces = CloudvisionAdapter(job=self, conn=client).discover_ip_interfaces()
+                devices = self.iter_unseen_devices(client=client, seen_devices=seen_devices)
+                batch = list(islice(devices, batch_size))
+                while batch:
+                    source = CloudvisionAdapter(
+                        job=self,
+                        conn=client,
+                        instance=instance["name"] if instance else None,
+                        ip_interfaces=ip_interfaces,
+                        quarantine=self.quarantine,
+                    )
+                    names = [device.name for device in source.load_device_batch(batch)]
+                    seen_devices.update(names)
+                    # Quarantined devices are left out of the final pass so they aren't deleted.
+                    seen_devices.update(dev.hostname for dev in batch if dev.hostname in self.quarantine)
+                    if names:
+                        target = NautobotAdapter(job=self, devices=names, delete_budget=self.delete_budget)
+                        self._sync_partial(source=source, target=target, summary=summary, commit=commit)
+                    batch = list(islice(devices, batch_size))
+
+        # Anything left in Nautobot wasn't found in CloudVision so is diffed against an empty source, unless only
+        # the failed devices were rerun. Only the names are read here, each batch is loaded by name in chunks.
+        if self.rerun_devices is None:
+            names = (
+                name
+                for name in OrmDevice.objects.filter(device_type__manufacturer__slug="arista")
+                .values_list("name", flat=True)
+                .iterator()
+                if name and name not in seen_devices
+            )
+            batch = list(islice(names, batch_size))
+            while batch:
+                source = CloudvisionAdapter(job=self, conn=None, quarantine=self.quarantine)
+                target = NautobotAdapter(job=self, devices=batch, delete_budget=self.delete_budget)
+                self._sync_partial(source=source, target=target, summary=summary, commit=commit)
+                batch = list(islice(names, batch_size))
+
+        self.sync.summary = self.summarize_sync(summary)
+        self.sync.save()
+        self.log_info(message=self.sync.summary)
+
+    def summarize_sync(self, summary: dict) -> dict:
+        """Adjust a diff summary for what actually happened in the sync, ie skipped deletions and failed writes."""
+        summary = self.skip_deletes(summary)
+        if self.failed_writes:
+            summary = dict(summary)
+            summary["failed"] = summary.get("failed", 0) + len(self.failed_writes)
+        return summary
+
+    def skip_deletes(self, summary: dict) -> dict:
+        """Move the deletions skipped for exceeding `max_deletes_per_sync` from `delete` to `skip` in a diff summary."""
+        skipped = self.delete_budget.skipped
+        if not skipped:
+            return summary
+        summary = dict(summary)
+        summary["delete"] = max(summary.get("delete", 0) - skipped, 0)
+        summary["skip"] = summary.get("skip", 0) + skipped
+        return summary
+
+    def _sync_partial(self, source: CloudvisionAdapter, target: NautobotAdapter, summary: dict, commit: bool):
+        """Load the Nautobot side of a batch of devices, then diff and, if committing, sync it into the summary."""
+        target.load()
+        partial_diff = source.diff_to(target, flags=self.diffsync_flags)
+        partial_summary = partial_diff.summary()
+        for action, count in partial_summary.items():
+            summary[action] = summary.get(action, 0) + count
+        if self.kwargs.get("debug"):
+            self.log_debug(message=f"Diff of {', '.join(sorted(target.devices))}: {partial_summary}")
+        if commit and partial_diff.has_diffs():
+            source.sync_to(target, flags=self.diffsync_flags, diff=partial_diff)
+            self.failed_writes.extend(target.writer.failed)
+
 
 class CloudVisionDataTarget(DataTarget, Job):  # pylint: disable=abstract-method
     """CloudVision SSoT Data Target."""
@@ -151,6 +451,23 @@ class CloudVisionDataTarget(DataTarget, Job):  # pylint: disable=abstract-method
         """List describing the data mappings involved in this DataTarget."""
         return (DataMapping("Tags", reverse("extras:tag_list"), "Device Tags", None),)
 
+    def sync_data(self):
+        """Sync the data, recording the timings of the calls made to CloudVision.
+
+        The connection to CloudVision is held open for the whole sync so tag changes are applied over it too.
+        """
+        if cloudvision.get_instances():
+            # The tags of each device would have to be applied to the instance it was loaded from.
+            self.log_failure(
+                message="Syncing to several CloudVision instances isn't supported. Remove the `instances` setting to sync to the top level CloudVision settings."
+            )
+            return
+        cloudvision.RPC_TIMINGS.reset()
+        with cloudvision.cloudvision_connection() as client:
+            self.client = client
+            super().sync_data()
+        log_rpc_timings(self)
+
     def load_source_adapter(self):
         """Load data from Nautobot into DiffSync models."""
         self.log("Loading data from Nautobot")
@@ -170,17 +487,9 @@ class CloudVisionDataTarget(DataTarget, Job):  # pylint: disable=abstract-method
                     message="Devices not present in Cloudvision but present in Nautobot will not be deleted from Nautobot."
                 )
             self.log("Connecting to CloudVision")
-        with CloudvisionApi(
-            cvp_host=PLUGIN_SETTINGS["cvp_host"],
-            cvp_port=PLUGIN_SETTINGS.get("cvp_port", "8443"),
-            verify=PLUGIN_SETTINGS["verify"],
-            username=PLUGIN_SETTINGS["cvp_user"],
-            password=PLUGIN_SETTINGS["cvp_password"],
-            cvp_token=PLUGIN_SETTINGS["cvp_token"],
-        ) as client:
-            self.log("Loading data from CloudVision")
-            self.target_adapter = CloudvisionAdapter(job=self, conn=client)
-            self.target_adapter.load()
+        self.log("Loading data from CloudVision")
+        self.target_adapter = CloudvisionAdapter(job=self, conn=self.client)
+        self.target_adapter.load()
 
 
 jobs = [CloudVisionDataSource, CloudVisionDataTarget]
@@ -1,6 +1,8 @@
 """Unit tests for the Cloudvision DiffSync adapter class."""
 import uuid
 from unittest.mock import MagicMock, patch
+
+import grpc
 from django.test import override_settings
 from django.contrib.contenttypes.models import ContentType
 
@@ -8,6 +10,14 @@ from nautobot.extras.models import Job, JobResult
 from nautobot.utilities.testing import TransactionTestCase
 from nautobot_ssot_aristacv.diffsync.adapters.cloudvision import CloudvisionAdapter
 from nautobot_ssot_aristacv.jobs import CloudVisionDataSource
+from nautobot_ssot_aristacv.utils.cloudvision import (
+    DeviceData,
+    DeviceDataError,
+    DeviceRecord,
+    FailureBudgetExceeded,
+    InterfaceRecord,
+    IPInterfaceRecord,
+)
 from nautobot_ssot_aristacv.tests.fixtures import fixtures
 
 
@@ -23,21 +33,23 @@ class CloudvisionAdapterTestCase(TransactionTestCase):
 
         self.cloudvision = MagicMock()
         self.cloudvision.get_devices = MagicMock()
-        self.cloudvision.get_devices.return_value = fixtures.DEVICE_FIXTURE
+        self.cloudvision.get_devices.return_value = [DeviceRecord(**dev) for dev in fixtures.DEVICE_FIXTURE]
         self.cloudvision.get_tags_by_type = MagicMock()
         self.cloudvision.get_tags_by_type.return_value = []
-        self.cloudvision.get_device_type = MagicMock()
-        self.cloudvision.get_device_type.return_value = "fixedSystem"
-        self.cloudvision.get_interfaces_fixed = MagicMock()
-        self.cloudvision.get_interfaces_fixed.return_value = fixtures.FIXED_INTERFACE_FIXTURE
-        self.cloudvision.get_interface_mode = MagicMock()
-        self.cloudvision.get_interface_mode.return_value = "access"
-        self.cloudvision.get_interface_transceiver = MagicMock()
-        self.cloudvision.get_interface_transceiver.return_value = "1000BASE-T"
-        self.cloudvision.get_interface_description = MagicMock()
-        self.cloudvision.get_interface_description.return_value = "Uplink to DC1"
+        self.cloudvision.get_interfaces = MagicMock()
+        self.cloudvision.get_interfaces.return_value = [
+            InterfaceRecord(**intf) for intf in fixtures.FIXED_INTERFACE_FIXTURE
+        ]
+        self.cloudvision.get_interface_modes = MagicMock()
+        self.cloudvision.get_interface_modes.return_value = {"Ethernet1/1": "access"}
+        self.cloudvision.get_interface_transceivers = MagicMock()
+        self.cloudvision.get_interface_transceivers.return_value = {"Ethernet1": "1000BASE-T"}
+        self.cloudvision.get_interface_descriptions = MagicMock()
+        self.cloudvision.get_interface_descriptions.return_value = {"Ethernet1/1": "Uplink to DC1"}
         self.cloudvision.get_ip_interfaces = MagicMock()
-        self.cloudvision.get_ip_interfaces.return_value = fixtures.IP_INTF_FIXTURE
+        self.cloudvision.get_ip_interfaces.return_value = [
+            IPInterfaceRecord(**intf) for intf in fixtures.IP_INTF_FIXTURE
+        ]
 
         self.job = CloudVisionDataSource()
         self.job.job_result = JobResult.objects.create(
@@ -45,20 +57,157 @@ class CloudvisionAdapterTestCase(TransactionTestCase):
         )
         self.cvp = CloudvisionAdapter(job=self.job, conn=self.client)
 
-    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"create_controller": False}})
+    def device_data(self):
+        """Returns a get_devices_data mock giving each device the fixed interface fixture."""
+        data = DeviceData(
+            interfaces=[InterfaceRecord(**intf) for intf in fixtures.FIXED_INTERFACE_FIXTURE],
+            transceivers={},
+            descriptions={"Ethernet1/1": "Uplink to DC1"},
+            modes={"Ethernet1/1": "trunk"},
+            ip_interfaces=[],
+        )
+        return MagicMock(side_effect=lambda client, dIds, ip_interfaces: {dId: data for dId in dIds})
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"create_controller": False, "device_batch_size": 1}})
     def test_load_devices(self):
-        """Test the load_devices() adapter method."""
-        with patch("nautobot_ssot_aristacv.utils.cloudvision.get_devices", self.cloudvision.get_devices):
-            with patch("nautobot_ssot_aristacv.utils.cloudvision.get_device_type", self.cloudvision.get_device_type):
-                with patch(
-                    "nautobot_ssot_aristacv.utils.cloudvision.get_interfaces_fixed",
-                    self.cloudvision.get_interfaces_fixed,
-                ):
+        """Test the load_devices() adapter method fetches each device's data with one get_devices_data call."""
+        device_ids = [dev["device_id"] for dev in fixtures.DEVICE_FIXTURE]
+        mock_get_devices_data = self.device_data()
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.iter_devices", self.cloudvision.get_devices):
+            with patch("nautobot_ssot_aristacv.utils.cloudvision.get_devices_data", mock_get_devices_data):
+                with patch("nautobot_ssot_aristacv.utils.cloudvision.get_interfaces", self.cloudvision.get_interfaces):
                     self.cvp.load_devices()
         self.assertEqual(
             {dev["hostname"] for dev in fixtures.DEVICE_FIXTURE},
             {dev.get_unique_id() for dev in self.cvp.get_all("device")},
         )
+        self.assertEqual(
+            [call.kwargs["dIds"] for call in mock_get_devices_data.call_args_list], [[i] for i in device_ids]
+        )
+        self.cloudvision.get_interfaces.assert_not_called()
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"create_controller": False}})
+    def test_load_devices_batch_retried_per_device(self):
+        """Test a batch whose data can't be fetched is retried with get_devices_data one device at a time."""
+        device_ids = [dev["device_id"] for dev in fixtures.DEVICE_FIXTURE]
+        per_device = self.device_data()
+
+        def get_devices_data(client, dIds, ip_interfaces):
+            if len(dIds) > 1:
+                raise grpc.RpcError()
+            return per_device(client=client, dIds=dIds, ip_interfaces=ip_interfaces)
+
+        mock_get_devices_data = MagicMock(side_effect=get_devices_data)
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.iter_devices", self.cloudvision.get_devices):
+            with patch("nautobot_ssot_aristacv.utils.cloudvision.get_devices_data", mock_get_devices_data):
+                self.cvp.load_devices()
+        self.assertEqual(
+            [call.kwargs["dIds"] for call in mock_get_devices_data.call_args_list],
+            [device_ids] + [[i] for i in device_ids],
+        )
+        self.assertEqual(len(self.cvp.get_all("device")), len(device_ids))
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"create_controller": False}})
+    def test_load_devices_batched(self):
+        """Test the load_devices() adapter method fetches the interface data of a batch of devices together by default."""
+        data = DeviceData(
+            interfaces=[InterfaceRecord(**intf) for intf in fixtures.FIXED_INTERFACE_FIXTURE],
+            transceivers={},
+            descriptions={"Ethernet1/1": "Uplink to DC1"},
+            modes={"Ethernet1/1": "trunk"},
+            ip_interfaces=[],
+        )
+        device_ids = [dev["device_id"] for dev in fixtures.DEVICE_FIXTURE]
+        mock_get_devices_data = MagicMock(return_value={device_id: data for device_id in device_ids})
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.iter_devices", self.cloudvision.get_devices):
+            with patch("nautobot_ssot_aristacv.utils.cloudvision.get_devices_data", mock_get_devices_data):
+                with patch("nautobot_ssot_aristacv.utils.cloudvision.get_interfaces", self.cloudvision.get_interfaces):
+                    self.cvp.load_devices()
+        mock_get_devices_data.assert_called_once_with(client=self.client, dIds=device_ids, ip_interfaces=True)
+        self.cloudvision.get_interfaces.assert_not_called()
+        hostname = fixtures.DEVICE_FIXTURE[0]["hostname"]
+        self.assertEqual(self.cvp.get("port", f"Ethernet1/1__{hostname}").description, "Uplink to DC1")
+        self.assertEqual(self.cvp.get("port", f"Ethernet1/1__{hostname}").mode, "tagged")
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"create_controller": False, "device_batch_size": 1}})
+    def test_load_devices_quarantines_failed_device(self):
+        """Test a device failing to load is skipped and quarantined without failing the others."""
+        failed = fixtures.DEVICE_FIXTURE[0]
+
+        def iter_device_tags(client, device_id):  # pylint: disable=unused-argument
+            if device_id == failed["device_id"]:
+                raise grpc.RpcError()
+            return iter([])
+
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.iter_devices", self.cloudvision.get_devices):
+            with patch("nautobot_ssot_aristacv.utils.cloudvision.get_devices_data", self.device_data()):
+                with patch("nautobot_ssot_aristacv.utils.cloudvision.iter_device_tags", iter_device_tags):
+                    self.cvp.load_devices()
+        self.assertEqual(
+            {dev["hostname"] for dev in fixtures.DEVICE_FIXTURE[1:]},
+            {dev.get_unique_id() for dev in self.cvp.get_all("device")},
+        )
+        self.assertFalse([port for port in self.cvp.get_all("port") if port.device == failed["hostname"]])
+        self.assertIn(failed["hostname"], self.cvp.quarantine)
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"create_controller": False, "device_batch_size": 1}})
+    def test_load_devices_quarantines_malformed_device(self):
+        """Test a device whose data can't be parsed is quarantined like one CloudVision failed to return."""
+        failed = fixtures.DEVICE_FIXTURE[0]
+
+        per_device = self.device_data()
+
+        def get_devices_data(client, dIds, ip_interfaces):
+            if failed["device_id"] in dIds:
+                raise DeviceDataError("Unable to parse interfaces")
+            return per_device(client=client, dIds=dIds, ip_interfaces=ip_interfaces)
+
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.iter_devices", self.cloudvision.get_devices):
+            with patch("nautobot_ssot_aristacv.utils.cloudvision.get_devices_data", get_devices_data):
+                self.cvp.load_devices()
+        self.assertNotIn(failed["hostname"], {dev.get_unique_id() for dev in self.cvp.get_all("device")})
+        self.assertIn(failed["hostname"], self.cvp.quarantine)
+
+    @override_settings(
+        PLUGINS_CONFIG={
+            "nautobot_ssot_aristacv": {"create_controller": False, "device_batch_size": 1, "device_failure_budget": 0}
+        }
+    )
+    def test_load_devices_failure_budget_malformed(self):
+        """Test devices failing with malformed data count against the failure budget."""
+        self.cvp = CloudvisionAdapter(job=self.job, conn=self.client)
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.iter_devices", self.cloudvision.get_devices):
+            with patch(
+                "nautobot_ssot_aristacv.utils.cloudvision.get_devices_data", MagicMock(side_effect=DeviceDataError())
+            ):
+                with self.assertRaises(FailureBudgetExceeded):
+                    self.cvp.load_devices()
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"create_controller": False, "device_batch_size": 1}})
+    def test_load_devices_unexpected_error_propagates(self):
+        """Test an error that isn't an RPC or data error is raised rather than quarantining the device."""
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.iter_devices", self.cloudvision.get_devices):
+            with patch(
+                "nautobot_ssot_aristacv.utils.cloudvision.get_devices_data", MagicMock(side_effect=AttributeError())
+            ):
+                with self.assertRaises(AttributeError):
+                    self.cvp.load_devices()
+        self.assertFalse(self.cvp.quarantine)
+
+    @override_settings(
+        PLUGINS_CONFIG={
+            "nautobot_ssot_aristacv": {"create_controller": False, "device_batch_size": 1, "device_failure_budget": 0}
+        }
+    )
+    def test_load_devices_failure_budget(self):
+        """Test loading is aborted once more devices have failed than the failure budget allows."""
+        self.cvp = CloudvisionAdapter(job=self.job, conn=self.client)
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.iter_devices", self.cloudvision.get_devices):
+            with patch(
+                "nautobot_ssot_aristacv.utils.cloudvision.get_devices_data", MagicMock(side_effect=grpc.RpcError())
+            ):
+                with self.assertRaises(FailureBudgetExceeded):
+                    self.cvp.load_devices()
 
     def test_load_interfaces(self):
         """Test the load_interfaces() adapter method."""
@@ -69,26 +218,27 @@ class CloudvisionAdapterTestCase(TransactionTestCase):
         mock_device.device_model = MagicMock()
         mock_device.device_model.return_value = "DCS-7280CR2-60"
 
-        with patch("nautobot_ssot_aristacv.utils.cloudvision.get_device_type", self.cloudvision.get_device_type):
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.get_interfaces", self.cloudvision.get_interfaces):
             with patch(
-                "nautobot_ssot_aristacv.utils.cloudvision.get_interfaces_fixed", self.cloudvision.get_interfaces_fixed
+                "nautobot_ssot_aristacv.utils.cloudvision.get_interface_modes", self.cloudvision.get_interface_modes
             ):
                 with patch(
-                    "nautobot_ssot_aristacv.utils.cloudvision.get_interface_mode", self.cloudvision.get_interface_mode
+                    "nautobot_ssot_aristacv.utils.cloudvision.get_interface_transceivers",
+                    self.cloudvision.get_interface_transceivers,
                 ):
                     with patch(
-                        "nautobot_ssot_aristacv.utils.cloudvision.get_interface_transceiver",
-                        self.cloudvision.get_interface_transceiver,
+                        "nautobot_ssot_aristacv.utils.cloudvision.get_interface_descriptions",
+                        self.cloudvision.get_interface_descriptions,
                     ):
-                        with patch(
-                            "nautobot_ssot_aristacv.utils.cloudvision.get_interface_description",
-                            self.cloudvision.get_interface_description,
-                        ):
-                            self.cvp.load_interfaces(mock_device)
+                        self.cvp.load_interfaces(mock_device)
         self.assertEqual(
             {f"{port['interface']}__mock_device" for port in fixtures.FIXED_INTERFACE_FIXTURE},
             {port.get_unique_id() for port in self.cvp.get_all("port")},
         )
+        self.cloudvision.get_interface_transceivers.assert_called_once()
+        self.cloudvision.get_interface_descriptions.assert_called_once()
+        self.cloudvision.get_interface_modes.assert_called_once()
+        self.assertEqual(self.cvp.get("port", "Ethernet1/1__mock_device").description, "Uplink to DC1")
 
     def test_load_ip_addresses(self):
         """Test the load_ip_addresses() adapter method."""
@@ -99,11 +249,110 @@ class CloudvisionAdapterTestCase(TransactionTestCase):
 
         with patch("nautobot_ssot_aristacv.utils.cloudvision.get_ip_interfaces", self.cloudvision.get_ip_interfaces):
             with patch(
-                "nautobot_ssot_aristacv.utils.cloudvision.get_interface_description",
-                self.cloudvision.get_interface_description,
+                "nautobot_ssot_aristacv.utils.cloudvision.get_interface_descriptions",
+                self.cloudvision.get_interface_descriptions,
             ):
                 self.cvp.load_ip_addresses(dev=mock_device)
+        self.cloudvision.get_interface_descriptions.assert_called_once()
+        self.assertEqual(
+            {f"{ipaddr['interface']}__mock_device" for ipaddr in fixtures.IP_INTF_FIXTURE},
+            {port.get_unique_id() for port in self.cvp.get_all("port")},
+        )
         self.assertEqual(
             {f"{ipaddr['address']}__mock_device__{ipaddr['interface']}" for ipaddr in fixtures.IP_INTF_FIXTURE},
             {ipaddr.get_unique_id() for ipaddr in self.cvp.get_all("ipaddr")},
         )
+
+    def test_load_ip_addresses_existing_ports(self):
+        """Test the load_ip_addresses() adapter method doesn't recreate ports found in the port index."""
+        mock_device = MagicMock()
+        mock_device.name = "mock_device"
+        ports = {intf["interface"]: MagicMock() for intf in fixtures.IP_INTF_FIXTURE}
+
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.get_ip_interfaces", self.cloudvision.get_ip_interfaces):
+            with patch(
+                "nautobot_ssot_aristacv.utils.cloudvision.get_interface_descriptions",
+                self.cloudvision.get_interface_descriptions,
+            ):
+                self.cvp.load_ip_addresses(dev=mock_device, ports=ports)
+        self.cloudvision.get_interface_descriptions.assert_not_called()
+        mock_device.add_child.assert_not_called()
+        self.assertEqual(len(self.cvp.get_all("port")), 0)
+        self.assertEqual(len(self.cvp.get_all("ipaddr")), len(fixtures.IP_INTF_FIXTURE))
+
+    def test_load_l3_ports_duplicate(self):
+        """Test the load_l3_ports() adapter method skips a port that's already loaded rather than failing the device."""
+        mock_device = MagicMock()
+        mock_device.name = "mock_device"
+        ports = {}
+        self.cvp.load_l3_ports(dev=mock_device, names=["Vlan10", "Vlan10"], descriptions={}, ports=ports)
+        self.assertEqual(list(ports), ["Vlan10"])
+        self.assertEqual(len(self.cvp.get_all("port")), 1)
+        mock_device.add_child.assert_called_once()
+
+    def test_load_ip_addresses_discovered(self):
+        """Test the load_ip_addresses() adapter method uses IP interfaces found by a fabric-wide search."""
+        mock_device = MagicMock()
+        mock_device.name = "mock_device"
+        mock_device.serial = "JPE12345678"
+        self.cvp.ip_interfaces = {"JPE12345678": [IPInterfaceRecord(**intf) for intf in fixtures.IP_INTF_FIXTURE]}
+        ports = {intf["interface"]: MagicMock() for intf in fixtures.IP_INTF_FIXTURE}
+
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.get_ip_interfaces", self.cloudvision.get_ip_interfaces):
+            self.cvp.load_ip_addresses(dev=mock_device, ports=ports)
+        self.cloudvision.get_ip_interfaces.assert_not_called()
+        self.assertEqual(len(self.cvp.get_all("ipaddr")), len(fixtures.IP_INTF_FIXTURE))
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"create_controller": False}})
+    def test_merge(self):
+        """Test the merge() adapter method combines instances and skips devices already loaded."""
+        emea = CloudvisionAdapter(job=self.job, conn=self.client, instance="emea")
+        amer = CloudvisionAdapter(job=self.job, conn=self.client, instance="amer")
+        emea_devices = [DeviceRecord(**dev) for dev in fixtures.DEVICE_FIXTURE]
+        amer_devices = [emea_devices[0]._replace(device_id="JPE00000000"), emea_devices[0]._replace(hostname="nyc01")]
+        for adapter, devices in ((emea, emea_devices), (amer, amer_devices)):
+            for dev in devices:
+                adapter.add(
+                    adapter.device(
+                        name=dev.hostname,
+                        serial=dev.device_id,
+                        status=dev.status,
+                        device_model=dev.model,
+                        version=dev.sw_ver,
+                        instance=adapter.instance,
+                    )
+                )
+                adapter.add(adapter.cf(name="arista_bgp", value=adapter.instance, device_name=dev.hostname))
+
+        self.cvp.merge(emea)
+        self.cvp.merge(amer)
+        self.assertEqual(len(self.cvp.get_all("device")), len(emea_devices) + 1)
+        self.assertEqual(self.cvp.get("device", emea_devices[0].hostname).instance, "emea")
+        self.assertEqual(self.cvp.get("cf", f"arista_bgp__{emea_devices[0].hostname}").value, "emea")
+        self.assertEqual(self.cvp.get("device", "nyc01").instance, "amer")
+        self.assertIs(self.cvp.get("device", "nyc01").diffsync, self.cvp)
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {}})
+    def test_sync_complete_tag_changes(self):
+        """Test tag changes are applied over the adapter's connection to the device IDs recorded as it loaded."""
+        dev = DeviceRecord(**fixtures.DEVICE_FIXTURE[0])
+        self.cvp.add(
+            self.cvp.device(
+                name=dev.hostname,
+                serial=dev.device_id,
+                status=dev.status,
+                device_model=dev.model,
+                version=dev.sw_ver,
+                device_id=dev.device_id,
+            )
+        )
+        self.cvp.tag_changes.add_assignment(label="mpls", value="true", device=dev.hostname)
+        mock_apply = MagicMock(return_value=[])
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.apply_tag_changes", mock_apply), patch(
+            "nautobot_ssot_aristacv.utils.cloudvision.iter_tags_by_type", MagicMock(return_value=[])
+        ), patch("nautobot_ssot_aristacv.utils.cloudvision.cloudvision_connection") as mock_connection:
+            self.cvp.sync_complete(source=MagicMock())
+        mock_connection.assert_not_called()
+        self.assertIs(mock_apply.call_args.kwargs["client"], self.client.comm_channel)
+        self.assertEqual(mock_apply.call_args.kwargs["device_ids"], {dev.hostname: dev.device_id})
+        self.assertFalse(self.cvp.tag_changes)
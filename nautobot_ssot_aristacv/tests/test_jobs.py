@@ -1,8 +1,20 @@
 """Test Cloudvision Jobs."""
+import uuid
+from unittest.mock import MagicMock, patch
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
 from django.test import TestCase, override_settings
 from django.urls import reverse
+from nautobot.dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Platform, Site
+from nautobot.extras.models import Job, JobResult, Status
+from nautobot.utilities.testing import TransactionTestCase
 
 from nautobot_ssot_aristacv import jobs
+from nautobot_ssot_aristacv.diffsync.adapters.cloudvision import CloudvisionAdapter
+from nautobot_ssot_aristacv.diffsync.adapters.nautobot import NautobotAdapter
+from nautobot_ssot_aristacv.utils.cloudvision import DeviceData, DeviceQuarantine, DeviceRecord
+from nautobot_ssot_aristacv.utils.nautobot import DeleteBudget
 
 
 class CloudVisionDataSourceJobTest(TestCase):
@@ -157,3 +169,150 @@ class CloudVisionDataTargetJobTest(TestCase):
         self.assertEqual(reverse("extras:tag_list"), mappings[0].source_url)
         self.assertEqual("Device Tags", mappings[0].target_name)
         self.assertIsNone(mappings[0].target_url)
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"instances": [{"name": "emea"}, {"name": "amer"}]}})
+    def test_sync_data_rejects_instances(self):
+        """Verify the job fails rather than syncing tags when several CloudVision instances are configured."""
+        job = jobs.CloudVisionDataTarget()
+        job.log_failure = MagicMock()
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.cloudvision_connection") as mock_connection:
+            job.sync_data()
+        mock_connection.assert_not_called()
+        job.log_failure.assert_called_once()
+
+
+class DeferredJobLogTest(TestCase):
+    """Test the DeferredJobLog used by worker threads."""
+
+    def test_replay(self):
+        """Verify log messages are held until replayed while other attributes come from the Job."""
+        job = MagicMock()
+        job.kwargs = {"debug": True}
+        job_log = jobs.DeferredJobLog(job)
+        job_log.log("Loading data")
+        job_log.log_warning(message="Unable to load leaf1.")
+        self.assertEqual(job_log.kwargs, {"debug": True})
+        job.log.assert_not_called()
+        job.log_warning.assert_not_called()
+        job_log.replay()
+        job.log.assert_called_once_with("Loading data")
+        job.log_warning.assert_called_once_with(message="Unable to load leaf1.")
+        self.assertEqual(job_log.messages, [])
+
+
+@override_settings(
+    PLUGINS_CONFIG={
+        "nautobot_ssot_aristacv": {
+            "per_device_sync": True,
+            "delete_devices_on_sync": True,
+            "device_batch_size": 1,
+            "from_cloudvision_default_site": "HQ",
+        }
+    }
+)
+class CloudVisionDataSourcePerDeviceTest(TransactionTestCase):
+    """Test the Cloudvision DataSource Job syncing a batch of devices at a time."""
+
+    databases = ("default", "job_logs")
+
+    def setUp(self):
+        """Create a Device found in CloudVision and one that isn't, and a Job that has loaded the controller."""
+        status_active, _ = Status.objects.get_or_create(name="Active", slug="active")
+        arista_manu, _ = Manufacturer.objects.get_or_create(name="Arista", slug="arista")
+        Platform.objects.get_or_create(name="Arista EOS", slug="arista_eos")
+        site, _ = Site.objects.get_or_create(name="HQ", slug="hq", status=status_active)
+        device_type, _ = DeviceType.objects.get_or_create(model="DCS-7280CR2-60", manufacturer=arista_manu)
+        device_role, _ = DeviceRole.objects.get_or_create(name="Router", slug="rtr")
+        for name in ["leaf1", "old-leaf", "old-spine"]:
+            Device.objects.create(
+                name=name, device_type=device_type, device_role=device_role, site=site, status=status_active
+            )
+        self.cv_devices = [
+            DeviceRecord(
+                device_id=f"JPE{index}",
+                hostname=name,
+                fqdn=name,
+                sw_ver="",
+                model="DCS-7280CR2-60",
+                status="active",
+                system_mac_address="",
+            )
+            for index, name in enumerate(["leaf1", "leaf2"])
+        ]
+
+        self.job = jobs.CloudVisionDataSource()
+        self.job.job_result = JobResult.objects.create(
+            name=self.job.class_path, obj_type=ContentType.objects.get_for_model(Job), user=None, job_id=uuid.uuid4()
+        )
+        self.job.sync = MagicMock()
+        self.job.quarantine = DeviceQuarantine()
+        self.job.rerun_devices = None
+        self.job.delete_budget = DeleteBudget()
+        self.job.failed_writes = []
+        self.job.source_adapter = CloudvisionAdapter(job=self.job, conn=None, quarantine=self.job.quarantine)
+        self.job.target_adapter = NautobotAdapter(job=self.job, devices=[], delete_budget=self.job.delete_budget)
+        self.job.target_adapter.load()
+
+    def run_sync(self, dry_run: bool):
+        """Calculate the diff, and sync it unless a dry-run, with CloudVision returning the test devices."""
+        self.job.kwargs = {"dry_run": dry_run, "debug": False}
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.get_instances", MagicMock(return_value=[])), patch(
+            "nautobot_ssot_aristacv.utils.cloudvision.cloudvision_connection"
+        ), patch(
+            "nautobot_ssot_aristacv.utils.cloudvision.iter_devices", MagicMock(return_value=iter(self.cv_devices))
+        ), patch(
+            "nautobot_ssot_aristacv.utils.cloudvision.get_devices_data",
+            MagicMock(
+                side_effect=lambda client, dIds, ip_interfaces: {
+                    dId: DeviceData(interfaces=[], transceivers={}, descriptions={}, modes={}, ip_interfaces=[])
+                    for dId in dIds
+                }
+            ),
+        ), patch(
+            "nautobot_ssot_aristacv.utils.cloudvision.iter_tags_by_type", MagicMock(return_value=[])
+        ), patch(
+            "nautobot_ssot_aristacv.utils.cloudvision.iter_device_tags", MagicMock(return_value=[])
+        ), patch(
+            "nautobot_ssot_aristacv.utils.nautobot.get_device_version", MagicMock(return_value="")
+        ):
+            self.job.calculate_diff()
+            if not dry_run:
+                self.job.execute_sync()
+
+    def test_dry_run(self):
+        """Test a dry-run diffs every device without writing to Nautobot and records only the summary."""
+        self.run_sync(dry_run=True)
+        self.assertFalse(Device.objects.filter(name="leaf2").exists())
+        self.assertTrue(Device.objects.filter(name="old-leaf").exists())
+        self.assertGreaterEqual(self.job.sync.summary["create"], 1)
+        self.assertGreaterEqual(self.job.sync.summary["delete"], 1)
+
+    def test_sync(self):
+        """Test each device is synced and a Device missing from CloudVision is deleted in the final pass."""
+        self.run_sync(dry_run=False)
+        self.assertTrue(Device.objects.filter(name="leaf2").exists())
+        self.assertTrue(Device.objects.filter(name="leaf1").exists())
+        self.assertFalse(Device.objects.filter(name="old-leaf").exists())
+        self.assertFalse(Device.objects.filter(name="old-spine").exists())
+        self.assertGreaterEqual(self.job.sync.summary["delete"], 2)
+
+    def test_sync_delete_limit_across_batches(self):
+        """Test max_deletes_per_sync caps the deletions of the whole Job, not of each batch."""
+        self.job.delete_budget = DeleteBudget(limit=1)
+        self.job.target_adapter.delete_budget = self.job.delete_budget
+        self.run_sync(dry_run=False)
+        self.assertEqual(Device.objects.filter(name__in=["old-leaf", "old-spine"]).count(), 1)
+        self.assertEqual(self.job.delete_budget.skipped, 1)
+        self.assertEqual(self.job.sync.summary["delete"], 1)
+        self.assertGreaterEqual(self.job.sync.summary["skip"], 1)
+
+    def test_sync_failed_writes(self):
+        """Test writes that fail are counted as failures in the sync summary and recorded for the Job."""
+        with patch(
+            "nautobot_ssot_aristacv.utils.nautobot.verify_device_type_object",
+            MagicMock(side_effect=ValidationError("Invalid")),
+        ):
+            self.run_sync(dry_run=False)
+        self.assertFalse(Device.objects.filter(name="leaf2").exists())
+        self.assertIn("create Device leaf2", self.job.failed_writes)
+        self.assertEqual(self.job.sync.summary["failed"], len(self.job.failed_writes))
@@ -1,13 +1,17 @@
 """Unit tests for the Nautoobt DiffSync adapter class."""
 import uuid
 from unittest.mock import MagicMock, patch
+from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from nautobot.dcim.models import Device, DeviceRole, DeviceType, Manufacturer, Site
+from nautobot.dcim.models import Device, DeviceRole, DeviceType, Interface, Manufacturer, Site
 from nautobot.extras.models import Job, JobResult, Status
 from nautobot.utilities.testing import TransactionTestCase
 from nautobot_ssot_aristacv.diffsync.adapters.nautobot import NautobotAdapter
 from nautobot_ssot_aristacv.jobs import CloudVisionDataSource
+from nautobot_ssot_aristacv.utils.nautobot import DeleteBudget
 
 
 class NautobotAdapterTestCase(TransactionTestCase):
@@ -58,3 +62,148 @@ class NautobotAdapterTestCase(TransactionTestCase):
             {dev.name for dev in Device.objects.filter(device_type__manufacturer__slug="arista")},
             {dev.get_unique_id() for dev in self.nb_adapter.get_all("device")},
         )
+
+    def test_load_devices_scoped(self):
+        """Test the load_devices() function only loads the Devices the adapter is scoped to."""
+        mock_nautobot = MagicMock()
+        mock_nautobot.get_device_version = MagicMock()
+        mock_nautobot.get_device_version.return_value = "1.0"
+
+        scoped_adapter = NautobotAdapter(job=self.job, devices=["ams01-rtr-01"])
+        excluded_adapter = NautobotAdapter(job=self.job, exclude_devices=["ams01-rtr-01"])
+        with patch("nautobot_ssot_aristacv.utils.nautobot.get_device_version", mock_nautobot.get_device_version):
+            scoped_adapter.load_devices()
+            excluded_adapter.load_devices()
+        self.assertEqual({"ams01-rtr-01"}, {dev.get_unique_id() for dev in scoped_adapter.get_all("device")})
+        self.assertEqual({"ams01-rtr-02"}, {dev.get_unique_id() for dev in excluded_adapter.get_all("device")})
+
+    def test_load_devices_scoped_chunks(self):
+        """Test the load_devices() function filters scoped Devices in chunks."""
+        mock_nautobot = MagicMock()
+        mock_nautobot.get_device_version = MagicMock()
+        mock_nautobot.get_device_version.return_value = "1.0"
+
+        scoped_adapter = NautobotAdapter(job=self.job, devices=["ams01-rtr-01", "ams01-rtr-02", "missing-device"])
+        scoped_adapter.scope_chunk_size = 1
+        with patch("nautobot_ssot_aristacv.utils.nautobot.get_device_version", mock_nautobot.get_device_version):
+            with self.assertNumQueries(3, using="default"):
+                devices = list(scoped_adapter.scope_queryset(Device.objects.all()))
+            scoped_adapter.load_devices()
+        self.assertEqual({"ams01-rtr-01", "ams01-rtr-02"}, {dev.name for dev in devices})
+        self.assertEqual(
+            {"ams01-rtr-01", "ams01-rtr-02"}, {dev.get_unique_id() for dev in scoped_adapter.get_all("device")}
+        )
+
+    def test_port_update_scalar_fields(self):
+        """Test updating only plain Interface attributes uses a queryset update rather than a validated save."""
+        device = Device.objects.get(name="ams01-rtr-01")
+        intf = Interface.objects.create(device=device, name="Ethernet1", type="1000base-t", status=device.status)
+        with patch("nautobot_ssot_aristacv.utils.nautobot.get_device_version", MagicMock(return_value="1.0")):
+            self.nb_adapter.load_devices()
+        self.nb_adapter.load_interfaces()
+        port = self.nb_adapter.get("port", {"name": "Ethernet1", "device": "ams01-rtr-01"})
+        with patch.object(Interface, "validated_save") as mock_save:
+            port.update({"description": "uplink", "mtu": 9214})
+            self.nb_adapter.writer.flush()
+        mock_save.assert_not_called()
+        intf.refresh_from_db()
+        self.assertEqual(intf.description, "uplink")
+        self.assertEqual(intf.mtu, 9214)
+
+    def test_port_update_mode_validated_save(self):
+        """Test a change of switchport mode is made with a validated save so the port's VLANs are kept consistent."""
+        device = Device.objects.get(name="ams01-rtr-01")
+        Interface.objects.create(device=device, name="Ethernet1", type="1000base-t", status=device.status)
+        with patch("nautobot_ssot_aristacv.utils.nautobot.get_device_version", MagicMock(return_value="1.0")):
+            self.nb_adapter.load_devices()
+        self.nb_adapter.load_interfaces()
+        port = self.nb_adapter.get("port", {"name": "Ethernet1", "device": "ams01-rtr-01"})
+        with patch.object(Interface, "validated_save") as mock_save:
+            port.update({"mode": "access"})
+            self.nb_adapter.writer.flush()
+        mock_save.assert_called_once()
+
+    def test_port_update_reads_current_values(self):
+        """Test a validated save after a queryset update doesn't write the earlier values back."""
+        device = Device.objects.get(name="ams01-rtr-01")
+        intf = Interface.objects.create(device=device, name="Ethernet1", type="1000base-t", status=device.status)
+        with patch("nautobot_ssot_aristacv.utils.nautobot.get_device_version", MagicMock(return_value="1.0")):
+            self.nb_adapter.load_devices()
+        self.nb_adapter.load_interfaces()
+        port = self.nb_adapter.get("port", {"name": "Ethernet1", "device": "ams01-rtr-01"})
+        port.update({"description": "uplink"})
+        self.nb_adapter.writer.flush()
+        port.update({"port_type": "10gbase-x-sfpp"})
+        self.nb_adapter.writer.flush()
+        intf.refresh_from_db()
+        self.assertEqual(intf.description, "uplink")
+        self.assertEqual(intf.type, "10gbase-x-sfpp")
+
+    def test_port_status_updates_grouped(self):
+        """Test ports getting the same status are written with one queryset update."""
+        device = Device.objects.get(name="ams01-rtr-01")
+        Status.objects.get_or_create(name="Planned", slug="planned")
+        for name in ["Ethernet1", "Ethernet2", "Ethernet3"]:
+            Interface.objects.create(device=device, name=name, type="1000base-t", status=device.status)
+        with patch("nautobot_ssot_aristacv.utils.nautobot.get_device_version", MagicMock(return_value="1.0")):
+            self.nb_adapter.load_devices()
+        self.nb_adapter.load_interfaces()
+        for name in ["Ethernet1", "Ethernet2"]:
+            self.nb_adapter.get("port", {"name": name, "device": "ams01-rtr-01"}).update({"status": "planned"})
+        self.nb_adapter.get("port", {"name": "Ethernet3", "device": "ams01-rtr-01"}).update({"mtu": 9214})
+        with CaptureQueriesContext(connection) as queries:
+            self.nb_adapter.writer.flush()
+        updates = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith("UPDATE") and "dcim_interface" in query["sql"]
+        ]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(
+            set(Interface.objects.filter(status__slug="planned").values_list("name", flat=True)),
+            {"Ethernet1", "Ethernet2"},
+        )
+
+    def test_apply_deletes(self):
+        """Test queued Devices and Interfaces are deleted after the sync, leaving Interfaces of Devices to cascade."""
+        device = Device.objects.get(name="ams01-rtr-01")
+        other_device = Device.objects.get(name="ams01-rtr-02")
+        intf = Interface.objects.create(device=device, name="Ethernet1", type="1000base-t", status=device.status)
+        other_intf = Interface.objects.create(
+            device=other_device, name="Ethernet1", type="1000base-t", status=device.status
+        )
+        with patch("nautobot_ssot_aristacv.utils.nautobot.get_device_version", MagicMock(return_value="1.0")):
+            self.nb_adapter.load_devices()
+        self.nb_adapter.load_interfaces()
+        self.nb_adapter.writer.add_delete(Interface, intf.id, "Interface Ethernet1 for ams01-rtr-01")
+        self.nb_adapter.writer.add_delete(Device, device.id, "Device ams01-rtr-01")
+        self.nb_adapter.writer.add_delete(Interface, other_intf.id, "Interface Ethernet1 for ams01-rtr-02")
+        with patch.dict(settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"], {"max_deletes_per_sync": 2}):
+            self.nb_adapter.apply_deletes()
+        self.assertFalse(Device.objects.filter(id=device.id).exists())
+        self.assertFalse(Interface.objects.filter(id__in=[intf.id, other_intf.id]).exists())
+        self.assertTrue(Device.objects.filter(id=other_device.id).exists())
+
+    def test_apply_deletes_limit(self):
+        """Test nothing is deleted when more objects are queued for deletion than allowed per sync."""
+        self.nb_adapter.writer.job = MagicMock()
+        for device in Device.objects.all():
+            self.nb_adapter.writer.add_delete(Device, device.id, f"Device {device.name}")
+        with patch.dict(settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"], {"max_deletes_per_sync": 1}):
+            self.nb_adapter.apply_deletes()
+        self.assertEqual(Device.objects.count(), 2)
+        self.nb_adapter.writer.job.log_warning.assert_called_once_with(
+            message="Skipping deletion of 2 objects as only 1 more may be deleted by this sync."
+        )
+        self.assertEqual(self.nb_adapter.delete_budget.skipped, 2)
+
+    def test_apply_deletes_shared_budget(self):
+        """Test the delete limit is shared by the adapters of a Job rather than applying to each on its own."""
+        budget = DeleteBudget(limit=1)
+        devices = list(Device.objects.all())
+        for device in devices:
+            adapter = NautobotAdapter(job=self.job, devices=[device.name], delete_budget=budget)
+            adapter.writer.add_delete(Device, device.id, f"Device {device.name}")
+            adapter.apply_deletes()
+        self.assertEqual(Device.objects.count(), len(devices) - 1)
+        self.assertEqual((budget.deleted, budget.skipped, budget.remaining), (1, len(devices) - 1, 0))
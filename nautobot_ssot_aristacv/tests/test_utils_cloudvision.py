@@ -1,10 +1,17 @@
 """Tests of Cloudvision utility methods."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
+
+import grpc
+import requests
 from django.test import override_settings
 from parameterized import parameterized
 
 from nautobot.utilities.testing import TestCase
+from cloudvision.Connector import codec
 from cloudvision.Connector.codec.custom_types import FrozenDict
+from cloudvision.Connector.grpc_client import grpcClient
 
 from nautobot_ssot_aristacv.utils import cloudvision
 from nautobot_ssot_aristacv.tests.fixtures import fixtures
@@ -27,6 +34,302 @@ class TestCloudvisionApi(TestCase):
         self.assertEqual(client.cvp_token, "1234567890abcdef")
 
 
+class TestSessionTokenManager(TestCase):
+    """Test caching and refresh of on-prem CloudVision session tokens."""
+
+    databases = ("default", "job_logs")
+
+    def setUp(self):
+        """Create a token manager with a mocked HTTP session."""
+        self.manager = cloudvision.SessionTokenManager(
+            cvp_host="localhost", username="admin", password="password", ttl=3600, refresh_margin=300  # nosec
+        )
+        self.manager.session = MagicMock()
+        self.manager.session.post.return_value.json.return_value = {"sessionId": "abc123"}
+
+    def test_token_cached(self):
+        """Test that the session token is reused while it's valid."""
+        self.assertEqual(self.manager.get_token(), "abc123")
+        self.assertEqual(self.manager.get_token(), "abc123")
+        self.manager.session.post.assert_called_once()
+
+    def test_token_refreshed_before_expiry(self):
+        """Test that the session token is refreshed once within the refresh margin of expiring."""
+        self.manager.get_token()
+        self.manager.expires -= 3400
+        self.manager.get_token()
+        self.assertEqual(self.manager.session.post.call_count, 2)
+
+    def test_login_failure(self):
+        """Test that AuthFailure is raised when login doesn't return a session."""
+        self.manager.session.post.return_value.json.return_value = {"errorCode": "112498", "errorMessage": "Bad"}
+        with self.assertRaises(cloudvision.AuthFailure):
+            self.manager.get_token()
+
+
+class TestCloudvisionConnectionPool(TestCase):
+    """Test pooling of Cloudvision Api connections."""
+
+    databases = ("default", "job_logs")
+
+    def setUp(self):
+        """Create an empty connection pool."""
+        self.pool = cloudvision.CloudvisionConnectionPool(idle_timeout=60, max_age=3600)
+        self.conn_kwargs = {"cvp_host": None, "cvp_token": "1234567890abcdef"}  # nosec
+
+    @patch.object(cloudvision.CloudvisionConnectionPool, "is_healthy", return_value=True)
+    def test_connection_reused(self, mock_healthy):  # pylint: disable=unused-argument
+        """Test that a healthy connection with the same arguments is reused."""
+        client = self.pool.get(**self.conn_kwargs)
+        self.assertIs(self.pool.get(**self.conn_kwargs), client)
+
+    @patch.object(cloudvision.CloudvisionConnectionPool, "is_healthy", return_value=False)
+    def test_unhealthy_connection_replaced(self, mock_healthy):  # pylint: disable=unused-argument
+        """Test that an unhealthy connection is replaced."""
+        client = self.pool.get(**self.conn_kwargs)
+        self.assertIsNot(self.pool.get(**self.conn_kwargs), client)
+
+    def test_idle_connection_expired(self):
+        """Test that connections idle longer than the timeout are closed."""
+        pool = cloudvision.CloudvisionConnectionPool(idle_timeout=-1, max_age=3600)
+        client = pool.get(**self.conn_kwargs)
+        with pool._lock:  # pylint: disable=protected-access
+            pool.expire_idle()
+        self.assertNotIn(client, [entry[0] for entry in pool._connections.values()])  # pylint: disable=protected-access
+
+    def test_settings_immutable(self):
+        """Test that the pool timeouts can't be changed once it's created."""
+        with self.assertRaises(AttributeError):
+            self.pool.idle_timeout = -1
+        self.assertEqual(self.pool.idle_timeout, 60)
+
+    @patch.object(cloudvision.CloudvisionConnectionPool, "is_healthy", return_value=True)
+    def test_concurrent_get_shares_connection(self, mock_healthy):  # pylint: disable=unused-argument
+        """Test that concurrent callers for the same key share one connection and none are leaked."""
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            clients = list(executor.map(lambda _: self.pool.get(**self.conn_kwargs), range(32)))
+        self.assertEqual(len({id(client) for client in clients}), 1)
+        self.assertEqual(len(self.pool._connections), 1)  # pylint: disable=protected-access
+
+
+class RpcError(grpc.RpcError):
+    """gRPC error with a status code for testing."""
+
+    def __init__(self, code):
+        """Set the status code."""
+        super().__init__()
+        self._code = code
+
+    def code(self):
+        """Returns the status code."""
+        return self._code
+
+
+class TestRpcPolicy(TestCase):
+    """Test deadlines, retries and hedging of calls to CloudVision."""
+
+    databases = ("default", "job_logs")
+
+    def setUp(self):
+        """Create a policy that doesn't wait between retries."""
+        self.timings = cloudvision.RpcTimings()
+        self.policy = cloudvision.RpcPolicy(backoff=0, timings=self.timings)
+
+    def test_call_deadline(self):
+        """Test each call is made with the deadline of its type."""
+        func = MagicMock(return_value="ok")
+        self.assertEqual(self.policy.call("write", func), "ok")
+        func.assert_called_once_with(timeout=cloudvision.RPC_DEADLINES["write"])
+
+    def test_call_retries_unavailable(self):
+        """Test calls failing with UNAVAILABLE are retried."""
+        func = MagicMock(side_effect=[RpcError(grpc.StatusCode.UNAVAILABLE), "ok"])
+        self.assertEqual(self.policy.call("write", func), "ok")
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(self.timings.calls["write"]["retries"], 1)
+
+    def test_call_not_retried(self):
+        """Test calls failing with other errors, or too many times, aren't retried."""
+        func = MagicMock(side_effect=RpcError(grpc.StatusCode.PERMISSION_DENIED))
+        with self.assertRaises(grpc.RpcError):
+            self.policy.call("write", func)
+        self.assertEqual(func.call_count, 1)
+        func = MagicMock(side_effect=RpcError(grpc.StatusCode.DEADLINE_EXCEEDED))
+        with self.assertRaises(grpc.RpcError):
+            self.policy.call("write", func)
+        self.assertEqual(func.call_count, cloudvision.RPC_RETRIES + 1)
+        self.assertEqual(self.timings.calls["write"]["failures"], 2)
+
+    def test_stream_retried_before_first_response(self):
+        """Test a stream failing before its first response is started again."""
+
+        def unavailable():
+            raise RpcError(grpc.StatusCode.UNAVAILABLE)
+            yield  # pylint: disable=unreachable
+
+        failed = MagicMock()
+        failed.__iter__.return_value = unavailable()
+        func = MagicMock(side_effect=[failed, [1, 2]])
+        self.assertEqual(list(self.policy.stream("get", func)), [1, 2])
+        failed.cancel.assert_called_once()
+
+    def test_stream_hedged(self):
+        """Test a Get stream slow to respond is hedged with a second request."""
+        cancelled = threading.Event()
+
+        def stall():
+            cancelled.wait(5)
+            raise RpcError(grpc.StatusCode.CANCELLED)
+            yield  # pylint: disable=unreachable
+
+        slow = MagicMock()
+        slow.__iter__.return_value = stall()
+        slow.cancel.side_effect = cancelled.set
+        func = MagicMock(side_effect=[slow, [1, 2]])
+        self.policy.hedge_after = 0.01
+        self.assertEqual(list(self.policy.stream("get", func)), [1, 2])
+        slow.cancel.assert_called()
+        self.assertEqual(self.timings.calls["get"]["hedges"], 1)
+
+    def test_stream_hedge_failure_cancels_original(self):
+        """Test the original call is cancelled, and its thread joined, if the hedge can't be started."""
+        cancelled = threading.Event()
+
+        def stall():
+            cancelled.wait(5)
+            raise RpcError(grpc.StatusCode.CANCELLED)
+            yield  # pylint: disable=unreachable
+
+        slow = MagicMock()
+        slow.__iter__.return_value = stall()
+        slow.cancel.side_effect = cancelled.set
+        func = MagicMock(side_effect=[slow, RpcError(grpc.StatusCode.INTERNAL)])
+        self.policy.hedge_after = 0.01
+        with self.assertRaises(grpc.RpcError):
+            list(self.policy.stream("get", func))
+        slow.cancel.assert_called()
+        self.assertTrue(cancelled.is_set())
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"rpc_deadlines": {"get": 5}, "rpc_retries": 0}})
+    def test_policy_from_settings(self):
+        """Test deadlines and retries are taken from the plugin settings, and the policy is reused."""
+        cloudvision.get_rpc_policy.cache_clear()
+        self.addCleanup(cloudvision.get_rpc_policy.cache_clear)
+        policy = cloudvision.get_rpc_policy()
+        self.assertIs(cloudvision.get_rpc_policy(), policy)
+        self.assertEqual(policy.deadline("get"), 5)
+        self.assertEqual(policy.deadline("search"), cloudvision.RPC_DEADLINES["search"])
+        self.assertEqual(policy.retries, 0)
+
+
+class TestScalarDecoder(TestCase):
+    """Test the fast path of the decoder for scalar values."""
+
+    databases = ("default", "job_logs")
+
+    @parameterized.expand(
+        [
+            ("string", "Ethernet1/1"),
+            ("empty_string", ""),
+            ("unicode", "Uplink to DC1 \u00e9"),
+            ("long_string", "x" * 70000),
+            ("fixint", 127),
+            ("negative_fixint", -32),
+            ("uint", 65536),
+            ("int", -(2**40)),
+            ("true", True),
+            ("false", False),
+            ("none", None),
+            ("float", 1.5),
+            ("float32", codec.Float32(0.25)),
+            ("map", {"Name": "duplexUnknown", "Value": 0}),
+            ("array", ["Sysdb", "interface"]),
+        ]
+    )
+    def test_decode_matches_codec(self, name, value):  # pylint: disable=unused-argument
+        """Test values are decoded the same as by the generic codec."""
+        buf = codec.Encoder().encode(value)
+        self.assertEqual(cloudvision.ScalarDecoder().decode(buf), codec.Decoder().decode(buf))
+
+    def test_decode_scalar_skips_codec(self):
+        """Test scalar values don't go through the generic codec while other values do."""
+        encoder = codec.Encoder()
+        decoder = cloudvision.ScalarDecoder()
+        with patch.object(codec.Decoder, "decode") as mock_decode:
+            self.assertEqual(decoder.decode(encoder.encode("intfId")), "intfId")
+            self.assertEqual(decoder.decode(encoder.encode(9214)), 9214)
+            mock_decode.assert_not_called()
+            decoder.decode(encoder.encode({"value": 210}))
+            mock_decode.assert_called_once()
+
+
+class TestPathEncoder(TestCase):
+    """Test encoding of query paths."""
+
+    databases = ("default", "job_logs")
+
+    def test_encode_path(self):
+        """Test paths are encoded the same as by the codec and only encoded once."""
+        path_encoder = cloudvision.PathEncoder()
+        expected = [codec.Encoder().encode(elt) for elt in cloudvision.INTERFACE_STATUS_PATH]
+        self.assertEqual(path_encoder.encode(cloudvision.INTERFACE_STATUS_PATH), expected)
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.get_encoder") as mock_get_encoder:
+            self.assertEqual(path_encoder.encode(list(cloudvision.INTERFACE_STATUS_PATH)), expected)
+        mock_get_encoder.assert_not_called()
+
+    def test_encode_path_uncached(self):
+        """Test paths with elements other than strings and wildcards are encoded without being cached."""
+        path_encoder = cloudvision.PathEncoder()
+        path = ["Sysdb", 1, True, {"value": 1}, cloudvision.Wildcard()]
+        self.assertEqual(path_encoder.encode(path), [codec.Encoder().encode(elt) for elt in path])
+
+    def test_create_query(self):
+        """Test queries are the same as created by the Connector."""
+        path_keys = [(path, []) for path in cloudvision.INTERFACE_CONFIG_PATHS]
+        self.assertEqual(
+            cloudvision.create_query(path_keys, "JPE12345678"), grpcClient.create_query(path_keys, "JPE12345678")
+        )
+
+
+class TestCloudvisionInstances(TestCase):
+    """Test class for multiple CloudVision instance settings."""
+
+    databases = ("default", "job_logs")
+
+    @override_settings(
+        PLUGINS_CONFIG={
+            "nautobot_ssot_aristacv": {
+                "cvp_host": "cvp-emea.example.com",
+                "cvp_port": "443",
+                "cvp_user": "admin",
+                "cvp_password": "password",  # nosec
+                "cvp_token": None,
+                "verify": True,
+                "instances": [
+                    {"name": "emea"},
+                    {"name": "amer", "cvp_host": "cvp-amer.example.com", "verify": False},
+                    {"name": "apac", "cvaas_url": "apac.arista.io:443", "cvp_token": "1234567890abcdef"},
+                ],
+            }
+        }
+    )
+    def test_connection_settings_instances(self):
+        """Test instance settings override the top level plugin settings."""
+        emea, amer, apac = cloudvision.get_instances()
+        self.assertEqual(cloudvision.connection_settings(emea)["cvp_host"], "cvp-emea.example.com")
+        self.assertEqual(cloudvision.connection_settings(amer)["cvp_host"], "cvp-amer.example.com")
+        self.assertFalse(cloudvision.connection_settings(amer)["verify"])
+        self.assertEqual(cloudvision.connection_settings(amer)["username"], "admin")
+        self.assertIsNone(cloudvision.connection_settings(apac)["cvp_host"])
+        self.assertEqual(cloudvision.connection_settings(apac)["cvaas_url"], "apac.arista.io:443")
+
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"instances": [{"name": "emea"}, {"name": "emea"}]}})
+    def test_get_instances_duplicate_name(self):
+        """Test each CloudVision instance must have a unique name."""
+        with self.assertRaises(ValueError):
+            cloudvision.get_instances()
+
+
 class TestCloudvisionUtils(TestCase):
     """Test Cloudvision utility methods."""
 
@@ -64,7 +367,7 @@ class TestCloudvisionUtils(TestCase):
 
         with patch("nautobot_ssot_aristacv.utils.cloudvision.services", device_svc_stub):
             results = cloudvision.get_devices(client=self.client)
-        expected = fixtures.DEVICE_FIXTURE
+        expected = [cloudvision.DeviceRecord(**dev) for dev in fixtures.DEVICE_FIXTURE]
         self.assertEqual(results, expected)
 
     @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"import_active": True}})
@@ -87,18 +390,37 @@ class TestCloudvisionUtils(TestCase):
         with patch("nautobot_ssot_aristacv.utils.cloudvision.services", device_svc_stub):
             results = cloudvision.get_devices(client=self.client)
         expected = [
-            {
-                "device_id": "JPE12345678",
-                "hostname": "ams01-edge-01.ntc.com",
-                "fqdn": "ams01-edge-01.ntc.com",
-                "status": "active",
-                "sw_ver": "4.26.5M",
-                "model": "DCS-7280CR2-60",
-                "system_mac_address": "12:34:56:78:ab:cd",
-            }
+            cloudvision.DeviceRecord(
+                device_id="JPE12345678",
+                hostname="ams01-edge-01.ntc.com",
+                fqdn="ams01-edge-01.ntc.com",
+                status="active",
+                sw_ver="4.26.5M",
+                model="DCS-7280CR2-60",
+                system_mac_address="12:34:56:78:ab:cd",
+            )
         ]
         self.assertEqual(results, expected)
 
+    @override_settings(PLUGINS_CONFIG={"nautobot_ssot_aristacv": {"import_active": False}})
+    def test_iter_devices_cancels_stream(self):
+        """Test iter_devices cancels the GetAll stream when iteration is stopped early."""
+        device1 = MagicMock()
+        device1.value.hostname.value = "ams01-edge-01.ntc.com"
+        device1.value.streaming_status = 2
+        stream = MagicMock()
+        stream.__iter__.return_value = iter([device1, MagicMock()])
+
+        device_svc_stub = MagicMock()
+        device_svc_stub.DeviceServiceStub.return_value.GetAll.return_value = stream
+
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.services", device_svc_stub):
+            devices = cloudvision.iter_devices(client=self.client)
+            first = next(devices)
+            devices.close()
+        self.assertEqual(first.hostname, "ams01-edge-01.ntc.com")
+        stream.cancel.assert_called_once()
+
     def test_get_tags_by_type(self):
         """Test get_tags_by_type method."""
 
@@ -112,7 +434,7 @@ class TestCloudvisionUtils(TestCase):
 
         with patch("nautobot_ssot_aristacv.utils.cloudvision.tag_services", device_tag_stub):
             results = cloudvision.get_tags_by_type(client=self.client)
-        expected = [{"label": "test", "value": "test"}]
+        expected = [cloudvision.TagRecord(label="test", value="test")]
         self.assertEqual(results, expected)
 
     def test_get_device_tags(self):
@@ -127,7 +449,7 @@ class TestCloudvisionUtils(TestCase):
 
         with patch("nautobot_ssot_aristacv.utils.cloudvision.tag_services", tag_stub):
             results = cloudvision.get_device_tags(client=self.client, device_id="JPE12345678")
-        expected = [{"label": "ztp", "value": "enabled"}]
+        expected = [cloudvision.TagRecord(label="ztp", value="enabled")]
         self.assertEqual(results, expected)
 
     def test_unfreeze_frozen_dict(self):
@@ -141,35 +463,8 @@ class TestCloudvisionUtils(TestCase):
         set_result = cloudvision.unfreeze_frozen_dict(frozen_dict=("test"))
         self.assertEqual(set_result, ("test"))
 
-    def test_get_device_type_modular(self):
-        """Test the get_device_type method for modular chassis."""
-        mock_query = MagicMock()
-        mock_query.return_value = {"fixedSystem": None}
-
-        with patch("nautobot_ssot_aristacv.utils.cloudvision.unfreeze_frozen_dict", mock_query):
-            results = cloudvision.get_device_type(client=self.client, dId="JPE12345678")
-        self.assertEqual(results, "modular")
-
-    def test_get_device_type_fixed(self):
-        """Test the get_device_type method for fixed type."""
-        mock_query = MagicMock()
-        mock_query.return_value = {"fixedSystem": True}
-
-        with patch("nautobot_ssot_aristacv.utils.cloudvision.unfreeze_frozen_dict", mock_query):
-            results = cloudvision.get_device_type(client=self.client, dId="JPE12345678")
-        self.assertEqual(results, "fixedSystem")
-
-    def test_get_device_type_unknown(self):
-        """Test the get_device_type method for unknown type."""
-        mock_query = MagicMock()
-        mock_query.return_value = {}
-
-        with patch("nautobot_ssot_aristacv.utils.cloudvision.unfreeze_frozen_dict", mock_query):
-            results = cloudvision.get_device_type(client=self.client, dId="JPE12345678")
-        self.assertEqual(results, "Unknown")
-
     def test_get_interfaces_fixed(self):
-        """Test get_interfaces_fixed method."""
+        """Test get_interfaces method for a fixed system device."""
         mock_query = MagicMock()
         mock_query.dataset.type = "device"
         mock_query.dataset.name = "JPE12345678"
@@ -188,12 +483,12 @@ class TestCloudvisionUtils(TestCase):
         with patch("cloudvision.Connector.grpc_client.grpcClient.create_query", mock_query):
             self.client.get = MagicMock()
             self.client.get.return_value = fixtures.FIXED_INTF_QUERY
-            results = cloudvision.get_interfaces_fixed(client=self.client, dId="JPE12345678")
-        expected = fixtures.FIXED_INTERFACE_FIXTURE
+            results = cloudvision.get_interfaces(client=self.client, dId="JPE12345678")
+        expected = [cloudvision.InterfaceRecord(**intf) for intf in fixtures.FIXED_INTERFACE_FIXTURE]
         self.assertEqual(results, expected)
 
     def test_get_interfaces_chassis(self):
-        """Test get_interfaces_chassis method."""
+        """Test get_interfaces method for a modular device."""
         mock_query = MagicMock()
         mock_query.dataset.type = "device"
         mock_query.dataset.name = "JPE12345678"
@@ -212,96 +507,73 @@ class TestCloudvisionUtils(TestCase):
         with patch("nautobot_ssot_aristacv.utils.cloudvision.unfreeze_frozen_dict", mock_lc):
             self.client.get = MagicMock()
             self.client.get.return_value = fixtures.CHASSIS_INTF_QUERY
-            results = cloudvision.get_interfaces_chassis(client=self.client, dId="JPE12345678")
+            results = cloudvision.get_interfaces(client=self.client, dId="JPE12345678")
 
-        expected = fixtures.CHASSIS_INTERFACE_FIXTURE
+        expected = [cloudvision.InterfaceRecord(**intf) for intf in fixtures.CHASSIS_INTERFACE_FIXTURE]
         self.assertEqual(results, expected)
 
-    def test_get_interface_transceiver_eeprom(self):
-        """Test the get_interface_transceiver method from eeprom."""
-        mock_query = MagicMock()
-        mock_query.dataset.type = "device"
-        mock_query.dataset.name = "JPE12345678"
-        mock_query.paths.path_elements = [
-            "\304\005Sysdb",
-            "\304\010hardware",
-            "\304\006archer",
-            "\304\004xcvr",
-            "\304\006status",
-            "\304\003all",
-            "\304\tEthernet1",
-        ]
-
-        with patch("cloudvision.Connector.grpc_client.grpcClient.create_query", mock_query):
-            self.client.get = MagicMock()
-            self.client.get.return_value = fixtures.TRANSCEIVER_EEPROM_QUERY
-            results = cloudvision.get_interface_transceiver(
-                client=self.client, dId="JPE12345678", interface="Ethernet1"
-            )
-        self.assertEqual(results, "40GBASE-PLR4")
-
-    def test_get_interface_transceiver_local(self):
-        """Test the get_interface_transceiver method from local interface."""
-        mock_query = MagicMock()
-        mock_query.dataset.type = "device"
-        mock_query.dataset.name = "JPE12345679"
-        mock_query.paths.path_elements = [
-            "\304\005Sysdb",
-            "\304\010hardware",
-            "\304\006archer",
-            "\304\004xcvr",
-            "\304\006status",
-            "\304\003all",
-            "\304\tEthernet1",
-        ]
-
-        with patch("cloudvision.Connector.grpc_client.grpcClient.create_query", mock_query):
-            self.client.get = MagicMock()
-            self.client.get.return_value = fixtures.TRANSCEIVER_LOCAL_QUERY
-            results = cloudvision.get_interface_transceiver(
-                client=self.client, dId="JPE12345678", interface="Ethernet1"
-            )
-        self.assertEqual(results, "xcvr1000BaseT")
-
-    def test_get_interface_mode_trunk(self):
-        """Test the get_interface_mode method for a trunk."""
-        mock_query = MagicMock()
-        mock_query.dataset.type = "device"
-        mock_query.dataset.name = "JPE12345678"
-        mock_query.paths.path_elements = [
-            "\304\005Sysdb",
-            "\304\010bridging",
-            "\304\020switchIntfConfig",
-            "\304\020switchIntfConfig",
-            "\304\tEthernet1",
-        ]
-
-        with patch("cloudvision.Connector.grpc_client.grpcClient.create_query", mock_query):
-            self.client.get = MagicMock()
-            self.client.get.return_value = fixtures.TRUNK_INTF_MODE_QUERY
-            results = cloudvision.get_interface_mode(client=self.client, dId="JPE12345678", interface="Ethernet1")
-        expected = "trunk"
+    def test_get_interfaces(self):
+        """Test get_interfaces method uses a single Wildcard query across all slices."""
+        self.client.get = MagicMock()
+        self.client.get.return_value = fixtures.CHASSIS_INTF_QUERY
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.create_query") as mock_create_query:
+            results = cloudvision.get_interfaces(client=self.client, dId="JPE12345678")
+        path_elts = mock_create_query.call_args[0][0][0][0]
+        self.assertIsInstance(path_elts[6], cloudvision.Wildcard)
+        self.client.get.assert_called_once()
+        expected = [cloudvision.InterfaceRecord(**intf) for intf in fixtures.CHASSIS_INTERFACE_FIXTURE]
         self.assertEqual(results, expected)
 
-    def test_get_interface_mode_access(self):
-        """Test the get_interface_mode method for a access."""
-        mock_query = MagicMock()
-        mock_query.dataset.type = "device"
-        mock_query.dataset.name = "JPE12345678"
-        mock_query.paths.path_elements = [
-            "\304\005Sysdb",
-            "\304\010bridging",
-            "\304\020switchIntfConfig",
-            "\304\020switchIntfConfig",
-            "\304\tEthernet5",
-        ]
+    def test_get_interface_transceivers(self):
+        """Test the get_interface_transceivers method fetches all transceivers with a single Wildcard query."""
+        self.client.get = MagicMock()
+        self.client.get.return_value = fixtures.TRANSCEIVER_LOCAL_QUERY
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.create_query") as mock_create_query:
+            results = cloudvision.get_interface_transceivers(client=self.client, dId="JPE12345678")
+        path_elts = mock_create_query.call_args[0][0][0][0]
+        self.assertIsInstance(path_elts[-1], cloudvision.Wildcard)
+        self.client.get.assert_called_once()
+        self.assertEqual(results, {"Ethernet1": "xcvr1000BaseT"})
+
+    def test_get_interface_transceivers_eeprom(self):
+        """Test the get_interface_transceivers method takes the media type from the EEPROM contents when present."""
+        self.client.get = MagicMock(return_value=fixtures.TRANSCEIVER_EEPROM_QUERY)
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.create_query"):
+            results = cloudvision.get_interface_transceivers(client=self.client, dId="JPE12345678")
+        self.assertEqual(results, {"Ethernet1": "40GBASE-PLR4"})
+
+    breakout_transceivers = [
+        ("fixed_port", "Ethernet2", "100GBASE-SR4"),
+        ("fixed_breakout_lane", "Ethernet1/3", "400GBASE-DR4"),
+        ("modular_breakout_lane", "Ethernet3/1/2", "40GBASE-SR4"),
+        ("missing_port", "Ethernet4/1", "Unknown"),
+    ]
 
-        with patch("cloudvision.Connector.grpc_client.grpcClient.create_query", mock_query):
-            self.client.get = MagicMock()
-            self.client.get.return_value = fixtures.ACCESS_INTF_MODE_QUERY
-            results = cloudvision.get_interface_mode(client=self.client, dId="JPE12345678", interface="Ethernet5")
-        expected = "access"
-        self.assertEqual(results, expected)
+    @parameterized.expand(breakout_transceivers, skip_on_empty=True)
+    def test_resolve_transceiver(self, name, interface, expected):  # pylint: disable=unused-argument
+        """Test the resolve_transceiver method inherits the parent port's transceiver for breakout lanes."""
+        transceivers = {"Ethernet1": "400GBASE-DR4", "Ethernet2": "100GBASE-SR4", "Ethernet3/1": "40GBASE-SR4"}
+        self.assertEqual(cloudvision.resolve_transceiver(transceivers=transceivers, interface=interface), expected)
+
+    def test_get_interface_modes(self):
+        """Test the get_interface_modes method gets every interface's mode with one Wildcard query."""
+        self.client.get = MagicMock(return_value=fixtures.TRUNK_INTF_MODE_QUERY + fixtures.ACCESS_INTF_MODE_QUERY)
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.create_query") as mock_create_query:
+            results = cloudvision.get_interface_modes(client=self.client, dId="JPE12345678")
+        self.assertIsInstance(mock_create_query.call_args[0][0][0][0][-1], cloudvision.Wildcard)
+        self.client.get.assert_called_once()
+        self.assertEqual(results, {"Ethernet1": "trunk", "Ethernet5": "access"})
+
+    def test_get_interface_modes_malformed(self):
+        """Test a notification missing the mode's name raises DeviceDataError."""
+        self.client.get = MagicMock(
+            return_value=[
+                {"notifications": [{"path_elements": ["Ethernet1"], "updates": {"switchportMode": {"Value": 1}}}]}
+            ]
+        )
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.create_query"):
+            with self.assertRaises(cloudvision.DeviceDataError):
+                cloudvision.get_interface_modes(client=self.client, dId="JPE12345678")
 
     port_types = [
         ("built_in_gig", {"port_info": {}, "transceiver": "xcvr1000BaseT"}, "1000base-t"),
@@ -317,8 +589,45 @@ class TestCloudvisionUtils(TestCase):
     def test_get_port_type(self, name, sent, received):  # pylint: disable=unused-argument
         """Test the get_port_type method."""
         self.assertEqual(
-            cloudvision.get_port_type(port_info=sent["port_info"], transceiver=sent["transceiver"]), received
+            cloudvision.get_port_type(
+                port_info=cloudvision.InterfaceRecord(**sent["port_info"]), transceiver=sent["transceiver"]
+            ),
+            received,
+        )
+
+    def test_get_port_type_default_resolver(self):
+        """Test the get_port_type method reuses one default resolver rather than building one per call."""
+        get_port_type_resolver = cloudvision.get_port_type_resolver
+        get_port_type_resolver.cache_clear()
+        self.addCleanup(get_port_type_resolver.cache_clear)
+        port_info = cloudvision.InterfaceRecord(interface="Ethernet1")
+        with patch.object(
+            cloudvision.PortTypeResolver, "from_settings", wraps=cloudvision.PortTypeResolver.from_settings
+        ) as mock_from_settings:
+            cloudvision.get_port_type(port_info=port_info, transceiver="Unknown")
+            cloudvision.get_port_type(port_info=port_info, transceiver="Unknown")
+        mock_from_settings.assert_called_once()
+
+    def test_port_type_resolver_user_mappings(self):
+        """Test the PortTypeResolver extends the default mappings with user mappings."""
+        resolver = cloudvision.PortTypeResolver(
+            port_type_mappings={"xcvr1000BaseT": "1000base-x-sfp"},
+            interface_type_mappings={"Tunnel": "virtual"},
+        )
+        self.assertEqual(
+            resolver.resolve(interface="Ethernet1", transceiver="xcvr1000BaseT"),
+            cloudvision.PortType(port_type="1000base-x-sfp", speed=1000),
         )
+        self.assertEqual(resolver.resolve(interface="Tunnel1", transceiver="Unknown").port_type, "virtual")
+        self.assertEqual(resolver.resolve(interface="Vlan100", transceiver="Unknown").port_type, "virtual")
+
+    def test_port_type_resolver_speed(self):
+        """Test the PortTypeResolver resolves speed and memoizes results per interface family and transceiver."""
+        resolver = cloudvision.PortTypeResolver()
+        result = resolver.resolve(interface="Ethernet1/1", transceiver="100GBASE-SR4")
+        self.assertEqual(result, cloudvision.PortType(port_type="100gbase-x-qsfp28", speed=100000))
+        self.assertIs(resolver.resolve(interface="Ethernet2/1", transceiver="100GBASE-SR4"), result)
+        self.assertIsNone(resolver.resolve(interface="Port-Channel10", transceiver="Unknown").speed)
 
     port_statuses = [
         ("active_port", {"link_status": "up", "oper_status": "up"}, "active"),
@@ -330,33 +639,45 @@ class TestCloudvisionUtils(TestCase):
     @parameterized.expand(port_statuses, skip_on_empty=True)
     def test_get_interface_status(self, name, sent, received):  # pylint: disable=unused-argument
         """Test the get_interface_status method."""
-        self.assertEqual(cloudvision.get_interface_status(port_info=sent), received)
-
-    def test_get_interface_description(self):
-        """Test get_interface_description method."""
-        mock_query = MagicMock()
-        mock_query.dataset.type = "device"
-        mock_query.dataset.name = "JPE12345678"
-        mock_query.paths.path_elements = [
-            "\304\005Sysdb",
-            "\304\tinterface",
-            "\304\006config",
-            "\304\003eth",
-            "\304\003phy",
-            "\304\005slice",
-            "\304\0011",
-            "\304\nintfStatus",
-            "\304\tEthernet1",
-        ]
-
-        with patch("cloudvision.Connector.grpc_client.grpcClient.create_query", mock_query):
-            self.client.get = MagicMock()
-            self.client.get.return_value = fixtures.INTF_DESCRIPTION_QUERY
-            results = cloudvision.get_interface_description(
-                client=self.client, dId="JPE12345678", interface="Ethernet1"
-            )
-        expected = "Uplink to DC1"
-        self.assertEqual(results, expected)
+        self.assertEqual(cloudvision.get_interface_status(port_info=cloudvision.InterfaceRecord(**sent)), received)
+
+    def test_get_interface_descriptions(self):
+        """Test get_interface_descriptions method queries all interface config paths at once."""
+        self.client.get = MagicMock()
+        self.client.get.return_value = fixtures.INTF_DESCRIPTION_QUERY
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.create_query") as mock_create_query:
+            results = cloudvision.get_interface_descriptions(client=self.client, dId="JPE12345678")
+        mock_create_query.assert_called_once()
+        self.assertEqual(len(mock_create_query.call_args[0][0]), len(cloudvision.INTERFACE_CONFIG_PATHS))
+        self.client.get.assert_called_once()
+        self.assertEqual(results, {"Ethernet1": "Uplink to DC1"})
+
+    def test_get_interface_descriptions_paths(self):
+        """Test the intfConfig notifications of each interface type are matched by a queried path and parsed."""
+        for batch in fixtures.INTF_DESCRIPTIONS_QUERY:
+            for notif in batch["notifications"]:
+                self.assertTrue(
+                    any(
+                        len(path) == len(notif["path_elements"])
+                        and all(
+                            isinstance(elt, cloudvision.Wildcard) or elt == actual
+                            for elt, actual in zip(path, notif["path_elements"])
+                        )
+                        for path in cloudvision.INTERFACE_CONFIG_PATHS
+                    ),
+                    notif["path_elements"],
+                )
+        self.client.get = MagicMock(return_value=fixtures.INTF_DESCRIPTIONS_QUERY)
+        results = cloudvision.get_interface_descriptions(client=self.client, dId="JPE12345678")
+        self.assertEqual(
+            results,
+            {
+                "Ethernet1": "Uplink to DC1",
+                "Ethernet2": "",
+                "Port-Channel10": "MLAG peer link",
+                "Loopback0": "Router ID",
+            },
+        )
 
     def test_get_ip_interfaces(self):
         """Test the get_ip_interfaces method."""
@@ -375,5 +696,179 @@ class TestCloudvisionUtils(TestCase):
             self.client.get = MagicMock()
             self.client.get.return_value = fixtures.IP_INTF_QUERY
             results = cloudvision.get_ip_interfaces(client=self.client, dId="JPE12345678")
-        expected = fixtures.IP_INTF_FIXTURE
+        expected = [cloudvision.IPInterfaceRecord(**intf) for intf in fixtures.IP_INTF_FIXTURE]
         self.assertEqual(results, expected)
+
+    def test_get_device_batches(self):
+        """Test the get_device_batches method queries several devices at once and splits the results by device."""
+        other_batch = {**fixtures.IP_INTF_QUERY[0], "dataset": {"name": "JPE87654321", "type": "device"}}
+        self.client.get = MagicMock()
+        self.client.get.return_value = iter(fixtures.IP_INTF_QUERY + [other_batch])
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.create_query") as mock_create_query:
+            results = cloudvision.get_device_batches(
+                client=self.client, paths=[cloudvision.IP_INTF_CONFIG_PATH], dIds=["JPE12345678", "JPE87654321"]
+            )
+        self.assertEqual(mock_create_query.call_count, 2)
+        self.client.get.assert_called_once()
+        self.assertEqual(
+            cloudvision.parse_ip_interfaces(results["JPE12345678"]),
+            [cloudvision.IPInterfaceRecord(**intf) for intf in fixtures.IP_INTF_FIXTURE],
+        )
+        self.assertEqual(len(results["JPE87654321"]), 1)
+
+    def test_search_ip_interfaces(self):
+        """Test the search_ip_interfaces method pages through search results and groups them by device."""
+        self.client.search = MagicMock()
+        self.client.search.side_effect = [iter(fixtures.IP_INTF_QUERY), iter([])]
+        results = cloudvision.search_ip_interfaces(client=self.client, page_size=2)
+        self.assertEqual(
+            results, {"JPE12345678": [cloudvision.IPInterfaceRecord(**intf) for intf in fixtures.IP_INTF_FIXTURE]}
+        )
+        rows = sum(len(notif["updates"]) for batch in fixtures.IP_INTF_QUERY for notif in batch["notifications"])
+        self.assertEqual([call.kwargs["offset"] for call in self.client.search.call_args_list], [0, rows])
+        self.assertEqual(self.client.search.call_args.kwargs["d_type"], "device")
+
+    def test_search_ip_interfaces_split_notification(self):
+        """Test the search_ip_interfaces method combines a notification split across pages by the row limit."""
+        batch = fixtures.IP_INTF_QUERY[0]
+        notif = batch["notifications"][0]
+        keys = sorted(notif["updates"])
+        half = len(keys) // 2
+        pages = [
+            {**batch, "notifications": [{**notif, "updates": {key: notif["updates"][key] for key in part}}]}
+            for part in (keys[:half], keys[half:])
+        ]
+        self.client.search = MagicMock()
+        self.client.search.side_effect = [iter([pages[0]]), iter([pages[1]]), iter([])]
+        results = cloudvision.search_ip_interfaces(client=self.client, page_size=half)
+        self.assertEqual(results, {"JPE12345678": [cloudvision.IPInterfaceRecord(**fixtures.IP_INTF_FIXTURE[0])]})
+        self.assertEqual([call.kwargs["offset"] for call in self.client.search.call_args_list], [0, half, len(keys)])
+
+    @override_settings(
+        PLUGINS_CONFIG={
+            "nautobot_ssot_aristacv": {"cvp_host": "localhost", "cvp_token": "1234567890abcdef", "verify": True}
+        }
+    )
+    def test_get_cvp_version_cached(self):
+        """Test the get_cvp_version method only requests the version once within the TTL."""
+        self.client.cvp_host = "cvp-cached.example.com"
+        self.client.cvp_token = "1234567890abcdef"  # nosec
+        self.client.token_manager = None
+        mock_session = MagicMock()
+        mock_session.return_value.get.return_value.status_code = 200
+        mock_session.return_value.get.return_value.json.return_value = {"version": "2023.1.0"}
+
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.requests.Session", mock_session):
+            self.assertEqual(cloudvision.get_cvp_version(client=self.client), "2023.1.0")
+            self.assertEqual(cloudvision.get_cvp_version(client=self.client), "2023.1.0")
+        mock_session.return_value.get.assert_called_once()
+
+    def test_get_cvp_version_session(self):
+        """Test the get_cvp_version method uses the logged in session of an on-prem connection and no Bearer token."""
+        self.client.cvp_host = "cvp-session.example.com"
+        self.client.token_manager = MagicMock()
+        self.client.token_manager.get_token.return_value = "session-id"
+        response = self.client.token_manager.session.get.return_value
+        response.status_code = 200
+        response.json.return_value = {"version": "2023.2.0"}
+
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.requests.Session") as mock_session:
+            self.assertEqual(cloudvision.get_cvp_version(client=self.client), "2023.2.0")
+        mock_session.assert_not_called()
+        self.client.token_manager.get_token.assert_called_once()
+        self.assertNotIn("Authorization", self.client.token_manager.session.get.call_args.kwargs["headers"])
+
+    def test_get_cvp_version_cvaas(self):
+        """Test the get_cvp_version method requests the version from the CVaaS URL when there's no cvp_host."""
+        self.client.cvp_host = None
+        self.client.cvp_url = "www.arista.io:443"
+        self.client.cvp_token = "1234567890abcdef"  # nosec
+        self.client.token_manager = None
+        mock_session = MagicMock()
+        mock_session.return_value.get.return_value.status_code = 200
+        mock_session.return_value.get.return_value.json.return_value = {"version": "cvaas"}
+
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.requests.Session", mock_session):
+            self.assertEqual(cloudvision.get_cvp_version(client=self.client), "cvaas")
+        self.assertEqual(
+            mock_session.return_value.get.call_args.args[0],
+            "https://www.arista.io:443/cvpservice/cvpInfo/getCvpInfo.do",
+        )
+
+    @parameterized.expand(
+        [
+            ("server_error", {"raise_for_status.side_effect": requests.HTTPError("500")}),
+            ("not_json", {"json.side_effect": ValueError("Expecting value")}),
+            ("not_object", {"json.return_value": ["2023.1.0"]}),
+        ]
+    )
+    def test_get_cvp_version_failure(self, name, response):  # pylint: disable=unused-argument
+        """Test the get_cvp_version method returns a blank string if the version can't be read."""
+        self.client.cvp_host = f"cvp-{name}.example.com"
+        self.client.cvp_token = "1234567890abcdef"  # nosec
+        self.client.token_manager = None
+        mock_session = MagicMock()
+        mock_session.return_value.get.return_value.status_code = 500
+        mock_session.return_value.get.return_value.configure_mock(**response)
+
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.requests.Session", mock_session):
+            self.assertEqual(cloudvision.get_cvp_version(client=self.client), "")
+
+    def test_get_cvp_version_unreachable(self):
+        """Test the get_cvp_version method returns a blank string if CloudVision can't be reached."""
+        self.client.cvp_host = "cvp-unreachable.example.com"
+        self.client.cvp_token = "1234567890abcdef"  # nosec
+        self.client.token_manager = None
+        mock_session = MagicMock()
+        mock_session.return_value.get.side_effect = requests.ConnectionError()
+
+        with patch("nautobot_ssot_aristacv.utils.cloudvision.requests.Session", mock_session):
+            self.assertEqual(cloudvision.get_cvp_version(client=self.client), "")
+
+
+class TestApplyTagChanges(TestCase):
+    """Test class for applying queued tag changes to CloudVision."""
+
+    databases = ("default", "job_logs")
+
+    def setUp(self):
+        """Setup a tag change set and mocked tag operations."""
+        self.changes = cloudvision.TagChangeSet()
+        self.changes.add_assignment("bgp", "true", "ams01-edge-01")
+        self.changes.add_unassignment("bgp", "false", "ams01-edge-01")
+        self.device_ids = {"ams01-edge-01": "JPE12345678"}
+        self.calls = []
+        for func in ("create_tag", "delete_tag", "assign_tag_to_device", "remove_tag_from_device"):
+            patcher = patch(
+                f"nautobot_ssot_aristacv.utils.cloudvision.{func}",
+                side_effect=lambda *args, _func=func, **kwargs: self.calls.append((_func, kwargs["value"])),
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_apply_tag_changes_phases(self):
+        """Test tags are created, then assigned and removed, then deleted."""
+        errors = cloudvision.apply_tag_changes(client=MagicMock(), changes=self.changes, device_ids=self.device_ids)
+        self.assertEqual(errors, [])
+        self.assertEqual(self.calls[0], ("create_tag", "true"))
+        self.assertEqual(
+            sorted(self.calls[1:3]), [("assign_tag_to_device", "true"), ("remove_tag_from_device", "false")]
+        )
+        self.assertEqual(self.calls[3], ("delete_tag", "false"))
+
+    def test_apply_tag_changes_skips_existing_and_in_use_tags(self):
+        """Test existing tags aren't recreated and tags still in use aren't deleted."""
+        cloudvision.apply_tag_changes(
+            client=MagicMock(),
+            changes=self.changes,
+            device_ids=self.device_ids,
+            existing_tags=[cloudvision.TagRecord("bgp", "true")],
+            tags_in_use=[cloudvision.TagRecord("bgp", "false")],
+        )
+        self.assertEqual(sorted(self.calls), [("assign_tag_to_device", "true"), ("remove_tag_from_device", "false")])
+
+    def test_apply_tag_changes_missing_device(self):
+        """Test assignments to devices missing from CloudVision are reported and skipped."""
+        errors = cloudvision.apply_tag_changes(client=MagicMock(), changes=self.changes, device_ids={})
+        self.assertEqual(errors, ["ams01-edge-01 is inactive or missing in CloudVision - skipping for tag: bgp"])
+        self.assertNotIn(("assign_tag_to_device", "true"), self.calls)
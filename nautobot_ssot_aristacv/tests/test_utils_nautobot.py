@@ -1,11 +1,18 @@
 """Tests of Cloudvision utility methods."""
 from unittest.mock import MagicMock, patch
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
 from django.test import override_settings
 from nautobot.dcim.models import DeviceRole, DeviceType, Manufacturer, Site
-from nautobot.extras.models import Relationship, Tag
+from nautobot.extras.choices import ObjectChangeActionChoices
+from nautobot.extras.context_managers import JobChangeContext, change_logging
+from nautobot.extras.models import ObjectChange, Relationship, Tag
 from nautobot.utilities.testing import TestCase
 from nautobot_ssot_aristacv.utils import nautobot
 
+User = get_user_model()
+
 
 class TestNautobotUtils(TestCase):
     """Test Nautobot utility methods."""
@@ -151,6 +158,44 @@ class TestNautobotUtils(TestCase):
         expected = (None, "leaf")
         self.assertEqual(results, expected)
 
+    @override_settings(
+        PLUGINS_CONFIG={
+            "nautobot_ssot_aristacv": {
+                "hostname_patterns": [r"(?P<site>\w{2,3}\d+)-(?P<role>\w+)", r"(?P<role>\w+)-\d+$"],
+                "site_mappings": {},
+                "role_mappings": {},
+            }
+        }
+    )
+    def test_parse_hostname_last_match_wins(self):
+        """Test the parse_hostname method uses the last matching pattern when several patterns match."""
+        results = nautobot.parse_hostname("ams01-leaf-spine-01")
+        expected = ("ams01", "spine")
+        self.assertEqual(results, expected)
+
+    def test_hostname_mappings_passed_in(self):
+        """Test the hostname helpers use the mappings they're given without reading the settings."""
+        mappings = nautobot.HostnameMappings(
+            hostname_patterns=(r"(?P<site>\w{2,3}\d+)-(?P<role>\w+)-\d+",),
+            site_mappings={"ams01": "Amsterdam"},
+            role_mappings={"leaf": "Leaf Switch"},
+        )
+        with patch("nautobot_ssot_aristacv.utils.nautobot.HostnameMappings.from_settings") as mock_from_settings:
+            self.assertEqual(nautobot.parse_hostname("ams01-leaf-01", mappings=mappings), ("ams01", "leaf"))
+            self.assertEqual(nautobot.get_site_from_map("ams01", mappings=mappings), "Amsterdam")
+            self.assertEqual(nautobot.get_role_from_map("leaf", mappings=mappings), "Leaf Switch")
+        mock_from_settings.assert_not_called()
+
+    def test_match_hostname_cached(self):
+        """Test the match_hostname method caches results and compiles patterns once."""
+        nautobot.match_hostname.cache_clear()
+        nautobot.compile_hostname_patterns.cache_clear()
+        patterns = (r"(?P<site>\w{2,3}\d+)-(?P<role>\w+)-\d+",)
+        for _ in range(3):
+            self.assertEqual(nautobot.match_hostname("ams01-leaf-01", patterns), ("ams01", "leaf"))
+        self.assertEqual(nautobot.match_hostname.cache_info().hits, 2)
+        self.assertEqual(nautobot.compile_hostname_patterns.cache_info().misses, 1)
+
     @override_settings(
         PLUGINS_CONFIG={
             "nautobot_ssot_aristacv": {
@@ -206,3 +251,112 @@ class TestNautobotUtils(TestCase):
         results = nautobot.get_role_from_map("rtr")
         expected = None
         self.assertEqual(results, expected)
+
+
+class TestBatchedWriter(TestCase):
+    """Test the BatchedWriter and update_fields."""
+
+    databases = ("default", "job_logs")
+
+    def setUp(self):
+        """Setup mock Job."""
+        self.job = MagicMock()
+        self.job.request.user = User.objects.create(username="writer")
+        self.job.job_result.job_model.slug = "cloudvision-data-source"
+
+    def test_add_flushes_full_batch(self):
+        """Test writes are applied once a batch is full and the rest are kept until flush."""
+        writer = nautobot.BatchedWriter(job=self.job, batch_size=2)
+        for name in ["tag1", "tag2", "tag3"]:
+            writer.add(f"create Tag {name}", lambda name=name: Tag.objects.create(name=name, slug=name))
+        self.assertEqual(Tag.objects.filter(name__startswith="tag").count(), 2)
+        self.assertEqual(len(writer.operations), 1)
+        writer.flush()
+        self.assertEqual(Tag.objects.filter(name__startswith="tag").count(), 3)
+
+    def test_flush_skips_failed_write(self):
+        """Test a failing write only skips that write and not the rest of its batch."""
+
+        def fail():
+            raise ValidationError("Invalid")
+
+        writer = nautobot.BatchedWriter(job=self.job)
+        writer.add("create Tag tag1", lambda: Tag.objects.create(name="tag1", slug="tag1"))
+        writer.add("create Tag tag2", fail)
+        writer.add("create Tag tag3", lambda: Tag.objects.create(name="tag3", slug="tag3"))
+        writer.flush()
+        self.assertEqual(
+            list(Tag.objects.filter(name__startswith="tag").values_list("name", flat=True)), ["tag1", "tag3"]
+        )
+        self.assertEqual(writer.failed, ["create Tag tag2"])
+        self.job.log_warning.assert_called_once_with(message="Unable to create Tag tag2. ['Invalid']")
+
+    def test_flush_drops_writes_of_failed_parent(self):
+        """Test writes depending on a write that failed are dropped, in its batch and later ones, without being tried."""
+
+        def fail():
+            raise ValidationError("Invalid")
+
+        child = MagicMock()
+        writer = nautobot.BatchedWriter(job=self.job, batch_size=3)
+        writer.add("create Device leaf1", fail, key="leaf1")
+        writer.add("create Interface Ethernet1 for leaf1", child, parent="leaf1")
+        writer.add("create Tag tag1", lambda: Tag.objects.create(name="tag1", slug="tag1"), parent="leaf2")
+        writer.add("create Interface Ethernet2 for leaf1", child, parent="leaf1")
+        writer.flush()
+        child.assert_not_called()
+        self.assertTrue(Tag.objects.filter(name="tag1").exists())
+        self.assertEqual(
+            writer.failed,
+            [
+                "create Device leaf1",
+                "create Interface Ethernet1 for leaf1",
+                "create Interface Ethernet2 for leaf1",
+            ],
+        )
+
+    def test_add_save_loads_instances_in_bulk(self):
+        """Test objects saved in a batch are loaded with a single query and a missing object only fails its save."""
+        tags = [Tag.objects.create(name=name, slug=name) for name in ["tag1", "tag2"]]
+        deleted = Tag.objects.create(name="tag3", slug="tag3")
+        deleted_pk = deleted.pk
+        deleted.delete()
+
+        def describe(tag):
+            tag.description = "Updated"
+            tag.validated_save()
+
+        writer = nautobot.BatchedWriter(job=self.job)
+        for pk, name in [(tag.pk, tag.name) for tag in tags] + [(deleted_pk, "tag3")]:
+            writer.add_save(Tag, pk, f"update Tag {name}", describe)
+        with patch.object(Tag.objects, "in_bulk", wraps=Tag.objects.in_bulk) as mock_in_bulk:
+            writer.flush()
+        mock_in_bulk.assert_called_once()
+        self.assertEqual(
+            set(Tag.objects.filter(description="Updated").values_list("name", flat=True)), {"tag1", "tag2"}
+        )
+        self.assertEqual(writer.failed, ["update Tag tag3"])
+
+    def test_flush_change_logging(self):
+        """Test writes applied in a batch are recorded by Nautobot's change logging."""
+        writer = nautobot.BatchedWriter(job=self.job)
+        change_context = JobChangeContext(user=self.job.request.user, context_detail="test")
+        with change_logging(change_context):
+            for name in ["tag1", "tag2"]:
+                writer.add(f"create Tag {name}", lambda name=name: Tag.objects.create(name=name, slug=name))
+            writer.flush()
+        changes = ObjectChange.objects.filter(changed_object_type=ContentType.objects.get_for_model(Tag))
+        self.assertEqual(changes.count(), 2)
+        self.assertEqual({change.request_id for change in changes}, {change_context.change_id})
+        self.assertEqual({change.user_name for change in changes}, {"writer"})
+
+    def test_update_fields_change_logging(self):
+        """Test objects written with a queryset update are recorded by Nautobot's change logging."""
+        tag = Tag.objects.create(name="tag1", slug="tag1")
+        with change_logging(JobChangeContext(user=self.job.request.user, context_detail="test")):
+            nautobot.update_fields(Tag, [tag.pk], {"description": "Updated"})
+        self.assertEqual(Tag.objects.get(pk=tag.pk).description, "Updated")
+        change = ObjectChange.objects.get(changed_object_id=tag.pk)
+        self.assertEqual(change.action, ObjectChangeActionChoices.ACTION_UPDATE)
+        self.assertEqual(change.user_name, "writer")
+        self.assertEqual(change.object_data["description"], "Updated")
@@ -1,8 +1,17 @@
 # pylint: disable=invalid-name, no-member
 """Utility functions for CloudVision Resource API."""
+import random
+import re
 import ssl
+import struct
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any, Iterable, List, Optional, Tuple, Union
+from functools import lru_cache, partial, wraps
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
 
 import google.protobuf.timestamp_pb2 as pbts
 import grpc
@@ -14,24 +23,116 @@ from arista.tag.v2 import services as tag_services
 from django.conf import settings
 from google.protobuf.wrappers_pb2 import StringValue  # pylint: disable=no-name-in-module
 
-from cvprac.cvp_client import CvpClient
-from cvprac.cvp_client import CvpLoginError
 import cloudvision.Connector.gen.notification_pb2 as ntf
 import cloudvision.Connector.gen.router_pb2 as rtr
 import cloudvision.Connector.gen.router_pb2_grpc as rtr_client
 from cloudvision.Connector import codec
 from cloudvision.Connector.codec import Wildcard
 from cloudvision.Connector.codec.custom_types import FrozenDict
-from cloudvision.Connector.grpc_client.grpcClient import create_query, to_pbts
+from cloudvision.Connector.grpc_client.grpcClient import to_pbts
 
-from nautobot_ssot_aristacv.constant import PORT_TYPE_MAP
+from nautobot_ssot_aristacv.constant import INTERFACE_TYPE_MAP, PORT_TYPE_MAP
 
 RPC_TIMEOUT = 30
+# Deadline, in seconds, of each type of call. The inventory stream is consumed while devices are being synced so,
+# like Subscribe, it has no deadline by default.
+RPC_DEADLINES = {
+    "get": 60,
+    "search": 120,
+    "datasets": 60,
+    "inventory": None,
+    "subscribe": None,
+    "tags": 60,
+    "write": RPC_TIMEOUT,
+}
+RPC_RETRIES = 3
+RPC_BACKOFF = 0.5
+RPC_MAX_BACKOFF = 10
+RETRYABLE_STATUS_CODES = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+HEDGED_CALL_TYPES = ("get",)
+# Keepalive pings stop idle pooled channels being silently dropped by firewalls/load balancers.
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 60000),
+    ("grpc.keepalive_timeout_ms", 20000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.max_pings_without_data", 0),
+]
+POOL_IDLE_TIMEOUT = 900
+POOL_MAX_AGE = 3600
+POOL_HEALTH_CHECK_TIMEOUT = 5
+SESSION_TTL = 3600
+SESSION_REFRESH_MARGIN = 300
+CVP_VERSION_TTL = 3600
+TAG_SYNC_WORKERS = 8
+SEARCH_PAGE_SIZE = 1000
+DEVICE_BATCH_SIZE = 25
+DEVICE_FAILURE_BUDGET = 10
+PATH_CACHE_SIZE = 4096
+# msgpack encodings of the scalar leaves decoded by ScalarDecoder, keyed by their format byte.
+MSGPACK_CONSTANTS = {0xC0: None, 0xC2: False, 0xC3: True}
+MSGPACK_NUMBERS = {
+    0xCA: struct.Struct(">f"),
+    0xCB: struct.Struct(">d"),
+    0xCC: struct.Struct(">B"),
+    0xCD: struct.Struct(">H"),
+    0xCE: struct.Struct(">I"),
+    0xCF: struct.Struct(">Q"),
+    0xD0: struct.Struct(">b"),
+    0xD1: struct.Struct(">h"),
+    0xD2: struct.Struct(">i"),
+    0xD3: struct.Struct(">q"),
+}
+# Length prefix and how invalid UTF-8 is handled, matching the codec: bin is decoded by it, str by msgpack.
+MSGPACK_STRINGS = {
+    0xC4: (struct.Struct(">B"), "replace"),
+    0xC5: (struct.Struct(">H"), "replace"),
+    0xC6: (struct.Struct(">I"), "replace"),
+    0xD9: (struct.Struct(">B"), "strict"),
+    0xDA: (struct.Struct(">H"), "strict"),
+    0xDB: (struct.Struct(">I"), "strict"),
+}
 TIME_TYPE = Union[pbts.Timestamp, datetime]
 UPDATE_TYPE = Tuple[Any, Any]
 UPDATES_TYPE = List[UPDATE_TYPE]
 
 
+class DeviceRecord(NamedTuple):
+    """Device information from the CloudVision inventory."""
+
+    device_id: str
+    hostname: str
+    fqdn: str
+    sw_ver: str
+    model: str
+    status: str
+    system_mac_address: str
+
+
+class InterfaceRecord(NamedTuple):
+    """Interface status information for a device."""
+
+    interface: str = ""
+    link_status: str = "down"
+    oper_status: str = "down"
+    enabled: bool = False
+    mac_addr: str = ""
+    mtu: Optional[int] = None
+
+
+class IPInterfaceRecord(NamedTuple):
+    """IP Address assigned to a device interface."""
+
+    interface: str
+    address: Optional[str]
+
+
+class TagRecord(NamedTuple):
+    """Label and value pair of a CloudVision tag."""
+
+    label: str
+    value: str
+
+
 class AuthFailure(Exception):
     """Exception raised when authenticating to on-prem CVP fails."""
 
@@ -42,6 +143,493 @@ class AuthFailure(Exception):
         super().__init__(self.message)
 
 
+class FailureBudgetExceeded(Exception):
+    """Exception raised when more devices failed to load from CloudVision than the failure budget allows."""
+
+
+class DeviceDataError(Exception):
+    """Exception raised when the data CloudVision returned for a device isn't in the shape it's parsed as."""
+
+
+class DeviceQuarantine:
+    """Devices that failed to load from CloudVision, which are skipped rather than failing the whole sync.
+
+    Once more than `budget` devices have failed the failures are unlikely to be isolated to the devices, ie
+    CloudVision itself is unavailable, so FailureBudgetExceeded is raised to abort the sync.
+    """
+
+    def __init__(self, budget: int = DEVICE_FAILURE_BUDGET, devices: Optional[Dict[str, str]] = None):
+        """Initialize the quarantine.
+
+        Args:
+            budget (int): Number of devices allowed to fail.
+            devices (dict, optional): Dictionary to record the error of each failed device in, keyed by hostname.
+        """
+        self.budget = budget
+        self.devices = devices if devices is not None else {}
+
+    @classmethod
+    def from_settings(cls, devices: Optional[Dict[str, str]] = None):
+        """Build a quarantine using the `device_failure_budget` plugin setting."""
+        return cls(
+            budget=settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get(
+                "device_failure_budget", DEVICE_FAILURE_BUDGET
+            ),
+            devices=devices,
+        )
+
+    def add(self, hostname: str, error: Exception):
+        """Quarantine a device, raising FailureBudgetExceeded if too many devices have failed."""
+        self.devices[hostname] = str(error)
+        if len(self.devices) > self.budget:
+            raise FailureBudgetExceeded(
+                f"{len(self.devices)} devices failed to load from CloudVision, exceeding the budget of {self.budget}."
+            )
+
+    def __contains__(self, hostname: str) -> bool:
+        """Whether a device is quarantined."""
+        return hostname in self.devices
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the hostnames of the quarantined devices."""
+        return iter(self.devices)
+
+    def __len__(self) -> int:
+        """Number of quarantined devices."""
+        return len(self.devices)
+
+
+class SessionTokenManager:
+    """Caches the session token from an on-prem CloudVision login and refreshes it before it expires.
+
+    A single manager is shared, via `get_token_manager`, by every connection using the same host and credentials
+    so a login only happens when there's no valid token cached.
+    """
+
+    def __init__(
+        self,
+        cvp_host: str,
+        username: str,
+        password: str,
+        verify: bool = True,
+        ttl: int = SESSION_TTL,
+        refresh_margin: int = SESSION_REFRESH_MARGIN,
+    ):  # pylint: disable=too-many-arguments
+        """Initialize the token manager without logging in."""
+        self.cvp_host = cvp_host
+        self.username = username
+        self.password = password
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.session = requests.Session()
+        self.session.verify = verify
+        self.token = None
+        self.expires = 0
+        self._lock = threading.Lock()
+
+    def login(self):
+        """Authenticate to CloudVision and cache the returned session token."""
+        response = self.session.post(  # nosec
+            f"https://{self.cvp_host}/cvpservice/login/authenticate.do",
+            auth=(self.username, self.password),
+        )
+        session_id = response.json().get("sessionId")
+        if not session_id:
+            error_code = response.json().get("errorCode")
+            error_message = response.json().get("errorMessage")
+            raise AuthFailure(error_code, error_message)
+        self.token = session_id
+        self.expires = time.monotonic() + self.ttl
+
+    def get_token(self) -> str:
+        """Get the cached session token, logging in again if it's missing or about to expire."""
+        with self._lock:
+            if not self.token or time.monotonic() >= self.expires - self.refresh_margin:
+                self.login()
+            return self.token
+
+    def invalidate(self):
+        """Drop the cached session token so the next request logs in again."""
+        with self._lock:
+            self.token = None
+            self.expires = 0
+
+
+_TOKEN_MANAGERS = {}
+_TOKEN_MANAGERS_LOCK = threading.Lock()
+_CVP_VERSION_CACHE = {}
+
+
+def get_token_manager(cvp_host: str, username: str, password: str, verify: bool = True) -> SessionTokenManager:
+    """Get the process-wide SessionTokenManager for a CloudVision host and credentials."""
+    key = (cvp_host, username, password, bool(verify))
+    with _TOKEN_MANAGERS_LOCK:
+        if key not in _TOKEN_MANAGERS:
+            PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
+            _TOKEN_MANAGERS[key] = SessionTokenManager(
+                cvp_host=cvp_host,
+                username=username,
+                password=password,
+                verify=verify,
+                ttl=PLUGIN_SETTINGS.get("session_ttl", SESSION_TTL),
+            )
+        return _TOKEN_MANAGERS[key]
+
+
+class SessionTokenAuth(grpc.AuthMetadataPlugin):
+    """gRPC call credentials that always send the current session token from a SessionTokenManager."""
+
+    def __init__(self, token_manager: SessionTokenManager):
+        """Initialize the plugin with the token manager to take tokens from."""
+        self.token_manager = token_manager
+
+    def __call__(self, context, callback):
+        """Supply the authorization metadata for a call."""
+        try:
+            callback((("authorization", f"Bearer {self.token_manager.get_token()}"),), None)
+        except AuthFailure as err:
+            callback((), err)
+
+
+class RpcTimings:
+    """Number of calls, retries, hedges and failures, and the latency in seconds, of each type of call."""
+
+    def __init__(self):
+        """Initialize empty timings."""
+        self.calls = defaultdict(
+            lambda: {"calls": 0, "retries": 0, "hedges": 0, "failures": 0, "total": 0.0, "max": 0.0}
+        )
+        self._lock = threading.Lock()
+
+    def record(
+        self, call_type: str, latency: float, retries: int = 0, hedged: bool = False, failed: bool = False
+    ):  # pylint: disable=too-many-arguments
+        """Record a call, including any retries it took."""
+        with self._lock:
+            timings = self.calls[call_type]
+            timings["calls"] += 1
+            timings["retries"] += retries
+            timings["hedges"] += int(hedged)
+            timings["failures"] += int(failed)
+            timings["total"] += latency
+            timings["max"] = max(timings["max"], latency)
+
+    def reset(self):
+        """Drop all recorded timings."""
+        with self._lock:
+            self.calls.clear()
+
+    def summary(self) -> Dict[str, str]:
+        """Returns a line describing the timings of each type of call."""
+        with self._lock:
+            return {
+                call_type: (
+                    f"{timings['calls']} calls, {timings['retries']} retries, {timings['hedges']} hedged, "
+                    f"{timings['failures']} failed, avg {timings['total'] / timings['calls']:.3f}s, "
+                    f"max {timings['max']:.3f}s"
+                )
+                for call_type, timings in sorted(self.calls.items())
+            }
+
+
+RPC_TIMINGS = RpcTimings()
+_END = object()
+_NOT_SCALAR = object()
+
+
+def is_retryable(err: Exception) -> bool:
+    """Whether a failed call may succeed if it's tried again, ie the server was unavailable or too slow."""
+    return (
+        isinstance(err, grpc.RpcError) and callable(getattr(err, "code", None)) and err.code() in RETRYABLE_STATUS_CODES
+    )
+
+
+def cancel_stream(responses):
+    """Cancel a server streaming gRPC call. Cancelling an already completed call is a no-op."""
+    if hasattr(responses, "cancel"):
+        responses.cancel()
+
+
+class RpcPolicy:
+    """Deadlines, retries and hedging applied to the calls made to CloudVision.
+
+    Every call is given the deadline of its type so a stalled device dataset can't block a sync. Calls failing with
+    UNAVAILABLE or DEADLINE_EXCEEDED are retried after a jittered, exponential backoff; streams are only retried if
+    they fail before their first response, as nothing has been handed to the caller yet. Get streams that haven't
+    responded within `hedge_after` seconds are hedged with a second, identical request and whichever responds first
+    is used. The latency of every call is recorded in `timings`.
+    """
+
+    def __init__(
+        self,
+        deadlines: Optional[Dict[str, Optional[float]]] = None,
+        retries: int = RPC_RETRIES,
+        backoff: float = RPC_BACKOFF,
+        max_backoff: float = RPC_MAX_BACKOFF,
+        hedge_after: Optional[float] = None,
+        timings: Optional[RpcTimings] = None,
+    ):  # pylint: disable=too-many-arguments
+        """Initialize the policy.
+
+        Args:
+            deadlines (dict): Deadline, in seconds, of each type of call, extending `RPC_DEADLINES`. None disables it.
+            retries (int): Number of times a call failing with a retryable error is tried again.
+            backoff (float): Base, in seconds, of the exponential backoff between retries.
+            max_backoff (float): Longest backoff, in seconds, between retries.
+            hedge_after (float, optional): Seconds to wait for the first response of a Get before hedging it.
+            timings (RpcTimings, optional): Where to record call timings. Defaults to `RPC_TIMINGS`.
+        """
+        self.deadlines = {**RPC_DEADLINES, **(deadlines or {})}
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.timings = timings or RPC_TIMINGS
+
+    @classmethod
+    def from_settings(cls):
+        """Build a policy using the `rpc_deadlines`, `rpc_retries` and `rpc_hedge_after` plugin settings."""
+        PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
+        return cls(
+            deadlines=PLUGIN_SETTINGS.get("rpc_deadlines"),
+            retries=PLUGIN_SETTINGS.get("rpc_retries", RPC_RETRIES),
+            hedge_after=PLUGIN_SETTINGS.get("rpc_hedge_after"),
+        )
+
+    def deadline(self, call_type: str) -> Optional[float]:
+        """Returns the deadline, in seconds, of a type of call."""
+        return self.deadlines.get(call_type)
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Returns a random delay, up to an exponentially growing limit, to wait before retrying a call."""
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))  # nosec
+
+    def _with_retries(self, call_type: str, func: Callable[[], Any], start: float) -> Tuple[Any, int]:
+        """Run `func`, retrying it after a backoff while it fails with a retryable error.
+
+        Returns:
+            Tuple: The result of `func` and the number of retries it took.
+        """
+        attempt = 0
+        while True:
+            try:
+                return func(), attempt
+            except grpc.RpcError as err:
+                if attempt >= self.retries or not is_retryable(err):
+                    self.timings.record(call_type, time.monotonic() - start, retries=attempt, failed=True)
+                    raise
+            time.sleep(self.backoff_delay(attempt))
+            attempt += 1
+
+    def call(self, call_type: str, func: Callable[..., Any]) -> Any:
+        """Make a unary call, retrying it if it fails with a retryable error.
+
+        Args:
+            call_type (str): Type of call, ie `write`, used to look up its deadline.
+            func (Callable): Makes the call, accepting the deadline as a `timeout` keyword argument.
+        """
+        start = time.monotonic()
+        result, retries = self._with_retries(call_type, partial(func, timeout=self.deadline(call_type)), start)
+        self.timings.record(call_type, time.monotonic() - start, retries=retries)
+        return result
+
+    def stream(self, call_type: str, func: Callable[..., Iterable]) -> Iterator:
+        """Yield the responses of a server streaming call, retrying it if it fails before its first response.
+
+        The stream is cancelled if the consumer stops iterating early.
+
+        Args:
+            call_type (str): Type of call, ie `get`, used to look up its deadline.
+            func (Callable): Starts the call, accepting the deadline as a `timeout` keyword argument.
+        """
+        start = time.monotonic()
+        (responses, iterator, first, hedged), retries = self._with_retries(
+            call_type, partial(self._first_response, call_type, func), start
+        )
+        self.timings.record(call_type, time.monotonic() - start, retries=retries, hedged=hedged)
+        try:
+            if first is not _END:
+                yield first
+                yield from iterator
+        finally:
+            cancel_stream(responses)
+
+    def _first_response(self, call_type: str, func: Callable[..., Iterable]):
+        """Start a stream and wait for its first response, hedging the call if it's slow to respond.
+
+        Returns:
+            Tuple: The stream, an iterator over the rest of its responses, its first response and whether it was hedged.
+        """
+        responses = func(timeout=self.deadline(call_type))
+        iterator = iter(responses)
+        if not self.hedge_after or call_type not in HEDGED_CALL_TYPES:
+            try:
+                return responses, iterator, next(iterator, _END), False
+            except grpc.RpcError:
+                cancel_stream(responses)
+                raise
+        streams = [(responses, iterator)]
+        winner = None
+        executor = ThreadPoolExecutor(max_workers=2)
+        try:
+            pending = {executor.submit(next, iterator, _END): 0}
+            done, _ = wait(pending, timeout=self.hedge_after)
+            if not done:
+                hedge = func(timeout=self.deadline(call_type))
+                streams.append((hedge, iter(hedge)))
+                pending[executor.submit(next, streams[1][1], _END)] = 1
+            error = None
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    if future.exception() is None:
+                        winner = index
+                        return streams[index][0], streams[index][1], future.result(), len(streams) > 1
+                    error = error or future.exception()
+            raise error
+        finally:
+            # Every call but the one being returned is cancelled, including when the hedge itself fails to start,
+            # which unblocks their worker threads so they can be joined rather than left running.
+            for index, (stream, _) in enumerate(streams):
+                if index != winner:
+                    cancel_stream(stream)
+            executor.shutdown(wait=True)
+
+
+@lru_cache(maxsize=None)
+def get_rpc_policy() -> RpcPolicy:
+    """Get the RPC policy configured by the plugin settings, created once on first use."""
+    return RpcPolicy.from_settings()
+
+
+class ScalarDecoder(codec.Decoder):
+    """CloudVision decoder with a fast path for scalar leaves, ie strings, integers, floats and booleans.
+
+    Most keys and values in a notification are scalars such as `intfId`, `mtu` or `burnedInAddr`, these are decoded
+    straight from their msgpack encoding rather than going through msgpack's Unpacker and the codec's post-processing.
+    Anything else, ie maps, arrays, pointers or invalid UTF-8 strings, is left to the generic codec.
+    """
+
+    def decode(self, buf: bytes):
+        """Decode a msgpack encoded CloudVision value."""
+        value = self.decode_scalar(buf)
+        if value is _NOT_SCALAR:
+            return super().decode(buf)
+        return value
+
+    @staticmethod
+    def decode_scalar(buf: bytes):  # pylint: disable=too-many-return-statements
+        """Decode a buffer holding exactly one scalar value, returning `_NOT_SCALAR` if it holds anything else."""
+        size = len(buf)
+        if not size:
+            return _NOT_SCALAR
+        first = buf[0]
+        if size == 1:
+            if first < 0x80:
+                return first
+            if first >= 0xE0:
+                return first - 0x100
+            if first == 0xA0:
+                return ""
+            return MSGPACK_CONSTANTS.get(first, _NOT_SCALAR)
+        if 0xA0 <= first < 0xC0:
+            if size != 1 + (first & 0x1F):
+                return _NOT_SCALAR
+            start, errors = 1, "strict"
+        elif first in MSGPACK_NUMBERS:
+            number = MSGPACK_NUMBERS[first]
+            return number.unpack_from(buf, 1)[0] if size == 1 + number.size else _NOT_SCALAR
+        elif first in MSGPACK_STRINGS:
+            length, errors = MSGPACK_STRINGS[first]
+            start = 1 + length.size
+            if size < start or size != start + length.unpack_from(buf, 1)[0]:
+                return _NOT_SCALAR
+        else:
+            return _NOT_SCALAR
+        try:
+            return buf[start:].decode("utf-8", errors)
+        except UnicodeDecodeError:
+            return _NOT_SCALAR
+
+
+_CODECS = threading.local()
+
+
+def get_encoder() -> codec.Encoder:
+    """Get the Encoder shared by every CloudVision connection used in the current thread.
+
+    The codec keeps msgpack state between calls so an Encoder, or Decoder, can't be used by several threads at once.
+    """
+    if not hasattr(_CODECS, "encoder"):
+        _CODECS.encoder = codec.Encoder()
+    return _CODECS.encoder
+
+
+def get_decoder() -> ScalarDecoder:
+    """Get the Decoder shared by every CloudVision connection used in the current thread."""
+    if not hasattr(_CODECS, "decoder"):
+        _CODECS.decoder = ScalarDecoder()
+    return _CODECS.decoder
+
+
+class PathEncoder:
+    """Encodes the path elements of queries, caching the encoded paths.
+
+    Queries use a few constant paths, ie `INTERFACE_STATUS_PATH`, or constant prefixes followed by interface names that
+    repeat on every device, so each distinct path is encoded once and then reused. Every wildcard has the same
+    encoding so they all share it.
+    """
+
+    def __init__(self, cache_size: int = PATH_CACHE_SIZE):
+        """Initialize the encoder.
+
+        Args:
+            cache_size (int): Number of encoded paths to keep.
+        """
+        self.wildcard = codec.Encoder().encode(Wildcard())
+        self._encode_key = lru_cache(maxsize=cache_size)(self._encode_elements)
+
+    def encode(self, path: Iterable[Any]) -> List[bytes]:
+        """Returns the encoded elements of a path."""
+        path = list(path)
+        # Only strings are cached as other elements, ie True and 1, may compare equal despite differing encodings.
+        if all(isinstance(elt, (str, Wildcard)) for elt in path):
+            return list(self._encode_key(tuple(None if isinstance(elt, Wildcard) else elt for elt in path)))
+        encoder = get_encoder()
+        return [self.wildcard if isinstance(elt, Wildcard) else encoder.encode(elt) for elt in path]
+
+    def _encode_elements(self, key: Tuple[Optional[str], ...]) -> Tuple[bytes, ...]:
+        """Encode a path with its wildcards replaced by None."""
+        encoder = get_encoder()
+        return tuple(self.wildcard if elt is None else encoder.encode(elt) for elt in key)
+
+
+PATH_ENCODER = PathEncoder()
+
+
+def create_query(pathKeys: List[Any], dId: str, dtype: str = "device") -> rtr.Query:
+    """Creates a query on the paths of a dataset, reusing the encoded paths of earlier queries.
+
+    Args:
+        pathKeys (list): Paths and the keys to get from them, of the form `[([pathElts...], [keys...])...]`.
+        dId (str): Name of the dataset, ie the device ID.
+        dtype (str): Type of the dataset.
+
+    Returns:
+        rtr.Query: Query protobuf message.
+    """
+    encoder = get_encoder()
+    return rtr.Query(
+        dataset=ntf.Dataset(type=dtype, name=dId),
+        paths=[
+            rtr.Path(keys=[encoder.encode(key) for key in keys], path_elements=PATH_ENCODER.encode(path))
+            for path, keys in pathKeys
+            if keys is not None
+        ],
+    )
+
+
 class CloudvisionApi:  # pylint: disable=too-many-instance-attributes, too-many-arguments
     """Arista Cloudvision gRPC client."""
 
@@ -55,9 +643,9 @@ class CloudvisionApi:  # pylint: disable=too-many-instance-attributes, too-many-
         username: str = None,
         password: str = None,
         cvp_token: str = None,
+        cvaas_url: str = None,
     ):
         """Create Cloudvision API connection."""
-        self.metadata = None
         self.cvp_host = cvp_host
         self.cvp_port = cvp_port
         self.cvp_url = f"{cvp_host}:{cvp_port}"
@@ -65,6 +653,8 @@ class CloudvisionApi:  # pylint: disable=too-many-instance-attributes, too-many-
         self.username = username
         self.password = password
         self.cvp_token = cvp_token
+        self.token_manager = None
+        self.created = time.monotonic()
 
         # If CVP_HOST is defined, we assume an on-prem installation.
         if self.cvp_host:
@@ -77,36 +667,45 @@ class CloudvisionApi:  # pylint: disable=too-many-instance-attributes, too-many-
             if self.cvp_token:
                 call_creds = grpc.access_token_call_credentials(self.cvp_token)
             elif self.username != "" and self.password != "":  # nosec
-                response = requests.post(  # nosec
-                    f"https://{self.cvp_host}/cvpservice/login/authenticate.do",
-                    auth=(self.username, self.password),
-                    verify=self.verify,
-                )
-                session_id = response.json().get("sessionId")
-                if not session_id:
-                    error_code = response.json().get("errorCode")
-                    error_message = response.json().get("errorMessage")
-                    raise AuthFailure(error_code, error_message)
-                if not self.cvp_token:
-                    self.cvp_token = session_id
-                call_creds = grpc.access_token_call_credentials(session_id)
+                # Session tokens are shared between connections and refreshed before they expire.
+                self.token_manager = get_token_manager(self.cvp_host, self.username, self.password, self.verify)
+                self.cvp_token = self.token_manager.get_token()
+                call_creds = grpc.metadata_call_credentials(SessionTokenAuth(self.token_manager))
             else:
                 raise AuthFailure(
                     error_code="Missing Credentials", message="Unable to authenticate due to missing credentials."
                 )
-            self.metadata = ((self.AUTH_KEY_PATH, self.cvp_token),)
         # Set up credentials for CVaaS using supplied token.
         else:
-            self.cvp_url = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("cvaas_url", "www.arista.io:443")
+            self.cvp_url = cvaas_url or settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get(
+                "cvaas_url", "www.arista.io:443"
+            )
             call_creds = grpc.access_token_call_credentials(self.cvp_token)
             channel_creds = grpc.ssl_channel_credentials()
         conn_creds = grpc.composite_channel_credentials(channel_creds, call_creds)
-        self.comm_channel = grpc.secure_channel(self.cvp_url, conn_creds)
+        self.comm_channel = grpc.secure_channel(self.cvp_url, conn_creds, options=CHANNEL_OPTIONS)
         self.__client = rtr_client.RouterV1Stub(self.comm_channel)
         self.__auth_client = rtr_client.AuthStub(self.comm_channel)
         self.__search_client = rtr_client.SearchStub(self.comm_channel)
-        self.encoder = codec.Encoder()
-        self.decoder = codec.Decoder()
+
+    @property
+    def encoder(self) -> codec.Encoder:
+        """Encoder shared with the other connections used in the current thread."""
+        return get_encoder()
+
+    @property
+    def decoder(self) -> ScalarDecoder:
+        """Decoder shared with the other connections used in the current thread."""
+        return get_decoder()
+
+    @property
+    def metadata(self):
+        """Metadata carrying the current access token for on-prem connections."""
+        if not self.cvp_host:
+            return None
+        if self.token_manager:
+            self.cvp_token = self.token_manager.get_token()
+        return ((self.AUTH_KEY_PATH, self.cvp_token),)
 
     def __enter__(self):
         """Magic method to enable use of class with `with` statement."""
@@ -151,7 +750,10 @@ class CloudvisionApi:  # pylint: disable=too-many-instance-attributes, too-many-
             sharded_sub=sharding,
             exact_range=exact_range,
         )
-        stream = self.__client.Get(request, metadata=self.metadata)
+        # The metadata is looked up again for each attempt so a retry after the session token expired still succeeds.
+        stream = get_rpc_policy().stream(
+            "get", lambda timeout: self.__client.Get(request, metadata=self.metadata, timeout=timeout)
+        )
         return (self.decode_batch(nb) for nb in stream)
 
     def subscribe(self, queries, sharding=None):
@@ -161,7 +763,9 @@ class CloudvisionApi:  # pylint: disable=too-many-instance-attributes, too-many-
         sharding, if present must be a protobuf sharding message.
         """
         req = rtr.SubscribeRequest(query=queries, sharded_sub=sharding)
-        stream = self.__client.Subscribe(req, metadata=self.metadata)
+        stream = get_rpc_policy().stream(
+            "subscribe", lambda timeout: self.__client.Subscribe(req, metadata=self.metadata, timeout=timeout)
+        )
         return (self.decode_batch(nb) for nb in stream)
 
     def publish(
@@ -188,7 +792,9 @@ class CloudvisionApi:  # pylint: disable=too-many-instance-attributes, too-many-
             sync=sync,
             compare=comp_pb,
         )
-        self.__client.Publish(req, metadata=self.metadata)
+        get_rpc_policy().call(
+            "write", lambda timeout: self.__client.Publish(req, metadata=self.metadata, timeout=timeout)
+        )
 
     def get_datasets(self, types: Optional[List[str]] = None):
         """Get Datasets retrieves all the datasets streaming on CloudVision.
@@ -196,13 +802,16 @@ class CloudvisionApi:  # pylint: disable=too-many-instance-attributes, too-many-
         types, if present, filter the queried dataset by types
         """
         req = rtr.DatasetsRequest(types=types)
-        stream = self.__client.GetDatasets(req, metadata=self.metadata)
-        return stream
+        return get_rpc_policy().stream(
+            "datasets", lambda timeout: self.__client.GetDatasets(req, metadata=self.metadata, timeout=timeout)
+        )
 
     def create_dataset(self, dtype, dId) -> None:
         """Create Datasets will create a dataset request on CloudVision."""
         req = rtr.CreateDatasetRequest(dataset=ntf.Dataset(type=dtype, name=dId))
-        self.__auth_client.CreateDataset(req, metadata=self.metadata)
+        get_rpc_policy().call(
+            "write", lambda timeout: self.__auth_client.CreateDataset(req, metadata=self.metadata, timeout=timeout)
+        )
 
     def decode_batch(self, batch):
         """Decode a batch of notifications from CloudVision."""
@@ -243,7 +852,7 @@ class CloudvisionApi:  # pylint: disable=too-many-instance-attributes, too-many-
         """Format a search request to CloudVision."""
         start_ts = to_pbts(start).ToNanoseconds() if start else 0
         end_ts = to_pbts(end).ToNanoseconds() if end else 0
-        encoded_path_elements = [self.encoder.encode(x) for x in path_elements]
+        encoded_path_elements = PATH_ENCODER.encode(path_elements)
         req = rtr.SearchRequest(
             search_type=search_type,
             start=start_ts,
@@ -262,12 +871,198 @@ class CloudvisionApi:  # pylint: disable=too-many-instance-attributes, too-many-
             sort=sort,
             count_only=count_only,
         )
-        res = self.__search_client.Search(req)
+        res = get_rpc_policy().stream(
+            "search", lambda timeout: self.__search_client.Search(req, metadata=self.metadata, timeout=timeout)
+        )
         return (self.decode_batch(nb) for nb in res)
 
 
-def get_devices(client):
-    """Get devices from CloudVision inventory."""
+class CloudvisionConnectionPool:
+    """Process-wide pool of CloudvisionApi connections keyed by host, port and credentials.
+
+    Reusing a connection skips the on-prem login, certificate retrieval and TLS handshake for back-to-back jobs
+    in the same worker process. Connections are health checked before reuse, closed once idle for longer than
+    `idle_timeout` and recreated, with a fresh login, once older than `max_age`. The timeouts are fixed when the pool
+    is created.
+    """
+
+    def __init__(self, idle_timeout: int = POOL_IDLE_TIMEOUT, max_age: int = POOL_MAX_AGE):
+        """Initialize an empty pool."""
+        self._idle_timeout = idle_timeout
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._connections = {}
+
+    @classmethod
+    def from_settings(cls):
+        """Build a pool using the `pool_idle_timeout` and `pool_max_age` plugin settings."""
+        PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
+        return cls(
+            idle_timeout=PLUGIN_SETTINGS.get("pool_idle_timeout", POOL_IDLE_TIMEOUT),
+            max_age=PLUGIN_SETTINGS.get("pool_max_age", POOL_MAX_AGE),
+        )
+
+    @property
+    def idle_timeout(self) -> int:
+        """Seconds a connection can be idle before it's closed."""
+        return self._idle_timeout
+
+    @property
+    def max_age(self) -> int:
+        """Seconds before a connection is replaced with a fresh one."""
+        return self._max_age
+
+    @staticmethod
+    def _key(
+        cvp_host=None, cvp_port=None, verify=True, username=None, password=None, cvp_token=None, cvaas_url=None
+    ):  # pylint: disable=too-many-arguments
+        """Key identifying connections that can be shared."""
+        return (cvp_host, str(cvp_port), bool(verify), username, password, cvp_token, cvaas_url)
+
+    @staticmethod
+    def is_healthy(client: CloudvisionApi) -> bool:
+        """Check whether the gRPC channel of a connection can still be used."""
+        try:
+            grpc.channel_ready_future(client.comm_channel).result(timeout=POOL_HEALTH_CHECK_TIMEOUT)
+        except grpc.FutureTimeoutError:
+            return False
+        return True
+
+    def get(self, **kwargs) -> CloudvisionApi:
+        """Get a healthy connection for the given CloudvisionApi arguments, creating one if necessary.
+
+        Callers asking for the same key are serialized by a lock per key, so concurrent callers share one connection
+        rather than each creating one, while callers for other keys aren't held up by the health check or login.
+        """
+        key = self._key(**kwargs)
+        with self._lock:
+            self.expire_idle()
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                entry = self._connections.get(key)
+                if entry:
+                    # Marking it used keeps it from being expired by another caller while it's checked.
+                    entry[1] = time.monotonic()
+            if entry:
+                client = entry[0]
+                if time.monotonic() - client.created < self.max_age and self.is_healthy(client):
+                    return client
+                self.discard(client)
+            client = CloudvisionApi(**kwargs)
+            with self._lock:
+                self._connections[key] = [client, time.monotonic()]
+            return client
+
+    def discard(self, client: CloudvisionApi):
+        """Close a connection and remove it from the pool."""
+        with self._lock:
+            for key, entry in list(self._connections.items()):
+                if entry[0] is client:
+                    del self._connections[key]
+        client.close()
+
+    def expire_idle(self):
+        """Close connections that haven't been used within the idle timeout. The caller must hold the lock."""
+        now = time.monotonic()
+        for key, (client, last_used) in list(self._connections.items()):
+            if now - last_used > self.idle_timeout:
+                del self._connections[key]
+                client.close()
+
+    def clear(self):
+        """Close every pooled connection."""
+        with self._lock:
+            for client, _ in self._connections.values():
+                client.close()
+            self._connections.clear()
+
+
+@lru_cache(maxsize=None)
+def get_connection_pool() -> CloudvisionConnectionPool:
+    """Get the process-wide connection pool, created from the plugin settings on first use."""
+    return CloudvisionConnectionPool.from_settings()
+
+
+def connection_settings(instance: Optional[dict] = None) -> dict:
+    """Get the arguments for a CloudvisionApi connection from the plugin settings.
+
+    Args:
+        instance (dict): Settings of a single CloudVision instance from `instances`, which override the top level
+            plugin settings.
+
+    Returns:
+        dict: Keyword arguments for CloudvisionApi.
+    """
+    PLUGIN_SETTINGS = {**settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"], **(instance or {})}
+    if instance and "cvaas_url" in instance and "cvp_host" not in instance:
+        # A CVaaS instance mustn't inherit the on-prem host from the top level settings.
+        PLUGIN_SETTINGS["cvp_host"] = None
+    conn_settings = {
+        "cvp_host": PLUGIN_SETTINGS["cvp_host"],
+        "cvp_port": PLUGIN_SETTINGS.get("cvp_port", "8443"),
+        "verify": PLUGIN_SETTINGS["verify"],
+        "username": PLUGIN_SETTINGS["cvp_user"],
+        "password": PLUGIN_SETTINGS["cvp_password"],
+        "cvp_token": PLUGIN_SETTINGS["cvp_token"],
+    }
+    if instance and not conn_settings["cvp_host"]:
+        conn_settings["cvaas_url"] = PLUGIN_SETTINGS.get("cvaas_url", "www.arista.io:443")
+    return conn_settings
+
+
+def get_instances() -> List[dict]:
+    """Get the CloudVision instances to sync from the `instances` plugin setting.
+
+    Each instance is a dictionary of connection settings, ie `cvp_host` or `cvaas_url`, along with a unique `name`
+    identifying it. Any setting an instance doesn't define is taken from the top level plugin settings.
+
+    Returns:
+        List[dict]: Settings of each CloudVision instance, empty if a single instance is configured.
+    """
+    instances = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("instances") or []
+    names = [instance.get("name") for instance in instances]
+    if None in names or "" in names or len(set(names)) != len(names):
+        raise ValueError("Each CloudVision instance must have a unique name.")
+    return instances
+
+
+def get_connection(**kwargs) -> CloudvisionApi:
+    """Get a CloudvisionApi connection, from the process pool if `pool_connections` is enabled.
+
+    Args:
+        kwargs: Arguments for CloudvisionApi, defaults to those from the plugin settings.
+    """
+    kwargs = kwargs or connection_settings()
+    if settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("pool_connections"):
+        return get_connection_pool().get(**kwargs)
+    return CloudvisionApi(**kwargs)
+
+
+@contextmanager
+def cloudvision_connection(**kwargs):
+    """Context manager for a CloudvisionApi connection, reused from the process pool if `pool_connections` is enabled.
+
+    Args:
+        kwargs: Arguments for CloudvisionApi, defaults to those from the plugin settings.
+    """
+    kwargs = kwargs or connection_settings()
+    if settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("pool_connections"):
+        # Pooled connections are left open on exit unless a gRPC error means the next user needs a fresh one.
+        client = get_connection(**kwargs)
+        try:
+            yield client
+        except grpc.RpcError:
+            get_connection_pool().discard(client)
+            raise
+    else:
+        with CloudvisionApi(**kwargs) as client:
+            yield client
+
+
+def iter_devices(client) -> Iterator[DeviceRecord]:
+    """Iterate over devices from CloudVision inventory as they are streamed."""
     device_stub = services.DeviceServiceStub(client)
     if settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("import_active"):
         req = services.DeviceStreamRequest(
@@ -275,39 +1070,38 @@ def get_devices(client):
         )
     else:
         req = services.DeviceStreamRequest()
-    responses = device_stub.GetAll(req)
-    devices = []
-    for resp in responses:
-        device = {
-            "device_id": resp.value.key.device_id.value,
-            "hostname": resp.value.hostname.value,
-            "fqdn": resp.value.fqdn.value,
-            "sw_ver": resp.value.software_version.value,
-            "model": resp.value.model_name.value,
-            "status": "active" if resp.value.streaming_status == 2 else "offline",
-            "system_mac_address": resp.value.system_mac_address.value,
-        }
-        devices.append(device)
-    return devices
+    for resp in get_rpc_policy().stream("inventory", partial(device_stub.GetAll, req)):
+        yield DeviceRecord(
+            device_id=resp.value.key.device_id.value,
+            hostname=resp.value.hostname.value,
+            fqdn=resp.value.fqdn.value,
+            sw_ver=resp.value.software_version.value,
+            model=resp.value.model_name.value,
+            status="active" if resp.value.streaming_status == 2 else "offline",
+            system_mac_address=resp.value.system_mac_address.value,
+        )
 
 
-def get_tags_by_type(client, creator_type: int = tag_models.CREATOR_TYPE_USER):
-    """Get tags by creator type from CloudVision."""
+def get_devices(client) -> List[DeviceRecord]:
+    """Get devices from CloudVision inventory."""
+    return list(iter_devices(client))
+
+
+def iter_tags_by_type(client, creator_type: int = tag_models.CREATOR_TYPE_USER) -> Iterator[TagRecord]:
+    """Iterate over tags by creator type from CloudVision as they are streamed."""
     tag_stub = tag_services.TagServiceStub(client)
     req = tag_services.TagStreamRequest(partial_eq_filter=[tag_models.Tag(creator_type=creator_type)])
-    responses = tag_stub.GetAll(req)
-    tags = []
-    for resp in responses:
-        dev_tag = {
-            "label": resp.value.key.label.value,
-            "value": resp.value.key.value.value,
-        }
-        tags.append(dev_tag)
-    return tags
+    for resp in get_rpc_policy().stream("tags", partial(tag_stub.GetAll, req)):
+        yield TagRecord(label=resp.value.key.label.value, value=resp.value.key.value.value)
 
 
-def get_device_tags(client, device_id: str):
-    """Get tags for specific device."""
+def get_tags_by_type(client, creator_type: int = tag_models.CREATOR_TYPE_USER) -> List[TagRecord]:
+    """Get tags by creator type from CloudVision."""
+    return list(iter_tags_by_type(client, creator_type=creator_type))
+
+
+def iter_device_tags(client, device_id: str) -> Iterator[TagRecord]:
+    """Iterate over tags for specific device as they are streamed."""
     tag_stub = tag_services.TagAssignmentServiceStub(client)
     req = tag_services.TagAssignmentConfigStreamRequest(
         partial_eq_filter=[
@@ -320,15 +1114,13 @@ def get_device_tags(client, device_id: str):
             )
         ]
     )
-    responses = tag_stub.GetAll(req)
-    tags = []
-    for resp in responses:
-        dev_tag = {
-            "label": resp.value.key.label.value,
-            "value": resp.value.key.value.value,
-        }
-        tags.append(dev_tag)
-    return tags
+    for resp in get_rpc_policy().stream("tags", partial(tag_stub.GetAll, req)):
+        yield TagRecord(label=resp.value.key.label.value, value=resp.value.key.value.value)
+
+
+def get_device_tags(client, device_id: str) -> List[TagRecord]:
+    """Get tags for specific device."""
+    return list(iter_device_tags(client, device_id=device_id))
 
 
 def create_tag(client, label: str, value: str):
@@ -339,12 +1131,7 @@ def create_tag(client, label: str, value: str):
             key=tag_models.TagKey(label=StringValue(value=label), value=StringValue(value=value))
         )
     )
-    try:
-        tag_stub.Set(req)
-    except grpc.RpcError as err:
-        # Ignore RPC error if tag already exists for idempotency
-        print(f"Failure to create tag: {err}")
-        raise err
+    get_rpc_policy().call("write", partial(tag_stub.Set, req))
 
 
 def delete_tag(client, label: str, value: str):
@@ -353,12 +1140,7 @@ def delete_tag(client, label: str, value: str):
     req = tag_services.TagConfigDeleteRequest(
         key=tag_models.TagKey(label=StringValue(value=label), value=StringValue(value=value))
     )
-    try:
-        tag_stub.Delete(req)
-    # Skip error of tags that may be assigned to devices manually in CloudVision
-    except grpc.RpcError as err:
-        print(f"Failure to delete tag: {err}")
-        raise err
+    get_rpc_policy().call("write", partial(tag_stub.Delete, req))
 
 
 def assign_tag_to_device(client, device_id: str, label: str, value: str):
@@ -373,7 +1155,7 @@ def assign_tag_to_device(client, device_id: str, label: str, value: str):
             )
         )
     )
-    tag_stub.Set(req)
+    get_rpc_policy().call("write", partial(tag_stub.Set, req))
 
 
 def remove_tag_from_device(client, device_id: str, label: str, value: str):
@@ -386,30 +1168,104 @@ def remove_tag_from_device(client, device_id: str, label: str, value: str):
             device_id=StringValue(value=device_id),
         )
     )
-    tag_stub.Delete(req, timeout=RPC_TIMEOUT)
+    get_rpc_policy().call("write", partial(tag_stub.Delete, req))
 
 
-# This section is based off example code from Arista: https://github.com/aristanetworks/cloudvision-python/blob/trunk/examples/Connector/get_intf_status.py
+class TagChangeSet:
+    """Tag assignment changes collected during a sync so they can be applied to CloudVision together."""
+
+    def __init__(self):
+        """Initialize an empty change set."""
+        self.assign = defaultdict(set)
+        self.unassign = defaultdict(set)
+
+    def __bool__(self):
+        """Whether there are any changes to apply."""
+        return bool(self.assign or self.unassign)
 
+    def add_assignment(self, label: str, value: str, device: str):
+        """Queue assignment of a tag to a device, creating the tag if necessary."""
+        self.assign[TagRecord(label=label, value=value)].add(device)
 
-def get_query(client, dataset, pathElts):
-    """Returns a query on a path element.
+    def add_unassignment(self, label: str, value: str, device: str):
+        """Queue removal of a tag from a device."""
+        self.unassign[TagRecord(label=label, value=value)].add(device)
+
+
+def apply_tag_changes(  # pylint: disable=too-many-arguments,too-many-locals
+    client,
+    changes: TagChangeSet,
+    device_ids: dict,
+    existing_tags: Iterable[TagRecord] = (),
+    tags_in_use: Iterable[TagRecord] = (),
+    max_workers: int = TAG_SYNC_WORKERS,
+) -> List[str]:
+    """Apply tag changes to CloudVision across a bounded pool of threads.
+
+    Changes run in three phases so each tag keeps its ordering: missing tags are created, then tags are assigned
+    to and removed from devices, then tags no longer in use are deleted. A tag isn't assigned if its creation failed
+    and isn't deleted if removing it from a device failed.
 
     Args:
-        client (obj): GRPC client connection.
-        dataset (dict): Data related to query.
-        pathElts (List[str]): List of strings denoting path elements for query.
+        client (grpc.Channel): gRPC channel to CloudVision.
+        changes (TagChangeSet): Tag changes to be applied.
+        device_ids (dict): Mapping of device hostname to CloudVision device ID.
+        existing_tags (Iterable[TagRecord]): User tags that already exist in CloudVision.
+        tags_in_use (Iterable[TagRecord]): Tags still assigned to devices after the changes so mustn't be deleted.
+        max_workers (int): Maximum number of concurrent RPCs.
 
     Returns:
-        dict: Query from dataset and path elements.
+        List[str]: Errors from any operations that failed.
     """
-    result = {}
-    query = [create_query([(pathElts, [])], dataset)]
+    errors = []
+    failed_tags = set()
+
+    def run_phase(operations):
+        """Run (tag, description, function, kwargs) operations concurrently, recording failures."""
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                (tag, description, executor.submit(func, client=client, label=tag.label, value=tag.value, **kwargs))
+                for tag, description, func, kwargs in operations
+            ]
+            for tag, description, future in futures:
+                try:
+                    future.result()
+                except grpc.RpcError as err:
+                    errors.append(f"Unable to {description} for tag {tag.label}:{tag.value}. {err}")
+                    failed_tags.add(tag)
+
+    existing_tags = set(existing_tags)
+    run_phase((tag, "create tag", create_tag, {}) for tag in changes.assign if tag not in existing_tags)
+
+    assignments = []
+    for tag, devices in changes.assign.items():
+        if tag in failed_tags:
+            continue
+        for device in devices:
+            if device in device_ids:
+                assignments.append(
+                    (tag, f"assign to {device}", assign_tag_to_device, {"device_id": device_ids[device]})
+                )
+            else:
+                errors.append(f"{device} is inactive or missing in CloudVision - skipping for tag: {tag.label}")
+    for tag, devices in changes.unassign.items():
+        for device in devices:
+            if device in device_ids:
+                assignments.append(
+                    (tag, f"remove from {device}", remove_tag_from_device, {"device_id": device_ids[device]})
+                )
+    run_phase(assignments)
+
+    tags_in_use = set(tags_in_use) | set(changes.assign)
+    run_phase(
+        (tag, "delete tag", delete_tag, {})
+        for tag in changes.unassign
+        if tag not in tags_in_use and tag not in failed_tags
+    )
+    return errors
 
-    for batch in client.get(query):
-        for notif in batch["notifications"]:
-            result.update(notif["updates"])
-    return result
+
+# This section is based off example code from Arista: https://github.com/aristanetworks/cloudvision-python/blob/trunk/examples/Connector/get_intf_status.py
 
 
 def unfreeze_frozen_dict(frozen_dict):
@@ -435,206 +1291,390 @@ def unfreeze_frozen_dict(frozen_dict):
     return frozen_dict
 
 
-def get_device_type(client: CloudvisionApi, dId: str):
-    """Returns the type of the device: modular/fixed.
+# Errors raised by the parse helpers when a notification is missing a key or holds an unexpected type of value.
+DATA_SHAPE_ERRORS = (IndexError, KeyError, TypeError, ValueError)
+
+
+def parses_device_data(func: Callable) -> Callable:
+    """Decorates a parse helper so malformed notifications raise DeviceDataError rather than a generic error."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except DATA_SHAPE_ERRORS as err:
+            raise DeviceDataError(
+                f"Unable to parse {func.__name__[len('parse_'):]}, {type(err).__name__}: {err}"
+            ) from err
+
+    return wrapper
+
+
+def parse_interface_status(results: dict) -> dict:
+    """Extracts the InterfaceRecord fields found in an intfStatus notification.
 
     Args:
-        client (CloudvisionApi): Cloudvision connection.
-        dId (str): Device ID to determine type for.
+        results (dict): Updates from an intfStatus notification.
 
     Returns:
-        str: Type of device, either modular or fixed.
+        dict: InterfaceRecord fields that were present in the updates.
     """
-    pathElts = ["Sysdb", "hardware", "entmib"]
-    query = get_query(client, dId, pathElts)
-    query = unfreeze_frozen_dict(query)
-    if "fixedSystem" in query and query["fixedSystem"] is None:
-        dType = "modular"
-    elif query.get("fixedSystem"):
-        dType = "fixedSystem"
-    else:
-        dType = "Unknown"
-    return dType
+    intf = {}
+    if results.get("intfId"):
+        intf["interface"] = results["intfId"]
+    if results.get("linkStatus"):
+        intf["link_status"] = "up" if results["linkStatus"]["Name"] == "linkUp" else "down"
+    if results.get("operStatus"):
+        intf["oper_status"] = "up" if results["operStatus"]["Name"] == "intfOperUp" else "down"
+    if results.get("enabledState"):
+        intf["enabled"] = bool(results["enabledState"]["Name"] == "enabled")
+    if results.get("burnedInAddr"):
+        intf["mac_addr"] = results["burnedInAddr"]
+    if results.get("mtu"):
+        intf["mtu"] = results["mtu"]
+    return intf
 
 
-def get_interfaces_chassis(client: CloudvisionApi, dId):
-    """Gets information about interfaces for a modular device.
+INTERFACE_STATUS_PATH = ["Sysdb", "interface", "status", "eth", "phy", "slice", Wildcard(), "intfStatus", Wildcard()]
 
-    Args:
-        client (CloudvisionApi): Cloudvision connection.
-        dId (str): Device ID to determine type for.
-    """
-    # Fetch the list of slices/linecards
-    pathElts = ["Sysdb", "interface", "status", "eth", "phy", "slice"]
-    dataset = dId
-    query = get_query(client, dataset, pathElts)
-    queryLC = unfreeze_frozen_dict(query).keys()
-    intfStatusChassis = []
-
-    # Go through each linecard and get the state of all interfaces
-    for lc in queryLC:
-        pathElts = ["Sysdb", "interface", "status", "eth", "phy", "slice", lc, "intfStatus", Wildcard()]
-
-        query = [create_query([(pathElts, [])], dataset)]
-
-        for interface in client.get(query):
-            new_intf = {}
-            for notif in interface["notifications"]:
-                results = notif["updates"]
-                if results.get("intfId"):
-                    new_intf["interface"] = results["intfId"]
-                if results.get("linkStatus"):
-                    new_intf["link_status"] = "up" if results["linkStatus"]["Name"] == "linkUp" else "down"
-                if results.get("operStatus"):
-                    new_intf["oper_status"] = "up" if results["operStatus"]["Name"] == "intfOperUp" else "down"
-                if results.get("enabledState"):
-                    new_intf["enabled"] = bool(results["enabledState"]["Name"] == "enabled")
-                if results.get("burnedInAddr"):
-                    new_intf["mac_addr"] = results["burnedInAddr"]
-                if results.get("mtu"):
-                    new_intf["mtu"] = results["mtu"]
-            intfStatusChassis.append(new_intf)
-    return intfStatusChassis
-
-
-def get_interfaces_fixed(client: CloudvisionApi, dId: str):
-    """Gets information about interfaces for a fixed system device.
+
+def get_interfaces(client: CloudvisionApi, dId: str):
+    """Gets information about interfaces across all slices/linecards of a device.
+
+    A single query with a Wildcard for the slice is used so fixed and modular systems are handled alike.
 
     Args:
         client (CloudvisionApi): Cloudvision connection.
-        dId (str): Device ID to determine type for.
+        dId (str): Device ID to retrieve interfaces for.
+
+    Returns:
+        List[InterfaceRecord]: Status information for each interface.
     """
-    pathElts = ["Sysdb", "interface", "status", "eth", "phy", "slice", "1", "intfStatus", Wildcard()]
-    query = [create_query([(pathElts, [])], dId)]
-    query = unfreeze_frozen_dict(query)
+    query = [create_query([(INTERFACE_STATUS_PATH, [])], dId)]
+    return parse_interfaces(client.get(query))
+
+
+@parses_device_data
+def parse_interfaces(batches: Iterable[dict]) -> List[InterfaceRecord]:
+    """Builds the InterfaceRecords from the notification batches of an intfStatus query.
 
-    intfStatusFixed = []
-    for interface in client.get(query):
+    Args:
+        batches (Iterable[dict]): Decoded notification batches for one device.
+
+    Returns:
+        List[InterfaceRecord]: Status information for each interface.
+    """
+    intfStatus = []
+    for interface in batches:
         new_intf = {}
         for notif in interface["notifications"]:
-            results = notif["updates"]
-            if results.get("intfId"):
-                new_intf["interface"] = results["intfId"]
-            if results.get("enabledState"):
-                new_intf["enabled"] = bool(results["enabledState"]["Name"] == "enabled")
-            if results.get("burnedInAddr"):
-                new_intf["mac_addr"] = results["burnedInAddr"]
-            if results.get("mtu"):
-                new_intf["mtu"] = results["mtu"]
-            if results.get("operStatus"):
-                new_intf["oper_status"] = "up" if results["operStatus"]["Name"] == "intfOperUp" else "down"
-            if results.get("linkStatus"):
-                new_intf["link_status"] = "up" if results["linkStatus"]["Name"] == "linkUp" else "down"
-        intfStatusFixed.append(new_intf)
-    return intfStatusFixed
-
-
-def get_interface_transceiver(client: CloudvisionApi, dId: str, interface: str):
-    """Gets transceiver information for specified interface on specific device.
+            new_intf.update(parse_interface_status(notif["updates"]))
+        intfStatus.append(InterfaceRecord(**new_intf))
+    return intfStatus
+
+
+def parse_transceiver(updates: dict) -> Optional[str]:
+    """Extracts the media type from an xcvr status notification, preferring the EEPROM contents.
+
+    Args:
+        updates (dict): Updates from an xcvr status notification.
+
+    Returns:
+        Optional[str]: Media type of the transceiver if present in the updates.
+    """
+    if updates.get("actualIdEepromContents") and updates["actualIdEepromContents"].get("mediaType"):
+        return updates["actualIdEepromContents"]["mediaType"]
+    if updates.get("localMediaType"):
+        return updates["localMediaType"]["Name"]
+    return None
+
+
+TRANSCEIVER_STATUS_PATH = ["Sysdb", "hardware", "archer", "xcvr", "status", "all", Wildcard()]
+
+
+def get_interface_transceivers(client: CloudvisionApi, dId: str) -> Dict[str, str]:
+    """Gets transceiver information for all interfaces on a device with a single Wildcard query.
 
     Args:
         client (CloudvisionApi): Cloudvision connection.
-        dId (str): Device ID to determine transceiver type for.
-        interface (str): Name of interface to get transceiver information for.
+        dId (str): Device ID to retrieve transceiver types for.
+
+    Returns:
+        Dict[str, str]: Mapping of interface name to transceiver media type.
     """
-    pathElts = ["Sysdb", "hardware", "archer", "xcvr", "status", "all", interface]
-    query = [create_query([(pathElts, [])], dId)]
-    query = unfreeze_frozen_dict(query)
+    query = [create_query([(TRANSCEIVER_STATUS_PATH, [])], dId)]
+    return parse_interface_transceivers(client.get(query))
 
-    for batch in client.get(query):
+
+@parses_device_data
+def parse_interface_transceivers(batches: Iterable[dict]) -> Dict[str, str]:
+    """Maps interfaces to their transceiver media type from the notification batches of an xcvr status query.
+
+    Args:
+        batches (Iterable[dict]): Decoded notification batches for one device.
+
+    Returns:
+        Dict[str, str]: Mapping of interface name to transceiver media type.
+    """
+    transceivers = {}
+    for batch in batches:
         for notif in batch["notifications"]:
-            if notif["updates"].get("actualIdEepromContents") and notif["updates"]["actualIdEepromContents"].get(
-                "mediaType"
+            interface = notif["path_elements"][-1] if notif.get("path_elements") else notif["updates"].get("name")
+            media_type = parse_transceiver(notif["updates"])
+            if (
+                interface
+                and media_type
+                and (interface not in transceivers or notif["updates"].get("actualIdEepromContents"))
             ):
-                return notif["updates"]["actualIdEepromContents"]["mediaType"]
-            if notif["updates"].get("localMediaType"):
-                return notif["updates"]["localMediaType"]["Name"]
+                transceivers[interface] = media_type
+    return transceivers
+
+
+def resolve_transceiver(transceivers: Dict[str, str], interface: str) -> str:
+    """Finds the transceiver for an interface, inheriting the media type of the parent port for breakout lanes.
+
+    Breakout transceivers, ie 40G -> 4x10G, show up as several interfaces and the transceiver is only reported for
+    the parent port, ie Ethernet1 for Ethernet1/1 or Ethernet3/1 for Ethernet3/1/2 on a modular system.
+
+    Args:
+        transceivers (Dict[str, str]): Mapping of interface name to transceiver from `get_interface_transceivers`.
+        interface (str): Name of interface to find the transceiver for.
+
+    Returns:
+        str: Transceiver media type or "Unknown" if not found.
+    """
+    name = interface
+    while name:
+        if transceivers.get(name) and transceivers[name] != "Unknown":
+            return transceivers[name]
+        name = name.rsplit("/", 1)[0] if "/" in name else ""
     return "Unknown"
 
 
-def get_interface_mode(client: CloudvisionApi, dId: str, interface: str):
-    """Gets interface mode, ie access/trunked.
+INTERFACE_MODE_PATH = ["Sysdb", "bridging", "switchIntfConfig", "switchIntfConfig", Wildcard()]
+
+
+def get_interface_modes(client: CloudvisionApi, dId: str) -> Dict[str, str]:
+    """Gets the switchport mode of every interface on a device with a single Wildcard query.
 
     Args:
         client (CloudvisionApi): Cloudvision connection.
-        dId (str): Device ID to determine type for.
-        interface (str): Name of interface to get mode information for.
+        dId (str): Device ID to get switchport modes for.
+
+    Returns:
+        Dict[str, str]: Mapping of interface name to switchport mode, ie access/trunk.
     """
-    pathElts = ["Sysdb", "bridging", "switchIntfConfig", "switchIntfConfig", interface]
-    query = [create_query([(pathElts, [])], dId)]
-    query = unfreeze_frozen_dict(query)
+    query = [create_query([(INTERFACE_MODE_PATH, [])], dId)]
+    return parse_interface_modes(client.get(query))
 
-    for batch in client.get(query):
+
+@parses_device_data
+def parse_interface_modes(batches: Iterable[dict]) -> Dict[str, str]:
+    """Maps interfaces to their switchport mode from the notification batches of a switchIntfConfig query.
+
+    Args:
+        batches (Iterable[dict]): Decoded notification batches for one device.
+
+    Returns:
+        Dict[str, str]: Mapping of interface name to switchport mode, ie access/trunk.
+    """
+    modes = {}
+    for batch in batches:
         for notif in batch["notifications"]:
-            if notif["updates"].get("switchportMode"):
-                return notif["updates"]["switchportMode"]["Name"]
-    return "Unknown"
+            if notif.get("path_elements") and notif["updates"].get("switchportMode"):
+                modes[notif["path_elements"][-1]] = notif["updates"]["switchportMode"]["Name"]
+    return modes
 
 
-def get_port_type(port_info: dict, transceiver: str) -> str:
-    """Returns the type of port mapping CVP to Nautobot.
+class PortType(NamedTuple):
+    """Nautobot port type and speed, in Mbps, resolved for an interface."""
 
-    This attempts to determine what the port type is by looking at transceiver or speed.
+    port_type: str
+    speed: Optional[int]
 
-    Args:
-        port_info (dict): Data required to determine the port type.
 
-    Returns:
-        str: The Nautobot string for port type.
+class PortTypeResolver:
+    """Resolves the Nautobot port type and speed of interfaces from their transceiver and interface name.
+
+    Interface names are matched against a single precompiled pattern of the interface families, ie `Vlan` or
+    `Port-Channel`, and results are memoized per (family, transceiver) pair so each combination is only resolved once.
     """
-    if transceiver != "Unknown" and transceiver in PORT_TYPE_MAP:
-        return PORT_TYPE_MAP[transceiver]
 
-    if port_info.get("interface") and "Management" in port_info["interface"]:
-        return "1000base-t"
+    speed_pattern = re.compile(r"^(\d+)(g?)base")
 
-    if port_info.get("interface") and ("Vlan" in port_info["interface"] or "Loopback" in port_info["interface"]):
-        return "virtual"
+    def __init__(
+        self,
+        port_type_mappings: Optional[Dict[str, str]] = None,
+        interface_type_mappings: Optional[Dict[str, str]] = None,
+    ):
+        """Build the resolver from the default mappings extended with any user mappings.
+
+        Args:
+            port_type_mappings (dict): Transceiver type to Nautobot port type mappings.
+            interface_type_mappings (dict): Interface name prefix to Nautobot port type mappings.
+        """
+        self.port_type_map = {**PORT_TYPE_MAP, **(port_type_mappings or {})}
+        self.interface_type_map = {**INTERFACE_TYPE_MAP, **(interface_type_mappings or {})}
+        # Longest prefixes first so the most specific interface family wins.
+        families = sorted(self.interface_type_map, key=len, reverse=True)
+        self.family_pattern = re.compile("|".join(re.escape(family) for family in families))
+        self._cache = {}
+
+    @classmethod
+    def from_settings(cls):
+        """Build a resolver using the `port_type_mappings` and `interface_type_mappings` plugin settings."""
+        PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
+        return cls(
+            port_type_mappings=PLUGIN_SETTINGS.get("port_type_mappings"),
+            interface_type_mappings=PLUGIN_SETTINGS.get("interface_type_mappings"),
+        )
+
+    def get_family(self, interface: str) -> str:
+        """Returns the interface family, ie `Vlan` for `Vlan100`, or an empty string if it's not a known family."""
+        match = self.family_pattern.match(interface) if interface else None
+        return match.group(0) if match else ""
+
+    def resolve(self, interface: str, transceiver: str) -> PortType:
+        """Returns the port type and speed of an interface.
 
-    if port_info.get("interface") and "Port-Channel" in port_info["interface"]:
-        return "lag"
+        The transceiver type takes precedence, then the interface family, before falling back to `other`.
 
-    return "other"
+        Args:
+            interface (str): Name of the interface.
+            transceiver (str): Transceiver type found for the interface.
 
+        Returns:
+            PortType: Nautobot port type and speed of the interface.
+        """
+        key = (self.get_family(interface), transceiver)
+        if key not in self._cache:
+            family, transceiver = key
+            if transceiver != "Unknown" and transceiver in self.port_type_map:
+                port_type = self.port_type_map[transceiver]
+            else:
+                port_type = self.interface_type_map.get(family, "other")
+            self._cache[key] = PortType(port_type=port_type, speed=self.get_speed(port_type))
+        return self._cache[key]
 
-def get_interface_status(port_info: dict) -> str:
+    @classmethod
+    def get_speed(cls, port_type: str) -> Optional[int]:
+        """Returns the speed in Mbps indicated by a Nautobot port type, ie 10000 for `10gbase-x-sfpp`."""
+        match = cls.speed_pattern.match(port_type)
+        if not match:
+            return None
+        return int(match.group(1)) * (1000 if match.group(2) else 1)
+
+
+@lru_cache(maxsize=None)
+def get_port_type_resolver() -> PortTypeResolver:
+    """Get the default port type resolver, built from the plugin settings on first use."""
+    return PortTypeResolver.from_settings()
+
+
+def get_port_type(port_info: InterfaceRecord, transceiver: str, resolver: Optional[PortTypeResolver] = None) -> str:
+    """Returns the type of port mapping CVP to Nautobot.
+
+    This attempts to determine what the port type is by looking at transceiver or interface name.
+
+    Args:
+        port_info (InterfaceRecord): Data required to determine the port type.
+        transceiver (str): Transceiver type found for the interface.
+        resolver (PortTypeResolver): Resolver to use, defaults to the one returned by `get_port_type_resolver`.
+
+    Returns:
+        str: The Nautobot string for port type.
+    """
+    if resolver is None:
+        resolver = get_port_type_resolver()
+    return resolver.resolve(interface=port_info.interface, transceiver=transceiver).port_type
+
+
+def get_interface_status(port_info: InterfaceRecord) -> str:
     """Returns the status of Interface based on link and operational status.
 
     Args:
-        port_info (dict): Information about port including link and operational status.
+        port_info (InterfaceRecord): Information about port including link and operational status.
 
     Returns:
         str: The status of a port: active|decommissioned|maintenance|planned.
     """
     status = "decommissioning"
-    if port_info["oper_status"] == "up" and port_info["link_status"] == "up":
+    if port_info.oper_status == "up" and port_info.link_status == "up":
         status = "active"
 
-    if port_info["oper_status"] == "up" and port_info["link_status"] == "down":
+    if port_info.oper_status == "up" and port_info.link_status == "down":
         status = "planned"
 
-    if port_info["oper_status"] == "down" and port_info["link_status"] == "down":
+    if port_info.oper_status == "down" and port_info.link_status == "down":
         status = "maintenance"
     return status
 
 
-def get_interface_description(client: CloudvisionApi, dId: str, interface: str):
-    """Gets interface description.
+INTERFACE_CONFIG_PATHS = [
+    ["Sysdb", "interface", "config", "eth", "phy", "slice", Wildcard(), "intfConfig", Wildcard()],
+    ["Sysdb", "interface", "config", "eth", "lag", "intfConfig", Wildcard()],
+    ["Sysdb", "interface", "config", "loopback", "intfConfig", Wildcard()],
+]
+
+
+def get_interface_descriptions(client: CloudvisionApi, dId: str) -> Dict[str, str]:
+    """Gets the description of every interface on a device with a single query.
+
+    The query covers ethernet interfaces across all slices/linecards along with Port-Channel and Loopback interfaces.
 
     Args:
         client (CloudvisionApi): Cloudvision connection.
-        dId (str): Device ID to get description for.
-        interface (str): Name of interface to get description for.
+        dId (str): Device ID to get descriptions for.
+
+    Returns:
+        Dict[str, str]: Mapping of interface name to description.
     """
-    pathElts = ["Sysdb", "interface", "config", "eth", "phy", "slice", "1", "intfConfig", interface]
-    query = [create_query([(pathElts, [])], dId)]
-    query = unfreeze_frozen_dict(query)
+    query = [create_query([(pathElts, []) for pathElts in INTERFACE_CONFIG_PATHS], dId)]
+    return parse_interface_descriptions(client.get(query))
 
-    for batch in client.get(query):
+
+@parses_device_data
+def parse_interface_descriptions(batches: Iterable[dict]) -> Dict[str, str]:
+    """Maps interfaces to their description from the notification batches of an intfConfig query.
+
+    Args:
+        batches (Iterable[dict]): Decoded notification batches for one device.
+
+    Returns:
+        Dict[str, str]: Mapping of interface name to description.
+    """
+    descriptions = {}
+    for batch in batches:
         for notif in batch["notifications"]:
-            if notif["updates"].get("description") and notif["updates"]["description"] is not None:
-                return notif["updates"]["description"]
-    return ""
+            interface = notif["updates"].get("intfId") or (
+                notif["path_elements"][-1] if notif.get("path_elements") else None
+            )
+            if interface and notif["updates"].get("description") is not None:
+                descriptions[interface] = notif["updates"]["description"]
+    return descriptions
+
+
+IP_INTF_CONFIG_PATH = ["Sysdb", "ip", "config", "ipIntfConfig", Wildcard()]
+
+
+@parses_device_data
+def parse_ip_interface(updates: dict) -> Optional[IPInterfaceRecord]:
+    """Parse the IP configuration of an interface from the updates of an `ipIntfConfig` notification.
+
+    Args:
+        updates (dict): Updates from the notification.
+
+    Returns:
+        IPInterfaceRecord|None: Interface and address, or None if the interface has no address configured.
+    """
+    if not updates.get("intfId") or not updates.get("addrWithMask"):
+        return None
+    return IPInterfaceRecord(
+        interface=updates["intfId"],
+        address=updates["addrWithMask"]
+        if updates["addrWithMask"] != "0.0.0.0/0"
+        else updates.get("virtualAddrWithMask"),
+    )
 
 
 def get_ip_interfaces(client: CloudvisionApi, dId: str):
@@ -644,39 +1684,194 @@ def get_ip_interfaces(client: CloudvisionApi, dId: str):
         client (CloudvisionApi): Cloudvision connection.
         dId (str): Device ID to retrieve IP Addresses and associated interfaces for.
     """
-    pathElts = ["Sysdb", "ip", "config", "ipIntfConfig", Wildcard()]
-    query = [create_query([(pathElts, [])], dId)]
+    query = [create_query([(IP_INTF_CONFIG_PATH, [])], dId)]
     query = unfreeze_frozen_dict(query)
 
+    return parse_ip_interfaces(client.get(query))
+
+
+@parses_device_data
+def parse_ip_interfaces(batches: Iterable[dict]) -> List[IPInterfaceRecord]:
+    """Builds the IPInterfaceRecords from the notification batches of an ipIntfConfig query.
+
+    Args:
+        batches (Iterable[dict]): Decoded notification batches for one device.
+
+    Returns:
+        List[IPInterfaceRecord]: Interfaces with an IP address configured.
+    """
     ip_intfs = []
-    for batch in client.get(query):
+    for batch in batches:
         for notif in batch["notifications"]:
-            results = notif["updates"]
-            if results.get("intfId") and results.get("addrWithMask"):
-                ip_intfs.append(
-                    {
-                        "interface": results["intfId"],
-                        "address": results["addrWithMask"]
-                        if results["addrWithMask"] != "0.0.0.0/0"
-                        else results.get("virtualAddrWithMask"),
-                    }
-                )
+            record = parse_ip_interface(notif["updates"])
+            if record:
+                ip_intfs.append(record)
     return ip_intfs
 
 
-def get_cvp_version():
+def search_ip_interfaces(
+    client: CloudvisionApi, page_size: int = SEARCH_PAGE_SIZE
+) -> Dict[str, List[IPInterfaceRecord]]:
+    """Gets the interfaces with IP Addresses configured on every device using the Search API.
+
+    Rather than a Get per device, the `ipIntfConfig` path is searched across all device datasets, `page_size`
+    results at a time. The offset is advanced by the number of key/value rows decoded from each page, which is what
+    the search counts rather than notifications, until a page comes back short. As a page can end part way through
+    an interface's notification, the updates of each interface are combined across pages before they're parsed.
+
+    Args:
+        client (CloudvisionApi): Cloudvision connection.
+        page_size (int): Number of results requested per search.
+
+    Returns:
+        Dict[str, List[IPInterfaceRecord]]: IP interfaces keyed by device ID.
+    """
+    updates = defaultdict(dict)
+    offset = 0
+    while True:
+        rows = 0
+        for batch in client.search(
+            d_type="device", path_elements=IP_INTF_CONFIG_PATH, result_size=page_size, offset=offset
+        ):
+            for notif in batch["notifications"]:
+                rows += len(notif["updates"]) + len(notif["deletes"])
+                updates[(batch["dataset"]["name"], tuple(notif["path_elements"]))].update(notif["updates"])
+        if rows < page_size:
+            break
+        offset += rows
+    ip_intfs = defaultdict(list)
+    for (device_id, _), intf_updates in updates.items():
+        record = parse_ip_interface(intf_updates)
+        if record:
+            ip_intfs[device_id].append(record)
+    return dict(ip_intfs)
+
+
+class DeviceData(NamedTuple):
+    """Interface data for a device fetched together with other devices by `get_devices_data`."""
+
+    interfaces: List[InterfaceRecord]
+    transceivers: Dict[str, str]
+    descriptions: Dict[str, str]
+    modes: Dict[str, str]
+    ip_interfaces: Optional[List[IPInterfaceRecord]]
+
+
+def get_device_batches(client: CloudvisionApi, paths: List[list], dIds: Iterable[str]) -> Dict[str, List[dict]]:
+    """Runs the same paths against several devices with a single GetRequest.
+
+    The request carries one query per device dataset and the returned notification batches are split up by the
+    dataset they came from.
+
+    Args:
+        client (CloudvisionApi): Cloudvision connection.
+        paths (List[list]): Path elements to get from each device.
+        dIds (Iterable[str]): Device IDs to query.
+
+    Returns:
+        Dict[str, List[dict]]: Notification batches keyed by device ID.
+    """
+    query = [create_query([(pathElts, []) for pathElts in paths], dId) for dId in dIds]
+    batches = defaultdict(list)
+    for batch in client.get(query):
+        batches[batch["dataset"]["name"]].append(batch)
+    return batches
+
+
+def get_devices_data(client: CloudvisionApi, dIds: List[str], ip_interfaces: bool = True) -> Dict[str, DeviceData]:
+    """Gets the interfaces, transceivers, descriptions, switchport modes and IP interfaces of several devices.
+
+    Each kind of data is requested for all the devices in one GetRequest, so loading K devices takes a handful of
+    RPCs rather than a handful per device.
+
+    Args:
+        client (CloudvisionApi): Cloudvision connection.
+        dIds (List[str]): Device IDs to get data for.
+        ip_interfaces (bool): Whether to get IP interfaces, ie not if they were already found with a search.
+
+    Returns:
+        Dict[str, DeviceData]: Data keyed by device ID.
+    """
+    interfaces = get_device_batches(client, [INTERFACE_STATUS_PATH], dIds)
+    transceivers = get_device_batches(client, [TRANSCEIVER_STATUS_PATH], dIds)
+    descriptions = get_device_batches(client, INTERFACE_CONFIG_PATHS, dIds)
+    modes = get_device_batches(client, [INTERFACE_MODE_PATH], dIds)
+    ip_intfs = get_device_batches(client, [IP_INTF_CONFIG_PATH], dIds) if ip_interfaces else None
+    return {
+        dId: DeviceData(
+            interfaces=parse_interfaces(interfaces.get(dId, [])),
+            transceivers=parse_interface_transceivers(transceivers.get(dId, [])),
+            descriptions=parse_interface_descriptions(descriptions.get(dId, [])),
+            modes=parse_interface_modes(modes.get(dId, [])),
+            ip_interfaces=parse_ip_interfaces(ip_intfs.get(dId, [])) if ip_intfs is not None else None,
+        )
+        for dId in dIds
+    }
+
+
+def get_cvp_version(client: Optional[CloudvisionApi] = None) -> str:
     """Returns CloudVision portal version.
 
+    The version is requested with the logged in session of an existing on-prem connection, or of the shared
+    session token manager, so no additional login is performed. An API token is sent as a Bearer token. The result is cached for `cvp_version_ttl` seconds.
+
+    Args:
+        client (CloudvisionApi, optional): Authenticated connection to CloudVision. Defaults to plugin settings.
+
     Returns:
         str: CloudVision version from API or blank string if unable to find.
+
+    Raises:
+        AuthFailure: If CloudVision rejects the credentials.
     """
     PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
-    client = CvpClient()
+    cvp_host = client.cvp_host if client else PLUGIN_SETTINGS.get("cvp_host")
+    if cvp_host:
+        base_url = cvp_host
+    elif client:
+        base_url = client.cvp_url
+    else:
+        base_url = PLUGIN_SETTINGS.get("cvaas_url", "www.arista.io:443")
+    cached = _CVP_VERSION_CACHE.get(base_url)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+
+    if client and client.token_manager:
+        token_manager = client.token_manager
+    elif not client and cvp_host and not PLUGIN_SETTINGS.get("cvp_token"):
+        token_manager = get_token_manager(
+            cvp_host, PLUGIN_SETTINGS["cvp_user"], PLUGIN_SETTINGS["cvp_password"], PLUGIN_SETTINGS.get("verify", True)
+        )
+    else:
+        token_manager = None
+
     try:
-        client.connect([PLUGIN_SETTINGS["cvp_host"]], PLUGIN_SETTINGS["cvp_user"], PLUGIN_SETTINGS["cvp_password"])
-        version = client.api.get_cvp_info()
-        if "version" in version:
-            return version["version"]
-    except CvpLoginError as err:
-        raise AuthFailure(error_code="Failed Login", message=f"Unable to login to CloudVision Portal. {err}") from err
-    return ""
+        if token_manager:
+            # The session holds the session_id cookie set by the login, which is what authenticates it on-prem.
+            token_manager.get_token()
+            session, headers = token_manager.session, {}
+        else:
+            session = requests.Session()
+            session.verify = client.verify if client else PLUGIN_SETTINGS.get("verify", True)
+            token = client.cvp_token if client else PLUGIN_SETTINGS.get("cvp_token")
+            headers = {"Authorization": f"Bearer {token}"}
+        response = session.get(
+            f"https://{base_url}/cvpservice/cvpInfo/getCvpInfo.do", headers=headers, timeout=RPC_TIMEOUT
+        )
+        if response.status_code in (401, 403):
+            if token_manager:
+                token_manager.invalidate()
+            raise AuthFailure(
+                error_code="Failed Login", message=f"Unable to login to CloudVision Portal. {response.text}"
+            )
+        response.raise_for_status()
+        version = response.json().get("version", "")
+    except (requests.RequestException, ValueError, AttributeError):
+        # Unreachable, an error status or a body that isn't a JSON object, ie a proxy's error page.
+        return ""
+    if version:
+        _CVP_VERSION_CACHE[base_url] = (
+            version,
+            time.monotonic() + PLUGIN_SETTINGS.get("cvp_version_ttl", CVP_VERSION_TTL),
+        )
+    return version
@@ -1,6 +1,16 @@
 """Utility functions for Nautobot ORM."""
 import re
+from collections import defaultdict
+from functools import lru_cache, partial
+from itertools import islice
+from uuid import UUID
+from typing import Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+
 from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.db import DatabaseError, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
 from django.utils.text import slugify
 
 from nautobot.dcim.models import DeviceRole, DeviceType, Manufacturer, Site
@@ -14,6 +24,12 @@ except ImportError:
     print("Device Lifecycle plugin isn't installed so will revert to CustomField for OS version.")
     LIFECYCLE_MGMT = False
 
+HOSTNAME_CACHE_SIZE = 8192
+SYNC_BATCH_SIZE = 500
+MAX_DELETES_PER_SYNC = 1000
+# Errors that cause a single write to be skipped rather than failing the whole sync.
+WRITE_ERRORS = (DatabaseError, ObjectDoesNotExist, ValidationError)
+
 
 def verify_site(site_name):
     """Verifies whether site in plugin config is created. If not, creates site.
@@ -95,52 +111,375 @@ def get_device_version(device):
     return version
 
 
-def parse_hostname(hostname: str):
-    """Parse a device's hostname to find site and role.
+@lru_cache(maxsize=None)
+def compile_hostname_patterns(hostname_patterns: Tuple[str, ...]) -> Tuple["re.Pattern", ...]:
+    """Compile the hostname patterns once, in reverse order so the last matching pattern can be found first.
 
     Args:
-        hostname (str): Device hostname to be parsed for site and role.
+        hostname_patterns (Tuple[str, ...]): Regex patterns from the `hostname_patterns` setting.
+
+    Returns:
+        Tuple[re.Pattern, ...]: Compiled patterns, last pattern first.
     """
-    hostname_patterns = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("hostname_patterns")
+    return tuple(re.compile(pattern) for pattern in reversed(hostname_patterns))
+
+
+@lru_cache(maxsize=HOSTNAME_CACHE_SIZE)
+def match_hostname(hostname: str, hostname_patterns: Tuple[str, ...]) -> Tuple[Optional[str], Optional[str]]:
+    """Find the site and role codes in a hostname using the compiled hostname patterns.
 
+    When several patterns match, the site and role from the last matching pattern take precedence. Patterns are
+    searched from last to first so evaluation stops as soon as both a site and role have been found.
+
+    Args:
+        hostname (str): Device hostname to be parsed for site and role.
+        hostname_patterns (Tuple[str, ...]): Regex patterns from the `hostname_patterns` setting.
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: Site and role codes found in the hostname.
+    """
     site, role = None, None
-    for pattern in hostname_patterns:
-        match = re.search(pattern=pattern, string=hostname)
-        if match:
-            if "site" in match.groupdict() and match.group("site"):
-                site = match.group("site")
-            if "role" in match.groupdict() and match.group("role"):
-                role = match.group("role")
+    for pattern in compile_hostname_patterns(hostname_patterns):
+        match = pattern.search(hostname)
+        if not match:
+            continue
+        groups = match.groupdict()
+        if site is None and groups.get("site"):
+            site = groups["site"]
+        if role is None and groups.get("role"):
+            role = groups["role"]
+        if site and role:
+            break
     return (site, role)
 
 
-def get_site_from_map(site_code: str):
+class HostnameMappings(NamedTuple):
+    """Hostname patterns and the site and role mappings applied to the codes they find, read once per sync."""
+
+    hostname_patterns: Tuple[str, ...]
+    site_mappings: Mapping[str, str]
+    role_mappings: Mapping[str, str]
+
+    @classmethod
+    def from_settings(cls):
+        """Create the mappings from the `hostname_patterns`, `site_mappings` and `role_mappings` settings."""
+        PLUGIN_SETTINGS = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"]
+        return cls(
+            hostname_patterns=tuple(PLUGIN_SETTINGS.get("hostname_patterns") or ()),
+            site_mappings=PLUGIN_SETTINGS.get("site_mappings") or {},
+            role_mappings=PLUGIN_SETTINGS.get("role_mappings") or {},
+        )
+
+
+def parse_hostname(hostname: str, mappings: Optional[HostnameMappings] = None):
+    """Parse a device's hostname to find site and role.
+
+    Args:
+        hostname (str): Device hostname to be parsed for site and role.
+        mappings (HostnameMappings, optional): Hostname patterns to use. Defaults to those in the plugin settings.
+    """
+    mappings = mappings or HostnameMappings.from_settings()
+    return match_hostname(hostname, mappings.hostname_patterns)
+
+
+def get_site_from_map(site_code: str, mappings: Optional[HostnameMappings] = None):
     """Get name of Site from site_mapping based upon sitecode.
 
     Args:
         site_code (str): Site code from device hostname.
+        mappings (HostnameMappings, optional): Site mappings to use. Defaults to those in the plugin settings.
 
     Returns:
         str|None: Name of Site if site code found else None.
     """
-    site_map = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("site_mappings")
-    site_name = None
-    if site_code in site_map:
-        site_name = site_map[site_code]
-    return site_name
+    mappings = mappings or HostnameMappings.from_settings()
+    return mappings.site_mappings.get(site_code)
 
 
-def get_role_from_map(role_code: str):
+def get_role_from_map(role_code: str, mappings: Optional[HostnameMappings] = None):
     """Get name of Role from role_mapping based upon role code in hostname.
 
     Args:
         role_code (str): Role code from device hostname.
+        mappings (HostnameMappings, optional): Role mappings to use. Defaults to those in the plugin settings.
 
     Returns:
         str|None: Name of Device Role if role code found else None.
     """
-    role_map = settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("role_mappings")
-    role_name = None
-    if role_code in role_map:
-        role_name = role_map[role_code]
-    return role_name
+    mappings = mappings or HostnameMappings.from_settings()
+    return mappings.role_mappings.get(role_code)
+
+
+class DeleteBudget:
+    """Number of objects the sync may still delete, shared by every Nautobot adapter of a Job.
+
+    When the devices are synced a batch at a time each batch's deletions are applied on their own, so the
+    `max_deletes_per_sync` limit is tracked here across the whole Job rather than per batch. Deletions that would take
+    the Job past the limit are skipped and counted so they can be taken off the sync summary.
+    """
+
+    def __init__(self, limit: Optional[int] = MAX_DELETES_PER_SYNC):
+        """Initialize the budget.
+
+        Args:
+            limit (int, optional): Maximum number of objects that may be deleted, None for no limit.
+        """
+        self.limit = limit
+        self.deleted = 0
+        self.skipped = 0
+
+    @classmethod
+    def from_settings(cls):
+        """Build a budget using the `max_deletes_per_sync` plugin setting."""
+        return cls(
+            limit=settings.PLUGINS_CONFIG["nautobot_ssot_aristacv"].get("max_deletes_per_sync", MAX_DELETES_PER_SYNC)
+        )
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Number of objects that may still be deleted, None if there's no limit."""
+        if self.limit is None:
+            return None
+        return max(self.limit - self.deleted, 0)
+
+
+class QueuedWrite(NamedTuple):
+    """Write queued by a BatchedWriter.
+
+    `key` names what the write creates, ie a Device, and `parent` the key of the write it depends on, so a write is
+    dropped if the write creating its parent failed.
+    """
+
+    description: str
+    operation: Callable
+    key: Optional[str] = None
+    parent: Optional[str] = None
+
+
+class BatchedWriter:
+    """Queues the ORM writes made by DiffSync CRUD methods and applies them in batches.
+
+    Each batch runs in its own atomic block, a savepoint within the Job's transaction, with the changes recorded by
+    Nautobot's change logging as usual. If any write in a batch fails the batch is rolled back and replayed with
+    each write in its own savepoint, so only the failing writes are skipped. Plain field updates queued with
+    `add_update` are grouped so objects getting the same values are written with a single queryset update(), changes
+    to existing objects queued with `add_save` have their instances loaded with one query per model for each batch,
+    and deletions queued with `add_delete` are held back until `apply_deletes` removes them with chunked queryset
+    deletes.
+    Writes depending on a write that failed, ie the Interfaces of a Device that couldn't be created, are dropped
+    rather than attempted. Failed and dropped writes are both recorded in `failed`.
+
+    Args:
+        job (Job): The Job running the sync, used for logging.
+        batch_size (int): Number of writes applied per batch.
+    """
+
+    def __init__(self, job=None, batch_size: int = SYNC_BATCH_SIZE):
+        """Initialize the writer."""
+        self.job = job
+        self.batch_size = max(int(batch_size), 1)
+        self.operations: List[QueuedWrite] = []
+        self.updates: Dict[Tuple[type, frozenset], List[UUID]] = defaultdict(list)
+        self.saves: Dict[type, List[Tuple[UUID, str, Callable]]] = defaultdict(list)
+        self.update_count = 0
+        self.deletes: Dict[type, Dict[UUID, str]] = defaultdict(dict)
+        self.failed: List[str] = []
+        self.failed_keys: Set[str] = set()
+
+    def add(self, description: str, operation: Callable, key: Optional[str] = None, parent: Optional[str] = None):
+        """Queue a write, applying the batch once it is full.
+
+        Args:
+            description (str): What the write does, ie `create Device leaf1`, used when logging a failure.
+            operation (Callable): Function taking no arguments that makes the write.
+            key (str, optional): Name of what the write creates that other writes may depend on, ie a Device name.
+            parent (str, optional): Key of the write this write depends on.
+        """
+        self.operations.append(QueuedWrite(description, operation, key, parent))
+        if len(self.operations) + self.update_count >= self.batch_size:
+            self.flush()
+
+    def add_update(self, model: type, uuid: UUID, values: Mapping):
+        """Queue plain field values for an object, see `update_fields`.
+
+        Args:
+            model (type): ORM model of the object.
+            uuid (UUID): ID of the object.
+            values (Mapping): New values keyed by field name, which must be hashable.
+        """
+        self.updates[(model, frozenset(values.items()))].append(uuid)
+        self.update_count += 1
+        if len(self.operations) + self.update_count >= self.batch_size:
+            self.flush()
+
+    def add_save(self, model: type, uuid: UUID, description: str, operation: Callable):
+        """Queue changes to an existing object that are made on its instance, which is loaded when the batch is applied.
+
+        Args:
+            model (type): ORM model of the object.
+            uuid (UUID): ID of the object.
+            description (str): What the write does, ie `update Device leaf1`, used when logging a failure.
+            operation (Callable): Function taking the object's instance that makes and saves the changes.
+        """
+        self.saves[model].append((uuid, description, operation))
+        self.update_count += 1
+        if len(self.operations) + self.update_count >= self.batch_size:
+            self.flush()
+
+    def add_delete(self, model: type, uuid: UUID, description: str):
+        """Queue an object to be deleted by `apply_deletes`.
+
+        Args:
+            model (type): ORM model of the object.
+            uuid (UUID): ID of the object.
+            description (str): What is being deleted, ie `Device leaf1`, used when logging a failure.
+        """
+        self.deletes[model][uuid] = description
+
+    def apply_deletes(self, order: Sequence[type] = (), limit: Optional[int] = MAX_DELETES_PER_SYNC):
+        """Delete the queued objects with queryset deletes of up to `batch_size` objects each.
+
+        If a chunk fails to delete it is retried one object at a time so only the failing objects are kept.
+
+        Args:
+            order (Sequence[type]): Models to delete first, in order, ie parents whose deletion cascades to children.
+            limit (int, optional): Maximum number of objects that may be deleted, nothing is deleted if more are queued.
+
+        Returns:
+            bool: False if the deletes were skipped for exceeding the limit, otherwise True.
+        """
+        deletes, self.deletes = self.deletes, defaultdict(dict)
+        total = sum(len(uuids) for uuids in deletes.values())
+        if not total:
+            return True
+        if limit is not None and total > limit:
+            if self.job:
+                self.job.log_warning(
+                    message=f"Skipping deletion of {total} objects as only {limit} more may be deleted by this sync."
+                )
+            return False
+        models = [model for model in order if model in deletes]
+        models += [model for model in deletes if model not in models]
+        for model in models:
+            uuids = iter(deletes[model])
+            chunk = list(islice(uuids, self.batch_size))
+            while chunk:
+                description = f"delete {len(chunk)} {model._meta.verbose_name_plural}"
+                try:
+                    self._apply([QueuedWrite(description, partial(self._delete, model, chunk))])
+                except WRITE_ERRORS:
+                    self.operations = [
+                        QueuedWrite(f"delete {deletes[model][uuid]}", partial(self._delete, model, [uuid]))
+                        for uuid in chunk
+                    ]
+                    self.flush()
+                chunk = list(islice(uuids, self.batch_size))
+        return True
+
+    @staticmethod
+    def _delete(model: type, uuids: Sequence[UUID]):
+        """Delete objects of a model by ID."""
+        model.objects.filter(pk__in=uuids).delete()
+
+    @staticmethod
+    def _save(model: type, instance, operation: Callable):
+        """Make and save the changes to an instance loaded for the batch."""
+        if instance is None:
+            raise model.DoesNotExist(f"{model._meta.verbose_name} no longer exists.")
+        operation(instance)
+
+    @staticmethod
+    def _apply(operations: List[QueuedWrite]):
+        """Apply writes in a single savepoint."""
+        with transaction.atomic():
+            for write in operations:
+                write.operation()
+
+    def _drop_orphans(self, operations: List[QueuedWrite]) -> List[QueuedWrite]:
+        """Drop the writes whose parent failed, recording them as failed."""
+        if not self.failed_keys:
+            return operations
+        kept = []
+        for write in operations:
+            if write.parent in self.failed_keys:
+                self.failed.append(write.description)
+                if write.key:
+                    self.failed_keys.add(write.key)
+                if self.job:
+                    self.job.log_warning(message=f"Unable to {write.description} as {write.parent} failed.")
+            else:
+                kept.append(write)
+        return kept
+
+    def flush(self):
+        """Apply all queued writes."""
+        operations, self.operations = self.operations, []
+        for model, saves in self.saves.items():
+            instances = model.objects.in_bulk([uuid for uuid, _, _ in saves])
+            for uuid, description, operation in saves:
+                operations.append(QueuedWrite(description, partial(self._save, model, instances.get(uuid), operation)))
+        self.saves = defaultdict(list)
+        for (model, values), uuids in self.updates.items():
+            values = dict(values)
+            operations.append(
+                QueuedWrite(
+                    f"update {len(uuids)} {model._meta.verbose_name_plural} with {values}",
+                    partial(update_fields, model, uuids, values),
+                )
+            )
+        self.updates = defaultdict(list)
+        self.update_count = 0
+        operations = self._drop_orphans(operations)
+        if not operations:
+            return
+        try:
+            self._apply(operations)
+            return
+        except WRITE_ERRORS as err:
+            if self.job:
+                self.job.log_debug(message=f"Rolled back batch of {len(operations)} writes, retrying each. {err}")
+        for write in operations:
+            if write.parent in self.failed_keys:
+                self._drop_orphans([write])
+                continue
+            try:
+                self._apply([write])
+            except WRITE_ERRORS as err:
+                self.failed.append(write.description)
+                if write.key:
+                    self.failed_keys.add(write.key)
+                if self.job:
+                    self.job.log_warning(message=f"Unable to {write.description}. {err}")
+
+
+def update_fields(model: type, uuids: Sequence[UUID], values: Mapping):
+    """Write the same plain field values for objects of one model with a queryset update() rather than saving each.
+
+    The update skips model validation, so it must only be used for fields the database itself constrains well
+    enough. The objects are read back as they're updated and `post_save` is sent for each so Nautobot's change
+    logging and webhooks handle them as they would a save.
+
+    Args:
+        model (type): ORM model of the objects.
+        uuids (Sequence[UUID]): IDs of the objects to update.
+        values (Mapping): New values keyed by field name.
+    """
+    if not uuids:
+        return
+    values = dict(values)
+    if hasattr(model, "last_updated"):
+        values["last_updated"] = timezone.now()
+    queryset = model.objects.filter(pk__in=uuids)
+    instances = list(queryset)
+    queryset.update(**values)
+    for instance in instances:
+        for field, value in values.items():
+            setattr(instance, field, value)
+        post_save.send(
+            sender=model,
+            instance=instance,
+            created=False,
+            update_fields=frozenset(values),
+            raw=False,
+            using=queryset.db,
+        )
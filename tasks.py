@@ -351,6 +351,18 @@ def unittest(context, keepdb=False, label="nautobot_ssot_aristacv", failfast=Fal
     run_command(context, command)
 
 
+@task(
+    help={
+        "name": "name of the benchmark script in development/benchmarks to run",
+    }
+)
+def benchmark(context, name="parse_hostname"):
+    """Run a performance benchmark from development/benchmarks."""
+    command = f"python development/benchmarks/{name}.py"
+
+    run_command(context, command)
+
+
 @task
 def unittest_coverage(context):
     """Report on code test coverage as measured by 'invoke unittest'."""